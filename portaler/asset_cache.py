@@ -0,0 +1,131 @@
+"""
+Asset cache
+
+Keeps loaded surfaces and sounds around for as long as a level uses them, and a bit after.
+
+Every asset asked for while a level is the owner gets referenced by that level.
+When the level is done with (see Level.empty_all) it lets go of all of them at once.
+Assets nothing references stay cached, in case the next level wants them too,
+until the cache goes over its memory budget. Then the least recently used unreferenced ones go first.
+
+Assets cut out of another cached asset (subsurfaces) don't have pixels of their own.
+They keep the asset they came from (their parent) loaded for as long as they are cached themselves.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple, TypeVar, cast
+
+import pygame
+
+_T = TypeVar("_T")
+
+
+def _root(surface: pygame.Surface) -> pygame.Surface:
+    parent = surface.get_parent()
+    while parent is not None:
+        surface, parent = parent, parent.get_parent()
+    return surface
+
+
+def nbytes(asset: Any) -> int:
+    """Bytes of pixels or samples an asset keeps in memory. Shared pixels are only counted once"""
+    if isinstance(asset, pygame.Sound):
+        frequency, size, channels = pygame.mixer.get_init() or (0, 0, 0)
+        return round(asset.get_length() * frequency) * abs(size) // 8 * channels
+    surfaces = asset if isinstance(asset, list) else [asset]
+    roots = {id(root): root for root in map(_root, surfaces)}
+    return sum(root.width * root.height * root.get_bytesize() for root in roots.values())
+
+
+@dataclass(slots=True)
+class _Entry:
+    value: Any
+    size: int
+    parent: str | None
+    owners: set[Hashable] = field(default_factory=set)
+    children: int = 0  # cached assets cut out of this one
+
+
+class AssetReport(NamedTuple):
+    name: str
+    size: int  # bytes
+    owners: int  # how many levels use it, 0 means it can be evicted
+
+
+class AssetCache:
+    """Assets by name, referenced by owners (levels), evicted least recently used first"""
+
+    def __init__(self, budget: int) -> None:
+        self.budget = budget  # bytes. Assets in use can take the cache over it, the rest get evicted
+        self.owner: Hashable | None = None  # who assets asked for now belong to
+        self.resident = 0  # bytes of everything cached
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()  # least recently used first
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str, load: Callable[[], _T], parent: str | None = None) -> _T:
+        """The asset with this name, loaded first if it isn't cached.
+
+        parent is the name of the cached asset this one shares pixels with, if any.
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            value = load()
+            entry = _Entry(value, 0 if parent is not None else nbytes(value), parent)
+            if parent is not None:
+                self._entries[parent].children += 1
+            self._entries[name] = entry
+            self.resident += entry.size
+        self._touch(name, entry)
+        if entry.size:
+            self.trim()
+        return cast(_T, entry.value)
+
+    def _touch(self, name: str, entry: _Entry) -> None:
+        self._entries.move_to_end(name)
+        if self.owner is not None:
+            entry.owners.add(self.owner)
+        if entry.parent is not None:
+            self._touch(entry.parent, self._entries[entry.parent])
+
+    def use(self, owner: Hashable) -> None:
+        """Assets asked for from now on are used by owner"""
+        self.owner = owner
+
+    def release(self, owner: Hashable) -> None:
+        """owner doesn't need its assets anymore, they can be evicted if the cache is over budget"""
+        for entry in self._entries.values():
+            entry.owners.discard(owner)
+        if self.owner == owner:
+            self.owner = None
+        self.trim()
+
+    def trim(self) -> None:
+        """Evict unreferenced assets until everything fits in the budget (or nothing else can go)"""
+        # parents are always used more recently than their children, so they come up after them
+        for name, entry in list(self._entries.items()):
+            if self.resident <= self.budget:
+                return
+            if not entry.owners and not entry.children:
+                self._evict(name)
+
+    def _evict(self, name: str) -> None:
+        entry = self._entries.pop(name)
+        self.resident -= entry.size
+        if entry.parent is not None:
+            self._entries[entry.parent].children -= 1
+
+    def clear(self) -> None:
+        """Forget everything, even what's still in use (the users keep their own references)"""
+        self._entries.clear()
+        self.resident = 0
+
+    def report(self) -> list[AssetReport]:
+        """Every cached asset, biggest first"""
+        reports = [AssetReport(name, entry.size, len(entry.owners)) for name, entry in self._entries.items()]
+        return sorted(reports, key=lambda report: report.size, reverse=True)
@@ -0,0 +1,237 @@
+"""
+Baked asset packs
+
+Decoding PNGs and OGGs, then scaling and rotating them, happens every run otherwise.
+The packs have all of that done already: pack.bin has pixels at the in-game scale (and portal frames
+in every rotation) in the display's pixel format, sounds.bin has sounds decoded to raw samples
+in the mixer's format. Surfaces are made straight over the memory-mapped pack, without copying or converting.
+
+Like compiled levels, a pack starts with a hash of what it was made from (the asset files, and the
+mixer format for sounds), and gets baked again automatically when that changes.
+Sounds are a pack of their own so running without sound (see simulation) doesn't invalidate the images,
+and sounds.bin only gets baked once there is a mixer. To bake both ahead of time:
+
+    python -m portaler.asset_pack
+
+Anything that isn't in the pack is loaded the usual way (see sprites_and_sounds).
+
+Layout, little endian:
+ - header: magic, format version, sha1 of the sources
+ - entries: count, then per entry: ENTRY and the key (1 byte length + utf-8)
+ - data: pixels (BGRA, rows top to bottom) and samples, each one starting on an ALIGNMENT boundary
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import struct
+from collections.abc import Callable, Iterator
+from enum import IntEnum
+from pathlib import Path
+
+import pygame
+
+from .assets import ASSETS_DIRECTORY, SOUND_DIRECTORY, SPRITES_DIRECTORY, write_atomically
+from .const import TILE_SIZE
+
+FORMAT_VERSION = 1
+MAGIC = b"PAST"
+PACK_PATH = ASSETS_DIRECTORY / "pack.bin"
+SOUND_PACK_PATH = ASSETS_DIRECTORY / "sounds.bin"
+
+HEADER = struct.Struct("<4sH20s")  # magic, version, source hash
+COUNT = struct.Struct("<I")
+ENTRY = struct.Struct("<BHHII")  # kind, width, height (0 for sounds), data offset, data length
+ALIGNMENT = 16
+
+SCALE = TILE_SIZE // 16  # sprites are drawn 16 pixels to a tile
+
+# what the game asks for: (path, scale) sheets and (path, frame count, scale, rotation) animation frames
+IMAGES = [
+    (path, SCALE)
+    for path in (
+        "walls.png",
+        "button.png",
+        "cube.png",
+        "lifter.png",
+        "one-way-platform.png",
+        "player.png",
+        "pressure-door.png",
+    )
+]
+FRAMES = [("finish.png", 2, SCALE, 0)] + [
+    (f"portals/portal{i}.png", 7, SCALE, rotation) for i in range(1, 13) for rotation in (0, 90, 180, 270)
+]
+
+
+class EntryKind(IntEnum):
+    IMAGE = 1
+    SOUND = 2
+
+
+def image_key(path: str, scale: int) -> str:
+    return f"{path}@{scale}"
+
+
+def frames_key(path: str, frame_count: int, scale: int, rotation: int) -> str:
+    """Key of a strip of animation frames, each one scaled and rotated in place"""
+    return f"{path}@{scale}/{frame_count}r{rotation % 360}"
+
+
+Entries = Iterator[tuple[str, EntryKind, int, int, bytes]]  # key, kind, width, height, data
+
+
+def image_paths() -> list[Path]:
+    return sorted(SPRITES_DIRECTORY.rglob("*.png"))
+
+
+def sound_paths() -> list[Path]:
+    return sorted(SOUND_DIRECTORY.glob("*.ogg"))
+
+
+def mixer_format() -> bytes:
+    """The format sounds get decoded to, part of the hash of the sound pack"""
+    return repr(pygame.mixer.get_init()).encode()
+
+
+def source_hash(paths: list[Path], extra: bytes = b"") -> bytes:
+    """Hash of asset files, and of anything else their baked version depends on"""
+    digest = hashlib.sha1(struct.pack("<H", FORMAT_VERSION))
+    digest.update(extra)
+    for path in paths:
+        digest.update(path.relative_to(ASSETS_DIRECTORY).as_posix().encode())
+        source = path.read_bytes()
+        digest.update(COUNT.pack(len(source)))
+        digest.update(source)
+    return digest.digest()
+
+
+def frame_strip(sheet: pygame.Surface, frame_count: int, scale: int, rotation: int) -> pygame.Surface:
+    """The frames of a vertical strip, scaled and rotated, stacked into a new strip"""
+    frame_height = sheet.height // frame_count
+    frames = [
+        pygame.transform.rotate(
+            pygame.transform.scale_by(
+                sheet.subsurface((0, i * frame_height, sheet.width, frame_height)), scale
+            ),
+            rotation,
+        )
+        for i in range(frame_count)
+    ]
+    strip = pygame.Surface((frames[0].width, frames[0].height * frame_count), pygame.SRCALPHA)
+    strip.fblits([(frame, (0, i * frame.height)) for i, frame in enumerate(frames)])
+    return strip
+
+
+def image_entries() -> Entries:
+    for path, scale in IMAGES:
+        surface = pygame.transform.scale_by(pygame.image.load(SPRITES_DIRECTORY / path), scale)
+        yield image_key(path, scale), EntryKind.IMAGE, *surface.size, pygame.image.tobytes(surface, "BGRA")
+    for path, frame_count, scale, rotation in FRAMES:
+        strip = frame_strip(pygame.image.load(SPRITES_DIRECTORY / path), frame_count, scale, rotation)
+        key = frames_key(path, frame_count, scale, rotation)
+        yield key, EntryKind.IMAGE, *strip.size, pygame.image.tobytes(strip, "BGRA")
+
+
+def sound_entries() -> Entries:
+    """Samples in the format the mixer is in now, they don't make sense in any other"""
+    for sound_path in sound_paths():
+        yield sound_path.name, EntryKind.SOUND, 0, 0, pygame.mixer.Sound(sound_path).get_raw()
+
+
+def bake(entries_of: Callable[[], Entries], digest: bytes) -> bytes:
+    entries = list(entries_of())
+    offset = HEADER.size + COUNT.size + sum(ENTRY.size + 1 + len(key.encode()) for key, *_ in entries)
+    table = [COUNT.pack(len(entries))]
+    data: list[bytes] = []
+    for name, kind, width, height, payload in entries:
+        key = name.encode()
+        padding = -offset % ALIGNMENT
+        offset += padding
+        table.append(ENTRY.pack(kind, width, height, offset, len(payload)) + bytes([len(key)]) + key)
+        data += [bytes(padding), payload]
+        offset += len(payload)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, digest)
+    return b"".join([header, *table, *data])
+
+
+class AssetPack:
+    """Reads a baked pack from a buffer (memory-mapped file or bytes), the surfaces point into it"""
+
+    def __init__(self, buffer: mmap.mmap | bytes) -> None:
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        magic, version, self.source_hash = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not an asset pack of version {FORMAT_VERSION}")
+        self.entries: dict[str, tuple[int, int, int, int, int]] = {}
+        (count,) = COUNT.unpack_from(buffer, HEADER.size)
+        offset = HEADER.size + COUNT.size
+        for _ in range(count):
+            entry = ENTRY.unpack_from(buffer, offset)
+            offset += ENTRY.size
+            length = buffer[offset]
+            self.entries[bytes(buffer[offset + 1 : offset + 1 + length]).decode()] = entry
+            offset += 1 + length
+
+    def image(self, key: str) -> pygame.Surface | None:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != EntryKind.IMAGE:
+            return None
+        _, width, height, offset, length = entry
+        return pygame.image.frombuffer(self.view[offset : offset + length], (width, height), "BGRA")
+
+    def sound(self, key: str) -> pygame.Sound | None:
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != EntryKind.SOUND:
+            return None
+        _, _, _, offset, length = entry
+        return pygame.mixer.Sound(buffer=self.view[offset : offset + length])
+
+
+def _open(path: Path, digest: bytes, entries_of: Callable[[], Entries]) -> AssetPack:
+    """A pack, baked first if it's missing or out of date. Stays mapped for as long as the game runs"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        header = b""
+    if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, FORMAT_VERSION, digest):
+        baked = bake(entries_of, digest)
+        try:
+            write_atomically(path, baked)
+        except OSError:
+            # read only install
+            return AssetPack(baked)
+    with open(path, "rb") as f:
+        try:
+            # copy on write, drawing onto a packed surface by accident just changes this process's copy
+            return AssetPack(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+        except (OSError, ValueError):
+            # no mmap here (web)
+            return AssetPack(f.read())
+
+
+def open_pack() -> AssetPack:
+    """The image pack"""
+    return _open(PACK_PATH, source_hash(image_paths()), image_entries)
+
+
+def open_sound_pack() -> AssetPack:
+    """The sound pack, for the format the mixer is in. The mixer has to be initialized"""
+    return _open(SOUND_PACK_PATH, source_hash(sound_paths(), mixer_format()), sound_entries)
+
+
+def main() -> None:
+    pygame.mixer.init()
+    for path, paths, extra, entries_of in (
+        (PACK_PATH, image_paths(), b"", image_entries),
+        (SOUND_PACK_PATH, sound_paths(), mixer_format(), sound_entries),
+    ):
+        write_atomically(path, bake(entries_of, source_hash(paths, extra)))
+        print(f"{path.name}: {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
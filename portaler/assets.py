@@ -1,6 +1,22 @@
+import os
 from pathlib import Path
 
 ASSETS_DIRECTORY = Path(__file__).parent / "assets"
 SPRITES_DIRECTORY = ASSETS_DIRECTORY / "sprites"
 SOUND_DIRECTORY = ASSETS_DIRECTORY / "sound"
 LEVEL_DIRECTORY = ASSETS_DIRECTORY / "level"
+
+
+def write_atomically(path: Path, data: bytes) -> None:
+    """
+    Replace a file all at once, for files other processes may have memory-mapped (packs, compiled levels)
+
+    Writing over it in place would change (or truncate) the pages under them. This way they keep the old
+    file until they open it again. Other processes writing the same file at the same time don't mix either.
+    """
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        temporary.write_bytes(data)
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
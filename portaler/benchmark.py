@@ -0,0 +1,162 @@
+"""
+Physics benchmark
+
+Runs a level without a window for a number of physics steps, with nobody pressing anything,
+and reports how long a step takes and how much memory a step goes through.
+
+    python -m portaler.benchmark [level] [steps]
+
+"peak" is how far memory use rose above the start of the step at its highest (tracemalloc).
+"allocs" is how many memory blocks the collision code (COLLISION_FILES) allocated during the step,
+followed by the lines that allocated the most. See AllocationCounter for what it does and doesn't see.
+It exits with an error if any step allocated more than ALLOCATION_BUDGET blocks.
+"""
+
+import asyncio
+import os
+import sys
+import tracemalloc
+from collections import Counter
+from time import perf_counter
+from types import FrameType
+from typing import Any
+
+import pygame
+
+COLLISION_FILES = ("physics.py", "spatial.py", "broadphase.py")
+ALLOCATION_BUDGET = 40  # blocks the collision code may allocate in one step, the worst level is at about 30
+
+
+class AllocationCounter:
+    """
+    Counts the memory blocks allocated by the code in some files, by line
+
+    CPython only tells how many blocks are in use right now, so this traces every bytecode instruction
+    in those files and counts what that went up by since the instruction before
+    (anything called from there counts for the line it was called from).
+    It's a lower bound: something made and freed within one instruction, like the temporary in a * b + c,
+    doesn't show up, and neither do floats and tuples that were reused from a free list.
+    Tracing is slow, the step times don't mean much while it's on.
+    """
+
+    def __init__(self, files: tuple[str, ...]) -> None:
+        self.files = files
+        self.lines: Counter[tuple[str, int]] = Counter()  # (file name, line number): blocks
+        self.worst = 0  # most blocks allocated between a start and a stop
+        self._started_at = 0
+        self._blocks = 0
+        self._line: tuple[str, int] | None = None
+        # returning a bound method makes a new one every time, which would get counted
+        self._trace_line = self._trace
+
+    def start(self) -> None:
+        self._line = None
+        self._started_at = self.total
+        self._blocks = sys.getallocatedblocks()
+        sys.settrace(self._trace_call)
+
+    def stop(self) -> None:
+        sys.settrace(None)
+        self.worst = max(self.worst, self.total - self._started_at)
+
+    def reset(self) -> None:
+        self.lines.clear()
+        self.worst = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.lines.values())
+
+    def _counted(self, frame: FrameType | None) -> bool:
+        return frame is not None and frame.f_code.co_filename.endswith(self.files)
+
+    def _trace_call(self, frame: FrameType, event: str, arg: Any) -> Any:
+        if frame.f_trace is None:
+            self._blocks += 1  # the frame object tracing just made for it, resumed generators have one
+        if self._counted(frame):
+            frame.f_trace_opcodes = True
+            return self._trace(frame, event, arg)
+        frame.f_trace_lines = False
+        return _ignore
+
+    def _trace(self, frame: FrameType, event: str, arg: Any) -> Any:
+        blocks = sys.getallocatedblocks()
+        if blocks > self._blocks and self._line is not None:
+            self.lines[self._line] += blocks - self._blocks
+        if event == "return" and not self._counted(frame.f_back):
+            self._line = None  # back to code that isn't counted
+        else:
+            self._line = os.path.basename(frame.f_code.co_filename), frame.f_lineno
+        # both ints from getallocatedblocks are freed before the next instruction, the new one isn't
+        self._blocks = sys.getallocatedblocks() - 1
+        return self._trace_line
+
+
+def _ignore(frame: FrameType, event: str, arg: Any) -> Any:
+    return _ignore
+
+
+async def _run(game, steps: int) -> None:
+    for _ in range(steps):
+        await game.update_physics()
+
+
+async def _measure_memory(game, steps: int) -> float:
+    peak = 0
+    tracemalloc.start()
+    for _ in range(steps):
+        tracemalloc.reset_peak()
+        current_before = tracemalloc.get_traced_memory()[0]
+        await game.update_physics()
+        peak += tracemalloc.get_traced_memory()[1] - current_before
+    tracemalloc.stop()
+    return peak / steps
+
+
+async def _count_allocations(game, steps: int) -> AllocationCounter:
+    counter = AllocationCounter(COLLISION_FILES)
+    # the first traced step sets up tracing in every function it goes through, that isn't the step's doing
+    counter.start()
+    await game.update_physics()
+    counter.stop()
+    counter.reset()
+    for _ in range(steps):
+        counter.start()
+        await game.update_physics()
+        counter.stop()
+    return counter
+
+
+def main(level_count: int = 1, steps: int = 600) -> None:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))  # images get converted while loading
+
+    from .gameplay.level import Level
+    from .main import Game
+
+    game = Game()
+    level = Level(game)
+    level.level_count = level_count
+    game.state_stack.append(level)
+    level.init()
+
+    asyncio.run(_run(game, 60))  # let things settle
+    start = perf_counter()
+    asyncio.run(_run(game, steps))
+    step_time = (perf_counter() - start) / steps
+    peak = asyncio.run(_measure_memory(game, steps))
+    counter = asyncio.run(_count_allocations(game, steps))
+    print(
+        f"level {level_count}: {step_time * 1000:.3f} ms/step, "
+        f"{peak:.0f} B peak/step, {counter.total / steps:.1f} allocs/step"
+    )
+    for (file_name, line), blocks in counter.lines.most_common(5):
+        print(f"  {blocks / steps:6.1f} {file_name}:{line}")
+    if counter.worst > ALLOCATION_BUDGET:
+        sys.exit(f"a step allocated {counter.worst} blocks, the budget is {ALLOCATION_BUDGET}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
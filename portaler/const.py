@@ -28,14 +28,33 @@ TILE_SIZE = 32  # 32px
 PHYSICS_FPS: int = 120
 RENDER_FPS: int = 60
 INPUT_FPS: int = 500
+TIME_SCALE: float = 1.0  # game seconds per real second. 0.25 is slow motion, math.inf as fast as it goes
+DETERMINISTIC = False  # physics only depends on the inputs, hashed every step (see gameplay.determinism)
+RENDER_THREAD = False  # draw on a thread of its own, from snapshots physics publishes (see Game)
 
 GRAVITY: tuple[int, int] = (0, 1000)  # acceleration for Physics sprites
 MAX_SPEED: float = 2000  # max speed of physics sprites
 AIR_CONTROLS_REDUCTION = 0.4  # how much control a dynamic physics object has when moving in the air
 HORIZONTAL_YEET_ANGLE: float = 15.0  # angle of elevation for horizontal yeets
 
-MAX_COLLISION_OFFSET = TILE_SIZE * 1.5  # largest offset used to resolve collisions
-# Must be large enough to get unstuck from closing door, small enough to not clip through tiles
+MAX_COLLISION_OFFSET = TILE_SIZE * 0.75  # largest offset used to resolve collisions
+# Must be larger than one physics step of travel at MAX_SPEED, small enough to not clip through tiles.
+# Doors and lifters push things out of the way themselves (see ContactSolver.carry),
+# and bodies come out of portals just a pixel into the exit portal
+
+MAX_SUBSTEP_TRAVEL = 0.25  # fraction of a tile (or of a smaller sprite) a body may move in one substep
+MAX_SUBSTEPS = 8  # substeps per physics step are capped, MAX_SPEED only needs 3 for a tile sized body
+
+ACTIVITY_MARGIN = TILE_SIZE * 8  # how far outside the camera (on its target) things are simulated every step
+INACTIVE_STEP_INTERVAL = 8  # doors and lifters outside of that are only stepped every this many steps
+
+CONTACT_ITERATIONS = 4  # max passes over touching dynamic bodies per physics step (keeps big piles cheap)
+
+# streamed levels (see streaming)
+STREAM_PREFETCH_MARGIN = TILE_SIZE * 24  # chunks this far outside the camera get loaded in the background
+STREAM_CHUNK_BUDGET = 64  # chunks kept loaded, the least recently used ones outside the margin get unloaded
+
+ASSET_CACHE_BUDGET = 32 * 1024 * 1024  # bytes of images and sounds, unused ones get evicted past it
 
 
 class Actions(Enum):  # ROB LITERALLY SAID NOT TO PUT ENUMS IN HERE LMAOO
@@ -63,12 +82,12 @@ DEFAULT_KEYBINDINGS = {
     Actions.TOGGLE_MUTE: [pygame.K_m],
 }
 
-# reserve channels for sounds
-DOOR_CHANNEL = 1
-BUTTON_CHANNEL = 2
-LIFTER_CHANNEL = 3
+# sound channels (see gameplay.audio), the first RESERVED_CHANNELS only play what is asked for on them
+SOUND_CHANNELS = 16
+BUTTON_CHANNEL = 0
+LOOP_CHANNELS = range(1, 4)  # for looping sounds (doors, lifters), one channel per sound
 
-RESERVED_CHANNELS = [DOOR_CHANNEL, BUTTON_CHANNEL]
+RESERVED_CHANNELS = 4
 
 
 ## Util functions ##
@@ -0,0 +1,148 @@
+"""
+Simulation level of detail
+
+Only the part of the level around the camera target is simulated every physics step
+(what the camera would show right on it, see Camera.follow_view, never what the last frame showed:
+that depends on when frames got drawn).
+Outside of it, dynamic bodies and sensors are frozen in place,
+and mechanisms (doors, lifters) are stepped every few steps with the time they missed.
+
+Actors (the player) are always active, even if the camera can't keep up with them.
+Sprites outside get promoted back when something inside depends on them:
+the twin of an active portal, bodies going through an active portal,
+mechanisms wired to an active button, and throwables held by an active body.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pygame
+
+from ..const import ACTIVITY_MARGIN, INACTIVE_STEP_INTERVAL
+from ..interfaces import PhysicsType
+
+if TYPE_CHECKING:
+    from .physics import PhysicsSprite
+    from .portal import PortalRegistry
+    from .registry import EntityRegistry
+
+
+class ActivityRegion:
+    """
+    Picks which physics sprites get stepped, and with what dt
+
+    What's inside comes from the spatial grids of the level, the sprites near the region only.
+    Everything else is kept between steps and only redone when what's active changes.
+    """
+
+    def __init__(self, margin: float = ACTIVITY_MARGIN, inactive_interval: int = INACTIVE_STEP_INTERVAL):
+        self.margin = margin  # how far around the view things are still simulated
+        self.inactive_interval = inactive_interval  # step mechanisms outside every this many steps
+        self.steps: list[tuple[PhysicsSprite, float]] = []  # (sprite, dt) to step this physics step
+        self.dynamic: list[PhysicsSprite] = []  # active dynamic bodies
+        self.active: set[PhysicsSprite] = set()  # sprites simulated every step
+        self.inactive: list[PhysicsSprite] = []  # mechanisms outside, stepped every inactive_interval steps
+        self._order: list[PhysicsSprite] = []  # active sprites, in the order of the physics group
+        self._members: list[PhysicsSprite] | None = None  # physics group members _order was made from
+        self._inside: set[PhysicsSprite] = set()  # scratch, what's active this step
+        self._region = pygame.FRect()
+        self._missed: dict[PhysicsSprite, float] = {}  # time mechanisms outside haven't been stepped for
+        self._steps_dt: float | None = None  # dt steps was made for, None if it has to be made again
+        self._step_count = 0
+
+    def update(
+        self, entities: EntityRegistry, view: pygame.FRect | None, portals: PortalRegistry, dt: float
+    ) -> None:
+        """Sort sprites into active and inactive ones, for a view (None means everything is active)"""
+        self._step_count += 1
+        inside = self._inside
+        inside.clear()
+        if view is None:
+            inside.update(entities.physics)
+        else:
+            region = self._region
+            region.update(view)
+            region.inflate_ip(2 * self.margin, 2 * self.margin)
+            for grid in (entities.static, entities.dynamic, entities.triggers, entities.portals):
+                for sprite in grid.query(region):
+                    if region.colliderect(sprite.collision_box):
+                        inside.add(sprite)
+            inside.update(entities.actors)
+            self._promote(inside, entities, portals)
+
+        members = entities.physics.members
+        if inside != self.active or members is not self._members:
+            self.active, self._inside = inside, self.active
+            self._sort(members)
+
+        missed = self._missed
+        for sprite in self.inactive:
+            missed[sprite] = missed.get(sprite, 0.0) + dt
+        due = self._step_count % self.inactive_interval == 0
+        if due or dt != self._steps_dt:
+            self._make_steps(dt, due)
+
+    def _sort(self, members: list[PhysicsSprite]) -> None:
+        """Redo the lists kept between steps, after what's active or the physics group changed"""
+        self._members = members
+        active = self.active
+        self._order.clear()
+        self.dynamic.clear()
+        self.inactive.clear()
+        for sprite in members:
+            if sprite in active:
+                self._order.append(sprite)
+                if sprite.physics_type == PhysicsType.DYNAMIC:
+                    self.dynamic.append(sprite)
+            elif sprite.physics_type == PhysicsType.ACTIVATED:
+                self.inactive.append(sprite)
+        for sprite in [sprite for sprite in self._missed if not sprite.alive()]:
+            del self._missed[sprite]
+        self._steps_dt = None
+
+    def _make_steps(self, dt: float, due: bool) -> None:
+        steps = self.steps
+        steps.clear()
+        missed = self._missed
+        caught_up = False
+        for sprite in self._order:
+            if sprite in missed:
+                # catch up on whatever was missed while outside
+                steps.append((sprite, dt + missed.pop(sprite)))
+                caught_up = True
+            else:
+                steps.append((sprite, dt))
+        if due:
+            for sprite in self.inactive:
+                steps.append((sprite, missed[sprite]))
+                missed[sprite] = 0.0
+        # steps with time missed in them are only good for this one step
+        self._steps_dt = None if caught_up or due else dt
+
+    @staticmethod
+    def _promote(active: set[PhysicsSprite], entities: EntityRegistry, portals: PortalRegistry) -> None:
+        # portal pairs first, bodies going through them depend on both ends
+        for portal in entities.portals:
+            if portal in active:
+                link = portals.link(portal)
+                if link is not None:
+                    active.add(link[0])
+        for trigger in entities.triggers:
+            if trigger in active:
+                active.update(trigger.linked_to)
+        for body in entities.dynamic:
+            if body in active or body.in_portal in active or body.out_portal in active:
+                active.add(body)
+                if body.current_throwable is not None:
+                    active.add(body.current_throwable)
+
+    def clear(self) -> None:
+        self.steps.clear()
+        self.dynamic.clear()
+        self.active.clear()
+        self.inactive.clear()
+        self._order.clear()
+        self._members = None
+        self._missed.clear()
+        self._steps_dt = None
@@ -1,11 +1,26 @@
 import pygame
 
-from .sprites_and_sounds import get_image
+from .sprites_and_sounds import get_frames, get_image
+
+
+class AnimationClock:
+    """The time a level's animations run on. The level advances it once per physics step"""
+
+    __slots__ = ("time",)
+
+    def __init__(self) -> None:
+        self.time = 0.0
+
+    def tick(self, dt: float) -> None:
+        self.time += dt
 
 
 class Animation:
+    __slots__ = ("clock", "frames", "fps", "loop_type", "start")
+
     def __init__(
         self,
+        clock: AnimationClock,
         spritesheet_path: str,
         fps: int,
         single_frame_rect: pygame.typing.RectLike = (0, 0, -1, -1),
@@ -17,16 +32,17 @@ class Animation:
         """
         YEAAH, FINALLY SOMETHING I UNDERSTAND IN THIS WHOLE CODEBASE
         seriously though, just a primitive animation class
+
+        Nothing to update, the frame to show comes straight from the clock (the level's).
+        The frames are shared by every animation of the same sheet, rect, scale and rotation.
         """
         self.frames = self._get_animation(
             spritesheet_path, single_frame_rect, frame_count, scale_factor, rotation
         )
-        self.time_since_last_framce_change = 0.0
-        self.current_time = 0.0
+        self.clock = clock
         self.fps = fps
-        self.spf = 1 / self.fps
-        self.current_frame_idx = 0
-        self.loop_type = loop_type
+        self.loop_type = loop_type  # "wrap" starts over, anything else stops on the last frame
+        self.start = clock.time  # starts on the first frame
 
     def _get_animation(
         self,
@@ -35,50 +51,29 @@ class Animation:
         frame_count: int,
         scale_factor: int,
         rotation: int,
-    ):
-        spritesheet = get_image(spritesheet_path)
+    ) -> list[pygame.Surface]:
         frame_rect = pygame.Rect(frame_rect)
+        no_rect = frame_rect == pygame.Rect(0, 0, -1, -1)
 
-        if frame_count == -1 and frame_rect == pygame.Rect(0, 0, -1, -1):
+        if frame_count == -1 and no_rect:
             raise Exception(
                 "invalid animation information! specify either a single frame rect or a number of frames!"
             )
 
-        if frame_count == -1:  # if no frame count was given, iterate through the whole spritesheet
-            frame_count = spritesheet.height // frame_rect.height
-        elif frame_rect == pygame.Rect(
-            0,
-            0,
-            -1,
-            -1,
-        ):  # if no rect was given, calculate it using the number of frames
-            frame_rect = pygame.Rect(0, 0, spritesheet.width, spritesheet.height // frame_count)
-
-        frames = []
-
-        for i in range(frame_count):
-            frame = spritesheet.subsurface(
-                (
-                    frame_rect.x,
-                    frame_rect.height * i,
-                    frame_rect.width,
-                    frame_rect.height,
-                )
-            )
-            frame = pygame.transform.scale_by(frame, scale_factor)
-            frame = pygame.transform.rotate(frame, rotation)
-            frames.append(frame)
-
-        return frames
+        if no_rect:
+            # whole width frames (and baked in the pack)
+            return get_frames(spritesheet_path, frame_count, scale_factor, rotation)
 
-    def update(self, dt):
-        self.current_time += dt
-        while self.current_time - self.time_since_last_framce_change > self.spf:
-            self.time_since_last_framce_change += self.spf
-            self.current_frame_idx += 1
+        if frame_count == -1:  # if no frame count was given, iterate through the whole spritesheet
+            frame_count = get_image(spritesheet_path).height // frame_rect.height
+        return get_frames(spritesheet_path, frame_count, scale_factor, rotation, frame_rect)
 
+    @property
+    def current_frame_idx(self) -> int:
+        index = int((self.clock.time - self.start) * self.fps)
         if self.loop_type == "wrap":
-            self.current_frame_idx = self.current_frame_idx % len(self.frames)
+            return index % len(self.frames)
+        return min(index, len(self.frames) - 1)
 
-    def get_frame(self):  # not used (yet)
+    def get_frame(self) -> pygame.Surface:
         return self.frames[self.current_frame_idx]
@@ -0,0 +1,129 @@
+"""
+Audio
+
+Gameplay code doesn't touch the mixer. It queues what should be heard on its level's queue
+(Level.audio, the game's audio unless the level runs headless), and the game's queue is played
+once per frame (see Game.render_loop), so neither physics nor drawing ever waits on the mixer.
+
+- play: one shot sounds. A sound queued more than once in a frame plays once, at the loudest volume.
+- start_loop and stop_loop: sounds that keep playing for as long as any of their sources want them
+  (moving doors and lifters). However many sources there are, a looping sound only takes one channel,
+  from the pool of loop channels.
+
+Volume is set on the channel, never on the sound, which is shared by everything that plays it.
+Every sound gets decoded on a background thread when a level loads (see preload),
+so the first jump or teleport doesn't stall on it.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from weakref import WeakKeyDictionary
+
+import pygame
+
+from ..assets import SOUND_DIRECTORY
+from ..const import LOOP_CHANNELS
+from ..env import PYGBAG
+from .sprites_and_sounds import assets, decode_sound, get_sound, get_sound_pack
+
+
+class AudioQueue:
+    """Sounds to play, and looping sounds to keep playing, until the next update"""
+
+    def __init__(self) -> None:
+        self.mute = False
+        self._shots: dict[tuple[str, int | None], float] = {}  # (sound, channel id) -> volume
+        self._loops: dict[str, WeakKeyDictionary[object, float]] = {}  # sound -> source -> volume
+        self._loop_channels: dict[str, pygame.Channel] = {}  # looping sounds that are playing
+        self._free_channels = list(reversed(LOOP_CHANNELS))
+        self._decoding: dict[str, Future[pygame.Sound]] = {}
+        # no threads on web, sounds get decoded right away there
+        self._executor = None if PYGBAG else ThreadPoolExecutor(1, thread_name_prefix="audio")
+
+    def preload(self) -> None:
+        """Start decoding every sound that isn't cached yet"""
+        if not pygame.mixer.get_init():
+            return
+        pack = get_sound_pack()  # here, the decoding thread only reads it
+        for path in sorted(SOUND_DIRECTORY.glob("*.ogg")):
+            name = path.name
+            if name in assets or name in self._decoding:
+                continue
+            if self._executor is None:
+                get_sound(name)
+            else:
+                self._decoding[name] = self._executor.submit(decode_sound, pack, name)
+
+    def sound(self, name: str) -> pygame.Sound:
+        future = self._decoding.pop(name, None)
+        if future is None:
+            return get_sound(name)
+        # waits for the background thread if it isn't done yet
+        return assets.get(name, future.result)
+
+    def play(self, name: str, channel_id: int | None = None, volume: float = 1.0) -> None:
+        """Queue a sound with the given name, to play on the given channel.
+
+        name is the file name in the sound directory.
+        channel_id is the id of the channel to play it on, cutting off what was playing there.
+        Defaults to none, meaning a free channel is used.
+        """
+        key = (name, channel_id)
+        self._shots[key] = max(volume, self._shots.get(key, 0.0))
+
+    def start_loop(self, source: object, name: str, volume: float = 1.0) -> None:
+        """Keep playing a sound for source, until stop_loop (or source is gone)"""
+        self._loops.setdefault(name, WeakKeyDictionary())[source] = volume
+
+    def stop_loop(self, source: object, name: str) -> None:
+        sources = self._loops.get(name)
+        if sources is not None:
+            sources.pop(source, None)
+
+    def stop_loops(self) -> None:
+        """Stop every looping sound, at the next update"""
+        for sources in self._loops.values():
+            sources.clear()
+
+    def update(self) -> None:
+        """Play what was queued since the last update"""
+        for name, future in list(self._decoding.items()):
+            if future.done():
+                self.sound(name)  # into the cache
+
+        shots, self._shots = self._shots, {}
+        if not pygame.mixer.get_init():
+            return
+        if not self.mute:
+            for (name, channel_id), volume in shots.items():
+                sound = self.sound(name)
+                if channel_id is None:
+                    channel = sound.play()  # on any channel that isn't reserved, None if all are busy
+                else:
+                    channel = pygame.Channel(channel_id)
+                    channel.play(sound)
+                if channel is not None:
+                    channel.set_volume(volume)
+        self._update_loops()
+
+    def _update_loops(self) -> None:
+        for name, sources in self._loops.items():
+            channel = self._loop_channels.get(name)
+            if self.mute or not sources:
+                if channel is not None:
+                    channel.stop()
+                    del self._loop_channels[name]
+                    self._free_channels.append(channel.id)
+                continue
+            if channel is None:
+                if not self._free_channels:
+                    continue  # more sounds looping than there are channels, this one waits
+                channel = pygame.Channel(self._free_channels.pop())
+                channel.play(self.sound(name), loops=-1)
+                self._loop_channels[name] = channel
+            channel.set_volume(max(sources.values()))
+
+
+audio = AudioQueue()
+"""The game's queue, the one that gets played"""
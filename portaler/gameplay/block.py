@@ -1,22 +1,37 @@
 import pygame
 
 from ..const import TILE_SIZE
-from ..interfaces import THROWABLE_TYPE_INTO_WEIGHT, PhysicsType, SpriteInitData, SpritePhysicsData
+from ..interfaces import (
+    DrawLayer,
+    SpriteInitData,
+)
+from . import presets
 from .physics import PhysicsSprite
-from .sprites_and_sounds import get_image
+from .sprites_and_sounds import get_region
 
 
 class Block(PhysicsSprite):
-    """Static block that you run into"""
+    """Static block that you run into, drawn as a bunch of tiles"""
+
+    __slots__ = ("tiles",)
+
+    draw_layer = DrawLayer.WALLS
 
     def __init__(self, data: SpriteInitData):
-        physics_data = SpritePhysicsData(physics_type=PhysicsType.STATIC)
         data.groups.extend(["render", "physics", "static-physics"])
-        super().__init__(data, physics_data)
-        self.surface = data.properties["surface"]
+        super().__init__(data, presets.WALL)
+        # (surface, position relative to my topleft)
+        self.tiles: list[tuple[pygame.Surface, tuple[float, float]]] = data.properties["tiles"]
+
+    def snapshot(self) -> tuple[float, float]:
+        return self.rect.topleft
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float):
-        surface.blit(self.surface, self.rect.move(-offset))
+    def draw_snapshot(
+        self, topleft: tuple[float, float], surface: pygame.Surface, offset: pygame.Vector2, dt: float
+    ) -> None:
+        x = topleft[0] - offset.x
+        y = topleft[1] - offset.y
+        surface.fblits([(tile, (x + tile_x, y + tile_y)) for tile, (tile_x, tile_y) in self.tiles])
 
 
 class OneWayBlock(PhysicsSprite):
@@ -26,45 +41,52 @@ class OneWayBlock(PhysicsSprite):
     The height affects the thickness of the platform for collision purposes.
     """
 
+    __slots__ = ()
+
+    draw_layer = DrawLayer.PLATFORMS
+
     def __init__(self, data: SpriteInitData):
-        physics_data = SpritePhysicsData(physics_type=PhysicsType.STATIC, one_way=True)
         data.groups.extend(["render", "physics", "static-physics"])
-        super().__init__(data, physics_data)
+        super().__init__(data, presets.ONE_WAY_PLATFORM)
 
         width = int(data.rect[2] / TILE_SIZE)
+        scale_factor = TILE_SIZE // 16  # 16 is the width of a segment in the unscaled image
         self.image = pygame.Surface(
-            (width * 16, 16), pygame.SRCALPHA
+            (width * TILE_SIZE, 16 * scale_factor), pygame.SRCALPHA
         )  # this forgotten SRCALPHA flag costed me 30 mins of debugging >:[
-        spritesheet = get_image("one-way-platform.png")
+
+        def segment(x: int) -> pygame.Surface:
+            return get_region("one-way-platform.png", (x, 0, 16, 16), scale_factor)
 
         if width == 1:
-            self.image.blit(spritesheet.subsurface((48, 0, 16, 16)), (0, 0))
+            self.image.blit(segment(48), (0, 0))
         else:
             for i in range(width):
                 if i == 0:  # left-most bit of the platform
-                    self.image.blit(spritesheet.subsurface((0, 0, 16, 16)), (16 * i, 0))
+                    self.image.blit(segment(0), (TILE_SIZE * i, 0))
                 elif i == (width - 1):  # right-most bit of the platform
-                    self.image.blit(spritesheet.subsurface((32, 0, 16, 16)), (16 * i, 0))
+                    self.image.blit(segment(32), (TILE_SIZE * i, 0))
                 else:  # middle segment of the platform
-                    self.image.blit(spritesheet.subsurface((16, 0, 16, 16)), (16 * i, 0))
-        scale_factor = data.rect[2] // self.image.width
-        self.image = pygame.transform.scale_by(self.image, scale_factor).convert_alpha()
+                    self.image.blit(segment(16), (TILE_SIZE * i, 0))
+
+    def snapshot(self) -> pygame.FRect:
+        return self.rect.copy()
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float) -> None:
-        surface.blit(self.image, self.rect.move(-offset))
+    def draw_snapshot(
+        self, rect: pygame.FRect, surface: pygame.Surface, offset: pygame.Vector2, dt: float
+    ) -> None:
+        surface.blit(self.image, rect.move(-offset))
 
 
 class ThrowableBlock(PhysicsSprite):
     """Meant for being picked up and thrown"""
 
-    def __init__(self, data: SpriteInitData):
-        physics_data = SpritePhysicsData(
-            physics_type=PhysicsType.DYNAMIC,
-            weight=THROWABLE_TYPE_INTO_WEIGHT[data.properties["id"]],
-        )
+    __slots__ = ()
 
+    draw_layer = DrawLayer.THROWABLES
+
+    def __init__(self, data: SpriteInitData):
         data.groups.extend(["render", "physics", "dynamic-physics", "throwable-physics"])
-        super().__init__(data, physics_data)
-        self.image = get_image("cube.png").subsurface((data.properties["id"] * 16, 0, 16, 16))
-        scale_factor = self.rect.width // 16  # 16 is the width of the unscaled sprite
-        self.image = pygame.transform.scale_by(self.image, scale_factor)
+        super().__init__(data, presets.THROWABLES[data.properties["id"]])
+        scale_factor = int(self.rect.width // 16)  # 16 is the width of the unscaled sprite
+        self.image = get_region("cube.png", (data.properties["id"] * 16, 0, 16, 16), scale_factor)
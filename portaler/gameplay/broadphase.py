@@ -0,0 +1,210 @@
+"""
+Sweep-and-prune broadphase
+
+Once per physics step, dynamic bodies and sensor volumes (portals, triggers) are sorted along the x axis
+and swept to find every body/sensor and body/body pair whose bounding boxes overlap.
+Sensors then only run their narrow phase against those candidates,
+instead of every sensor looking at every dynamic sprite,
+and the contact solver only looks at bodies that are actually close to each other.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .physics import PhysicsSprite
+
+_NO_CANDIDATES: list[PhysicsSprite] = []
+
+
+class _Slot:
+    """Where a body or sensor was this step, one per sprite, reused every step"""
+
+    __slots__ = (
+        "sprite",
+        "is_sensor",
+        "left",
+        "right",
+        "top",
+        "bottom",
+        "order",
+        "category",
+        "mask",
+        "fresh",
+        "candidates",
+    )
+
+    def __init__(self, sprite: PhysicsSprite, is_sensor: bool) -> None:
+        self.sprite = sprite
+        self.is_sensor = is_sensor
+        self.left = self.right = self.top = self.bottom = 0.0
+        self.order = 0  # bodies in the order they were given, then sensors. Breaks ties when sorting
+        self.category = self.mask = 0
+        self.fresh = False  # flips every step, slots that didn't get refreshed are of sprites that are gone
+        self.candidates: list[PhysicsSprite] = []  # bodies overlapping me, if I'm a sensor
+
+    def refresh(self, order: int, fresh: bool) -> None:
+        sprite = self.sprite
+        rect = sprite.collision_box
+        self.left = rect.left
+        self.right = rect.right
+        self.top = rect.top
+        self.bottom = rect.bottom
+        self.order = order
+        self.category = sprite.collision_category
+        self.mask = sprite.collision_mask
+        self.fresh = fresh
+        if self.candidates:
+            self.candidates.clear()
+
+
+def _sort(slots: list[_Slot]) -> None:
+    """
+    Sort by left edge in place, ties by order
+
+    Insertion sort, things barely move between steps so the slots are nearly sorted already.
+    """
+    for i in range(1, len(slots)):
+        slot = slots[i]
+        left = slot.left
+        order = slot.order
+        j = i - 1
+        while j >= 0 and (slots[j].left > left or (slots[j].left == left and slots[j].order > order)):
+            slots[j + 1] = slots[j]
+            j -= 1
+        slots[j + 1] = slot
+
+
+def _prune(active: list[_Slot], count: int, left: float) -> int:
+    """Drop the slots that end before left from the first count, keeping the order of the rest"""
+    kept = 0
+    i = 0
+    while i < count:
+        other = active[i]
+        if other.right >= left:
+            active[kept] = other
+            kept += 1
+        i += 1
+    return kept
+
+
+class SweepAndPrune:
+    """Finds overlapping (sensor, dynamic body) and (dynamic body, dynamic body) pairs along the x axis."""
+
+    def __init__(self) -> None:
+        # reused between steps, so a step with the same bodies and sensors as the last one makes nothing new
+        self._slots: dict[PhysicsSprite, _Slot] = {}
+        self._sorted: list[_Slot] = []  # by left edge
+        # the slots still open during the sweep are the first few of these, the rest is just filler,
+        # they are as long as _sorted so they never grow mid-sweep
+        self._active_bodies: list[_Slot] = []
+        self._active_sensors: list[_Slot] = []
+        self._fresh = False
+        self.body_pairs: list[tuple[PhysicsSprite, PhysicsSprite]] = []  # in sweep order
+
+    def update(self, bodies: Iterable[PhysicsSprite], sensors: Iterable[PhysicsSprite]) -> None:
+        """Rebuild the candidate pairs from the current positions of bodies and sensors"""
+        fresh = self._fresh = not self._fresh
+        order = 0
+        for body in bodies:
+            self._slot(body, False).refresh(order, fresh)
+            order += 1
+        for sensor in sensors:
+            self._slot(sensor, True).refresh(order, fresh)
+            order += 1
+        if order != len(self._sorted):
+            self._drop_stale(fresh)
+        _sort(self._sorted)
+
+        self.body_pairs.clear()
+        self._sweep(self._sorted)
+
+        slots = self._slots
+        for slot in self._sorted:
+            candidates = slot.candidates
+            if len(candidates) < 2:
+                continue
+            # keep the order the bodies were given in, not the order they were swept in
+            for i in range(1, len(candidates)):
+                body = candidates[i]
+                order = slots[body].order
+                j = i - 1
+                while j >= 0 and slots[candidates[j]].order > order:
+                    candidates[j + 1] = candidates[j]
+                    j -= 1
+                candidates[j + 1] = body
+
+    def _slot(self, sprite: PhysicsSprite, is_sensor: bool) -> _Slot:
+        slot = self._slots.get(sprite)
+        if slot is None:
+            slot = self._slots[sprite] = _Slot(sprite, is_sensor)
+            self._sorted.append(slot)
+            self._active_bodies.append(slot)
+            self._active_sensors.append(slot)
+        return slot
+
+    def _drop_stale(self, fresh: bool) -> None:
+        """Forget the sprites that weren't given this step"""
+        self._sorted[:] = [slot for slot in self._sorted if slot.fresh == fresh]
+        for sprite in [sprite for sprite, slot in self._slots.items() if slot.fresh != fresh]:
+            del self._slots[sprite]
+        self._active_bodies[:] = self._sorted
+        self._active_sensors[:] = self._sorted
+
+    def _sweep(self, slots: list[_Slot]) -> None:
+        # the loops over the open slots index instead of iterating, an iterator is an allocation,
+        # and there are two of them for every slot
+        active_bodies = self._active_bodies
+        active_sensors = self._active_sensors
+        body_count = sensor_count = 0
+        body_pairs = self.body_pairs
+        for slot in slots:
+            left = slot.left
+            top = slot.top
+            bottom = slot.bottom
+            category = slot.category
+            mask = slot.mask
+            # drop everything that ends before this one starts (touching still counts, to be safe)
+            body_count = _prune(active_bodies, body_count, left)
+            sensor_count = _prune(active_sensors, sensor_count, left)
+            # sensors only pair up with bodies, bodies with both (bodies first, like they always were)
+            i = 0
+            while i < body_count:
+                other = active_bodies[i]
+                i += 1
+                # collision layers are checked first, they are cheaper than the overlap test
+                if not (
+                    category & other.mask
+                    and other.category & mask
+                    and other.top <= bottom
+                    and top <= other.bottom
+                ):
+                    continue
+                if slot.is_sensor:
+                    slot.candidates.append(other.sprite)
+                else:
+                    body_pairs.append((other.sprite, slot.sprite))
+            if slot.is_sensor:
+                active_sensors[sensor_count] = slot
+                sensor_count += 1
+                continue
+            i = 0
+            while i < sensor_count:
+                sensor = active_sensors[i]
+                i += 1
+                if (
+                    category & sensor.mask
+                    and sensor.category & mask
+                    and sensor.top <= bottom
+                    and top <= sensor.bottom
+                ):
+                    sensor.candidates.append(slot.sprite)
+            active_bodies[body_count] = slot
+            body_count += 1
+
+    def candidates(self, sensor: PhysicsSprite) -> list[PhysicsSprite]:
+        """Dynamic bodies whose bounding boxes overlap the sensor, in the order they were given"""
+        slot = self._slots.get(sensor)
+        return _NO_CANDIDATES if slot is None else slot.candidates
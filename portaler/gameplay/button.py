@@ -1,33 +1,31 @@
 import pygame
 
 from ..const import BUTTON_CHANNEL
-from ..interfaces import PhysicsType, SpriteInitData, SpriteInterface, SpritePhysicsData
+from ..interfaces import SpriteInitData, SpriteInterface
+from . import presets
 from .animation import Animation
 from .physics import PhysicsSprite
 from .player import Player  # used to separate normal object from player object
-from .sprites_and_sounds import get_image, play_sound
+from .sprites_and_sounds import get_region
 
 
 class Button(PhysicsSprite):
+    __slots__ = ("states", "state", "previous_state", "sound_names")
+
     def __init__(self, data: SpriteInitData):
         """
         A simple mechanism, designed to activate complex machinery inside the facility.
         """
-        physics_data = SpritePhysicsData(physics_type=PhysicsType.TRIGGER)
         # sprite will be added to these groups later
-        data.groups.extend(["physics", "render", "triggerable"])
-        super().__init__(data, physics_data)
+        data.groups.extend(["physics", "render", "trigger-physics"])
+        super().__init__(data, presets.BUTTON)
 
         self.linked_to: list[PhysicsSprite] = data.properties["linked-to"]
 
-        scale_factor = data.rect[2] // 32  # 32 is the width of the sprite in the unscaled image
+        scale_factor = int(data.rect[2] // 32)  # 32 is the width of the sprite in the unscaled image
         self.states = {
-            "rest": pygame.transform.scale_by(
-                get_image("button.png").subsurface((0, 0, 32, 16)), scale_factor
-            ),
-            "triggered": pygame.transform.scale_by(
-                get_image("button.png").subsurface((32, 0, 32, 16)), scale_factor
-            ),
+            "rest": get_region("button.png", (0, 0, 32, 16), scale_factor),
+            "triggered": get_region("button.png", (32, 0, 32, 16), scale_factor),
         }
         self.state = "rest"
         self.image = self.states[self.state]
@@ -39,14 +37,24 @@ class Button(PhysicsSprite):
             "unpress": "unpress.ogg",
         }
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float) -> None:
-        surface.blit(self.states[self.state], self.rect.move(-offset))
+    def snapshot(self) -> tuple[pygame.Surface, pygame.FRect]:
+        return self.states[self.state], self.rect.copy()
+
+    def draw_snapshot(
+        self,
+        snapshot: tuple[pygame.Surface, pygame.FRect],
+        surface: pygame.Surface,
+        offset: pygame.Vector2,
+        dt: float,
+    ) -> None:
+        image, rect = snapshot
+        surface.blit(image, rect.move(-offset))
 
     def trigger(self, other: SpriteInterface | None):
         self.state = "triggered"
 
         if self.previous_state != self.state:
-            play_sound(self.sound_names["press"], BUTTON_CHANNEL)
+            self.level.audio.play(self.sound_names["press"], BUTTON_CHANNEL)
 
         for activator in self.linked_to:
             activator.trigger(self)
@@ -57,7 +65,7 @@ class Button(PhysicsSprite):
         self.state = "rest"
 
         if self.previous_state != self.state:
-            play_sound(self.sound_names["unpress"], BUTTON_CHANNEL)
+            self.level.audio.play(self.sound_names["unpress"], BUTTON_CHANNEL)
 
         for activator in self.linked_to:
             activator.untrigger(self)
@@ -66,30 +74,33 @@ class Button(PhysicsSprite):
 
 
 class FinishButton(PhysicsSprite):
+    __slots__ = ("animation", "data")
+
     def __init__(self, data: SpriteInitData):
         """
         A simple mechanism, designed to activate complex machinery inside the facility.
         """
-        physics_data = SpritePhysicsData(physics_type=PhysicsType.TRIGGER)
         # sprite will be added to these groups later
-        data.groups.extend(["physics", "render", "triggerable"])
-        super().__init__(data, physics_data)
-        self.animation = Animation("finish.png", 10, frame_count=2, scale_factor=2)
+        data.groups.extend(["physics", "render", "trigger-physics"])
+        super().__init__(data, presets.FINISH)  # only the player can finish a level
+        self.animation = Animation(self.level.clock, "finish.png", 10, frame_count=2, scale_factor=2)
         self.data = data
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float) -> None:
-        self.animation.update(dt_since_physics)
-        surface.blit(self.animation.get_frame(), self.rect.move(-offset))
+    def snapshot(self) -> tuple[pygame.Surface, pygame.FRect]:
+        return self.animation.get_frame(), self.rect.copy()
+
+    def draw_snapshot(
+        self,
+        snapshot: tuple[pygame.Surface, pygame.FRect],
+        surface: pygame.Surface,
+        offset: pygame.Vector2,
+        dt: float,
+    ) -> None:
+        frame, rect = snapshot
+        surface.blit(frame, rect.move(-offset))
 
     def trigger(self, other: SpriteInterface | None):
         # only trigger if the player touched the finish flag
         if isinstance(other, Player):
-            self.data.level.game.state_stack.pop()
-            play_sound("finish.ogg")
-
-            from .level import Level
-
-            next_level = Level(self.data.level.game)
-            next_level.level_count = self.data.level.level_count + 1
-            self.data.level.game.state_stack.append(next_level)
-            next_level.init()
+            self.level.audio.play("finish.ogg")
+            self.data.level.game.finish_level(self.data.level)
@@ -1,16 +1,32 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 import pygame
 
+from .sprite_list import SpriteList
+
 if TYPE_CHECKING:
     from ..interfaces import SpriteInterface
 
+_draw_layer = attrgetter("draw_layer")
+
+
+class CameraSnapshot(NamedTuple):
+    """Everything the camera draws, as it was after a physics step"""
+
+    members: list[tuple[SpriteInterface, Any]]  # sprite and its snapshot, in drawing order
+    target: tuple[tuple[float, float], tuple[float, float]] | None  # position and velocity of the target
+    offset: tuple[float, float]  # where the camera was looking
 
-class Camera(pygame.sprite.Group):
+
+class Camera(SpriteList):
     """
     Camera group, meant for following a specific sprite while rendering
+
+    Draws sprites by their draw_layer, so sprites streamed in later still end up under the walls and such.
+    The camera only moves when a snapshot is taken, drawing one can be on the render thread.
     """
 
     def __init__(self) -> None:
@@ -20,22 +36,71 @@ class Camera(pygame.sprite.Group):
         self.view_range: pygame.FRect | None = None
         self.scale: float = 1.0  # value greater than 1.0 is zoomed in
 
+    @property
+    def members(self) -> list[Any]:
+        members = self._members
+        if members is None:
+            # sorted is stable, same layer stays in the order added
+            members = self._members = sorted(self.spritedict, key=_draw_layer)
+        return members
+
+    def snapshot(self, size: tuple[int, int]) -> CameraSnapshot:
+        """Follow the target on a size surface as it is now, and take a snapshot of everything"""
+        target = None
+        if self.target is not None:
+            # physics sprites keep moving between steps
+            velocity = getattr(self.target, "velocity", (0.0, 0.0))
+            target = (self.target.pos, (velocity[0], velocity[1]))
+            self._follow(self.offset, target[0], size)
+        members = [(sprite, sprite.snapshot()) for sprite in self.members]
+        return CameraSnapshot(members, target, (self.offset.x, self.offset.y))
+
     def draw(self, surface: pygame.Surface, dt_since_physics: float) -> None:  # type: ignore[override]
+        self.draw_snapshot(surface, self.snapshot(surface.size), dt_since_physics)
+
+    def draw_snapshot(
+        self, surface: pygame.Surface, snapshot: CameraSnapshot, dt_since_physics: float
+    ) -> None:
+        """Draw a snapshot, on whichever thread renders. Doesn't change the camera or anything else"""
         scale = self.scale
         drawing_surface = (
             surface
             if scale == 1.0
             else pygame.Surface((round(surface.width / scale), round(surface.height / scale)))
         )
-        cam = drawing_surface.get_frect(center=self.offset)
-        if self.target is not None:
-            pos = self.target.interpolated_pos(dt_since_physics) - self.offset
-            view_frect = drawing_surface.get_frect(center=(0, 0))
-            view_frect.scale_by_ip(0.25)
-            self.offset.x += min(pos.x - view_frect.left, 0) + max(pos.x - view_frect.right, 0)
-            self.offset.y += min(pos.y - view_frect.top, 0) + max(pos.y - view_frect.bottom, 0)
+        # where the target got to since, without moving the camera itself
+        follow = pygame.Vector2(snapshot.offset)
+        if snapshot.target is not None:
+            target_pos, velocity = snapshot.target
+            pos = pygame.Vector2(target_pos) + pygame.Vector2(velocity) * dt_since_physics
+            self._follow(follow, pos, surface.size)
+        cam = drawing_surface.get_frect(center=follow)
+
+        self._limit(cam)
 
-        # Limit the camera within the boundary of the view_range
+        # Offset the camera to the center of the screen and round it,
+        # because there are sprites with fractional position
+        # and due to rounding errors, they would appear jittery
+        offset = round(pygame.Vector2(cam.topleft))
+        # This doesn't seem to be the case for now, but if that's the case, use the code above.
+        # offset = pygame.Vector2(cam.topleft)  # maybe for now use the fixing one
+
+        for sprite, sprite_snapshot in snapshot.members:
+            sprite.draw_snapshot(sprite_snapshot, drawing_surface, offset, dt_since_physics)
+        if scale != 1.0:
+            pygame.transform.scale(drawing_surface, surface.size, surface)
+
+    def _follow(self, offset: pygame.Vector2, target_pos: Any, size: tuple[int, int]) -> None:
+        """Move offset just enough for target_pos to be in the middle quarter of a size surface"""
+        pos = pygame.Vector2(target_pos) - offset
+        view_frect = pygame.FRect(0, 0, round(size[0] / self.scale), round(size[1] / self.scale))
+        view_frect.center = 0, 0
+        view_frect.scale_by_ip(0.25)
+        offset.x += min(pos.x - view_frect.left, 0) + max(pos.x - view_frect.right, 0)
+        offset.y += min(pos.y - view_frect.top, 0) + max(pos.y - view_frect.bottom, 0)
+
+    def _limit(self, cam: pygame.FRect) -> None:
+        """Limit the camera within the boundary of the view_range"""
         if self.view_range is not None:
             if cam.width > self.view_range.width:
                 cam.centerx = self.view_range.centerx
@@ -48,17 +113,19 @@ class Camera(pygame.sprite.Group):
                 cam.top = max(cam.top, self.view_range.top)
                 cam.bottom = min(cam.bottom, self.view_range.bottom)
 
-        # Offset the camera to the center of the screen and round it,
-        # because there are sprites with fractional position
-        # and due to rounding errors, they would appear jittery
-        offset = round(pygame.Vector2(cam.topleft))
-        # This doesn't seem to be the case for now, but if that's the case, use the code above.
-        # offset = pygame.Vector2(cam.topleft)  # maybe for now use the fixing one
+    def follow_view(self, size: tuple[int, int]) -> pygame.FRect | None:
+        """
+        The part of the level a size surface shows with the camera right on its target (None without one)
 
-        for sprite in self.sprites():
-            sprite.draw(drawing_surface, offset, dt_since_physics)
-        if scale != 1.0:
-            pygame.transform.scale(drawing_surface, surface.size, surface)
+        Only depends on the physics state, unlike view, which depends on when frames got drawn.
+        The drawn view trails the target by at most an eighth of its size.
+        """
+        if self.target is None:
+            return None
+        cam = pygame.FRect(0, 0, size[0] / self.scale, size[1] / self.scale)
+        cam.center = self.target.pos
+        self._limit(cam)
+        return cam
 
     def set_target(self, target: SpriteInterface) -> None:
         self.target = target
@@ -0,0 +1,39 @@
+"""
+Control commands of physics sprites
+
+Whatever controls a sprite (player input, a replay, the network, some AI) issues commands to its buffer,
+the sprite runs them in act(). Both sides only ever deal with one int per physics step.
+"""
+
+from ..interfaces import Command
+
+
+class CommandBuffer:
+    """Commands waiting for a sprite's next act(), and the ones it already ran this step"""
+
+    __slots__ = ("issued", "used")
+
+    def __init__(self) -> None:
+        self.issued: int = 0  # waiting to be run
+        self.used: int = 0  # already run this step, each command runs at most once a step
+
+    def issue(self, commands: Command | int) -> None:
+        self.issued |= commands
+
+    def take(self) -> int:
+        """Commands to run this step, starts a new step"""
+        commands = self.issued
+        self.issued = 0
+        self.used = 0
+        return commands
+
+    def use(self, command: int) -> bool:
+        """Mark a command as run, returns False if it already ran this step"""
+        if self.used & command:
+            return False
+        self.used |= command
+        return True
+
+    def clear(self) -> None:
+        self.issued = 0
+        self.used = 0
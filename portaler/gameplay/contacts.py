@@ -0,0 +1,216 @@
+"""
+Contact resolution between dynamic bodies
+
+Pushes overlapping dynamic bodies (player, throwables) apart along the axis they overlap the least on.
+How far each one moves depends on its weight, so light blocks get shoved around and heavy ones don't.
+Bodies standing on the ground can't be pushed into it, and a body that would be pushed into a wall
+stays put while the other one takes the whole correction.
+
+Mechanisms (doors, lifters) are kinematic: nothing pushes them back,
+they carry the bodies standing on them and push the bodies in their way by exactly how far they moved,
+in whatever direction that was.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING
+
+import pygame
+
+from ..const import CONTACT_ITERATIONS
+from ..interfaces import Axis
+
+if TYPE_CHECKING:
+    from .physics import PhysicsSprite
+
+
+class ContactSolver:
+    """Resolves the dynamic body pairs found by the broadphase"""
+
+    def __init__(self, iterations: int = CONTACT_ITERATIONS) -> None:
+        self.iterations = iterations  # budget of passes over all pairs, per physics step
+        # scratch rects for carry
+        self._before = pygame.FRect()
+        self._rect = pygame.FRect()
+
+    def solve(self, pairs: Sequence[tuple[PhysicsSprite, PhysicsSprite]], dt: float) -> None:
+        for _ in range(self.iterations):
+            resolved = False
+            for body_a, body_b in pairs:
+                if self._ignored(body_a, body_b):
+                    continue
+                resolved = self._resolve(body_a, body_b, dt) or resolved
+            if not resolved:
+                # everything is separated
+                return
+
+    def carry(self, mechanism: PhysicsSprite, bodies: Iterable[PhysicsSprite], dt: float) -> None:
+        """
+        Move dynamic bodies along with a mechanism that moved this step, whichever way it went
+
+        Bodies standing on it ride along, bodies its leading edges ran into are pushed just out of it.
+        Only the part of a body outside of portals counts, so a body halfway out of an exit portal
+        is carried and pushed like any other.
+        Anything stuck deeper than one step of movement is left to the usual collision resolution.
+        """
+        move_x, move_y = mechanism.displacement
+        after = mechanism.collision_box
+        before = self._before
+        before.update(after)
+        before.move_ip(-move_x, -move_y)
+        rect = self._rect
+        tolerance = 0.5  # same as the ground check of dynamic sprites
+        for body in bodies:
+            if not (
+                body.collision_category & mechanism.collision_mask
+                and mechanism.collision_category & body.collision_mask
+            ):
+                continue
+            body.clipped_collision_rect(rect)
+            if not rect.width or not rect.height:
+                # all of it is inside a portal
+                continue
+            # mechanism rects are whole pixels, so bodies can sink up to a pixel into them unnoticed
+            if (
+                min(rect.right, before.right) > max(rect.left, before.left)
+                and -tolerance <= rect.bottom - before.top < 1
+            ):
+                # standing on it, ride along and stay on top
+                if move_x:
+                    self._push(body, Axis.HORIZONTAL, move_x, dt)
+                offset = move_y if move_y > 0 else after.top - rect.bottom
+                if not self._push(body, Axis.VERTICAL, offset, dt) and move_y < 0:
+                    self._squeeze(body, after, Axis.HORIZONTAL, dt)
+                continue
+            if not rect.colliderect(after):
+                continue
+            push = self._way_out(rect, after, move_x, move_y)
+            if push is None:
+                continue
+            axis, offset = push
+            if not self._push(body, axis, offset, dt):
+                # pushed into a wall, squeeze out of the side of the mechanism instead
+                self._squeeze(body, after, axis.opposite, dt)
+
+    @staticmethod
+    def _way_out(
+        rect: pygame.FRect, mechanism_rect: pygame.Rect | pygame.FRect, move_x: float, move_y: float
+    ) -> tuple[Axis, float] | None:
+        """
+        Shortest push out of a mechanism through one of the edges it moved this step
+
+        None if the body is in deeper than the mechanism moved (plus a pixel), it didn't just run into it.
+        """
+        way_out = None
+        for axis, move in ((Axis.HORIZONTAL, move_x), (Axis.VERTICAL, move_y)):
+            if move > 0:
+                offset = mechanism_rect[axis] + mechanism_rect.size[axis] - rect[axis]
+                if offset > move + 1:
+                    continue
+            elif move < 0:
+                offset = mechanism_rect[axis] - rect[axis] - rect.size[axis]
+                if offset < move - 1:
+                    continue
+            else:
+                continue
+            if way_out is None or abs(offset) < abs(way_out[1]):
+                way_out = axis, offset
+        return way_out
+
+    def _squeeze(
+        self, body: PhysicsSprite, mechanism_rect: pygame.Rect | pygame.FRect, axis: Axis, dt: float
+    ) -> None:
+        rect = body.clipped_collision_rect(self._rect)
+        if axis == Axis.HORIZONTAL:
+            options = mechanism_rect.right - rect.left, mechanism_rect.left - rect.right
+        else:
+            options = mechanism_rect.bottom - rect.top, mechanism_rect.top - rect.bottom
+        for offset in sorted(options, key=abs):
+            if self._push(body, axis, offset, dt):
+                return
+
+    @staticmethod
+    def _ignored(body_a: PhysicsSprite, body_b: PhysicsSprite) -> bool:
+        # held throwables sit inside their holder
+        if body_a.picker_upper is body_b or body_b.picker_upper is body_a:
+            return True
+        # collision rects are clipped by portals, don't bother
+        return body_a.portal_state != body_a.PortalState.OUT or body_b.portal_state != body_b.PortalState.OUT
+
+    def _resolve(self, body_a: PhysicsSprite, body_b: PhysicsSprite, dt: float) -> bool:
+        """Separate two bodies, returns whether they were overlapping"""
+        rect_a = body_a.collision_box
+        rect_b = body_b.collision_box
+        if not rect_a.colliderect(rect_b):
+            self._check_resting(body_a, body_b)
+            return False
+        overlap_x = min(rect_a.right, rect_b.right) - max(rect_a.left, rect_b.left)
+        overlap_y = min(rect_a.bottom, rect_b.bottom) - max(rect_a.top, rect_b.top)
+        axis = Axis.HORIZONTAL if overlap_x < overlap_y else Axis.VERTICAL
+        overlap = overlap_x if axis == Axis.HORIZONTAL else overlap_y
+        # make body_b the one further along the axis (the lower one, for vertical contacts)
+        if rect_a.center[axis] > rect_b.center[axis]:
+            body_a, body_b = body_b, body_a
+
+        weight_a = body_a.physics_data.weight
+        weight_b = body_b.physics_data.weight
+        inverse_a = 1 / weight_a
+        inverse_b = 1 / weight_b
+        if axis == Axis.VERTICAL:
+            self._rest(body_a, body_b)
+            if body_b.on_ground:
+                # body_b stands on something static, it can't be pushed down into it
+                inverse_b = 0.0
+
+        share_a = inverse_a / (inverse_a + inverse_b)
+        moved_a = share_a > 0 and self._push(body_a, axis, -overlap * share_a, dt)
+        moved_b = share_a < 1 and self._push(body_b, axis, overlap * (1 - share_a), dt)
+        if not moved_a and share_a > 0:
+            # body_a is against a wall, body_b takes the whole correction
+            moved_b = self._push(body_b, axis, overlap * share_a, dt) or moved_b
+            inverse_a = 0.0
+        if not moved_b and share_a < 1:
+            moved_a = self._push(body_a, axis, -overlap * (1 - share_a), dt) or moved_a
+            inverse_b = 0.0
+
+        # perfectly inelastic: bodies moving into each other end up moving together
+        velocity_a = body_a.velocity[axis]
+        velocity_b = body_b.velocity[axis]
+        if velocity_a > velocity_b:
+            if inverse_a and inverse_b:
+                shared = (velocity_a * weight_a + velocity_b * weight_b) / (weight_a + weight_b)
+            else:
+                # one of them is held in place by something static, so both stop
+                shared = 0.0
+            body_a.velocity[axis] = shared
+            body_b.velocity[axis] = shared
+        return True
+
+    @classmethod
+    def _check_resting(cls, body_a: PhysicsSprite, body_b: PhysicsSprite) -> None:
+        """Bodies right on top of each other without overlapping still rest on each other"""
+        rect_a = body_a.collision_box
+        rect_b = body_b.collision_box
+        if min(rect_a.right, rect_b.right) <= max(rect_a.left, rect_b.left):
+            return
+        tolerance = 0.5  # same as the ground check of dynamic sprites
+        if 0 <= rect_b.top - rect_a.bottom <= tolerance:
+            cls._rest(body_a, body_b)
+        elif 0 <= rect_a.top - rect_b.bottom <= tolerance:
+            cls._rest(body_b, body_a)
+
+    @staticmethod
+    def _rest(upper: PhysicsSprite, lower: PhysicsSprite) -> None:
+        upper.resting_on = lower
+        upper.on_ground = True
+        upper.coyote_time_left = upper.physics_data.coyote_time
+
+    @staticmethod
+    def _push(body: PhysicsSprite, axis: Axis, offset: float, dt: float) -> bool:
+        """Move a body, unless that would push it into something static"""
+        body.rect[axis] += offset
+        if body.is_colliding_static(axis, dt):
+            body.rect[axis] -= offset
+            return False
+        return True
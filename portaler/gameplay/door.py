@@ -1,20 +1,30 @@
 from __future__ import annotations
 
 from math import ceil
-from typing import ClassVar
-from weakref import WeakSet
 
 import pygame
 
-from ..const import DOOR_CHANNEL
-from ..interfaces import Axis, PhysicsType, SpriteInitData, SpriteInterface, SpritePhysicsData
+from ..interfaces import Axis, SpriteInitData, SpriteInterface
+from . import presets
 from .physics import PhysicsSprite
-from .sprites_and_sounds import get_image, play_sound
+from .sprites_and_sounds import get_region
 
 
 class Door(PhysicsSprite):
-    # goofy implementation so that sound works with multiple doors
-    sounding_doors: ClassVar[WeakSet[Door]] = WeakSet()
+    __slots__ = (
+        "state",
+        "max_height",
+        "min_height",
+        "current_height",
+        "image_size",
+        "duration",
+        "segments",
+        "head_rect",
+        "middle_rect",
+        "base_rect",
+        "draw_head",
+        "sound_name",
+    )
 
     def __init__(self, data: SpriteInitData) -> None:
         """
@@ -23,19 +33,15 @@ class Door(PhysicsSprite):
         activate a button, wired up specifically to supress this beast and
         allow others to pass through previously unpassable barrier.
         """
-        physics_data = SpritePhysicsData(
-            physics_type=PhysicsType.ACTIVATED,
-            orientation=data.properties["orientation"],
-        )
         # sprite will be added to these groups later
         data.groups.extend(["physics", "render", "static-physics"])
-        super().__init__(data, physics_data)
+        super().__init__(data, presets.DOOR)
 
         self.orientation = data.properties["orientation"]  # TODO: axis is not direction
         if self.orientation.axis == Axis.VERTICAL:
-            scale_factor = data.rect[2] // 32  # 32 is the width of the sprite in the unscaled image
+            scale_factor = int(data.rect[2] // 32)  # 32 is the width of the sprite in the unscaled image
         else:
-            scale_factor = data.rect[3] // 32
+            scale_factor = int(data.rect[3] // 32)
 
         self.state = "closing"  # possible states: "opening", "closing"
         # HACK: apparently -32 needs to be added to each height
@@ -66,34 +72,59 @@ class Door(PhysicsSprite):
         self.middle_rect = self.rect.copy()
         self.duration = 1.0  # How long it takes to open fully
 
-        spritesheet = get_image("pressure-door.png")
         self.segments = {  # the entire door will be drawn by segments
-            "head": pygame.transform.scale_by(spritesheet.subsurface((0, 0, 32, 16)), scale_factor),
-            "middle": pygame.transform.scale_by(spritesheet.subsurface((0, 16, 32, 16)), scale_factor),
-            "base": pygame.transform.scale_by(spritesheet.subsurface((0, 32, 32, 16)), scale_factor),
-            "tip": pygame.transform.scale_by(spritesheet.subsurface((32, 0, 32, 16)), scale_factor),
-            "light-green": pygame.transform.scale_by(spritesheet.subsurface((32, 16, 32, 16)), scale_factor),
-            "light-red": pygame.transform.scale_by(spritesheet.subsurface((32, 32, 32, 16)), scale_factor),
+            "head": get_region("pressure-door.png", (0, 0, 32, 16), scale_factor),
+            "middle": get_region("pressure-door.png", (0, 16, 32, 16), scale_factor),
+            "base": get_region("pressure-door.png", (0, 32, 32, 16), scale_factor),
+            "tip": get_region("pressure-door.png", (32, 0, 32, 16), scale_factor),
+            "light-green": get_region("pressure-door.png", (32, 16, 32, 16), scale_factor),
+            "light-red": get_region("pressure-door.png", (32, 32, 32, 16), scale_factor),
         }
 
         self.sound_name = "pressure-door.ogg"
 
+        # collision rect, moved in place as the door opens and closes
+        self.collision_box = pygame.Rect()
+        self.update_collision_box()
+
     def update_physics(self, dt: float) -> None:
         super().update_physics(dt)
+        box = self.collision_box
+        before_x, before_y = box.x, box.y
         # change height depending on the state
         total = self.max_height - self.min_height
         offset = total * dt / self.duration
         self.current_height += offset if self.state != "opening" else -offset
         self.current_height = min(max(self.current_height, self.min_height), self.max_height + 0.01)
+        self.update_collision_box()
+        # report the movement, so the level can push and carry things with it
+        self.displacement.update(box.x - before_x, box.y - before_y)
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float) -> None:
+        # one sound for all the doors that are moving
+        if self.min_height < self.current_height < self.max_height:
+            self.level.audio.start_loop(self, self.sound_name, volume=0.25)
+            # TODO: ANNOYING AHH SOUND, PLEASE MAKE A BETTER ONE
+        else:
+            self.level.audio.stop_loop(self, self.sound_name)
+
+    def snapshot(self) -> tuple[pygame.FRect, float, bool]:
+        return self.rect.copy(), self.current_height, self.state == "opening"
+
+    def draw_snapshot(
+        self,
+        snapshot: tuple[pygame.FRect, float, bool],
+        surface: pygame.Surface,
+        offset: pygame.Vector2,
+        dt: float,
+    ) -> None:
+        rect, current_height, opening = snapshot
         door_surface = pygame.Surface(self.image_size, pygame.SRCALPHA)
 
         # draw the bar
-        times_to_draw_middle = ceil(self.current_height / self.segments["middle"].height) - 1
-        door_surface.blit(self.segments["tip"], (0, self.current_height))
+        times_to_draw_middle = ceil(current_height / self.segments["middle"].height) - 1
+        door_surface.blit(self.segments["tip"], (0, current_height))
         for i in range(1, times_to_draw_middle + 2):
-            pos = (0, self.current_height - i * self.segments["middle"].height)
+            pos = (0, current_height - i * self.segments["middle"].height)
             door_surface.blit(self.segments["middle"], pos)
 
         # rotate the bar, so it appears as if the whole thing is lowering
@@ -106,28 +137,17 @@ class Door(PhysicsSprite):
         door_surface.blit(self.segments["base"], self.base_rect)
 
         # draw lights indicating opening and closing
-        if self.state == "opening":
+        if opening:
             door_surface.blit(self.segments["light-green"], self.base_rect)
         else:
             door_surface.blit(self.segments["light-red"], self.base_rect)
 
-        if self.min_height < self.current_height < self.max_height:
-            self.sounding_doors.add(self)
-        else:
-            self.sounding_doors.discard(self)
-        if not self.sounding_doors:
-            pygame.Channel(DOOR_CHANNEL).stop()
-        elif not pygame.Channel(DOOR_CHANNEL).get_busy():
-            # Keep playing sound continuously
-            play_sound(self.sound_name, DOOR_CHANNEL, volume=0.25)
-            # TODO: ANNOYING AHH SOUND, PLEASE MAKE A BETTER ONE
-
         # rotate the thing
         if self.orientation.axis == Axis.HORIZONTAL:
             door_surface = pygame.transform.rotate(door_surface, 90)
 
         # blit everything onto the screen
-        surface.blit(door_surface, self.rect.move(-offset))
+        surface.blit(door_surface, rect.move(-offset))
 
     def trigger(self, other: SpriteInterface | None):
         self.state = "opening"
@@ -137,18 +157,20 @@ class Door(PhysicsSprite):
 
     @property
     def collision_rect(self):
+        return self.collision_box.copy()
+
+    def update_collision_box(self) -> None:
         if self.orientation.axis == Axis.VERTICAL:
-            rect = pygame.Rect(
+            self.collision_box.update(
                 self.rect.left + self.segments["middle"].width // 4,
                 self.rect.bottom - self.current_height - self.segments["tip"].height,
                 self.rect.width // 2,
                 self.current_height + self.segments["tip"].height,
             )
         else:
-            rect = pygame.Rect(
+            self.collision_box.update(
                 self.rect.right - self.current_height - self.segments["tip"].height,
                 self.rect.top + self.segments["middle"].width // 4,
                 self.current_height + self.segments["tip"].height,
                 self.rect.height // 2,
             )
-        return rect
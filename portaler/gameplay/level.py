@@ -1,28 +1,41 @@
-from typing import Coroutine
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Coroutine
 
 import pygame
 from pygame import FRect
 
-from ..const import TILE_SIZE, Actions
-from ..game_input import input_state
+from ..const import TILE_SIZE, WINDOW_RESOLUTION, Actions
+from ..game_input import InputState, input_state
 from ..interfaces import (
     Axis,
     Direction,
     GameInterface,
     GameLevelInterface,
     HeightChangeState,
+    PhysicsType,
     PortalColor,
     SpriteInitData,
     ThrowableType,
 )
+from ..loaders import LevelLoader
 from . import sprites_and_sounds
+from .activity import ActivityRegion
+from .animation import AnimationClock
+from .audio import AudioQueue, audio
 from .block import Block, OneWayBlock, ThrowableBlock
+from .broadphase import SweepAndPrune
 from .button import Button, FinishButton
-from .camera import Camera
+from .contacts import ContactSolver
+from .determinism import hash_state
 from .door import Door
 from .lifter import Lifter
 from .player import Player
-from .portal import Portal
+from .portal import Portal, PortalRegistry
+from .registry import EntityRegistry
+
+if TYPE_CHECKING:
+    from ..streaming import LevelStreamer
 
 
 class Level(GameLevelInterface):
@@ -33,17 +46,23 @@ class Level(GameLevelInterface):
     I didn't want to decide nor spend the time on a map loading stack this early.
     """
 
-    def __init__(self, game: GameInterface):
-        self.groups: dict[str, pygame.sprite.AbstractGroup] = {
-            "render": Camera(),
-            "physics": pygame.sprite.Group(),
-            "static-physics": pygame.sprite.Group(),
-            "dynamic-physics": pygame.sprite.Group(),
-            "trigger-physics": pygame.sprite.Group(),
-            "portal-physics": pygame.sprite.Group(),
-            "actors": pygame.sprite.Group(),
-        }
+    def __init__(
+        self, game: GameInterface, input_source: InputState = input_state, audio_queue: AudioQueue = audio
+    ):
+        self.entities = EntityRegistry()
+        self.groups = self.entities.groups
+        self.broadphase = SweepAndPrune()
+        self.portals = PortalRegistry()
+        self.contacts = ContactSolver()
+        self.activity = ActivityRegion()
+        self.bodies = self.entities.dynamic
+        self.streamer: LevelStreamer | None = None  # for levels loaded in chunks
         self.game: GameInterface = game
+        self.input_source = input_source  # the keyboard, unless something else is playing (see simulation)
+        self.deterministic = game.deterministic
+        self.clock = AnimationClock()
+        self.audio = audio_queue  # the game's, played every frame (a headless level's is never played)
+        self.state_hash = b""  # of the physics state, chained over every step so far (when deterministic)
 
         # 0 for test map
         self.level_count = 1
@@ -58,12 +77,12 @@ class Level(GameLevelInterface):
         I would put map loading here.
         """
 
-        from .. import loaders  # TODO: fix ridiculous circular dependency
-
         if self.level_count > 5:
             self.level_count = 1  # TODO: win screen
 
-        loaders.LevelLoader(str(self.level_count)).load(self)
+        sprites_and_sounds.assets.use(self)
+        LevelLoader(str(self.level_count)).load(self)
+        self.audio.preload()  # after loading, which doesn't wait on the sounds
 
     def restart(self):
         """
@@ -72,10 +91,65 @@ class Level(GameLevelInterface):
         self.empty_all()
         self.init()
 
+    def empty_all(self):
+        super().empty_all()
+        self.release()
+        self.portals.clear()
+        self.activity.clear()
+        self.state_hash = b""
+
+    def release(self):
+        """Close the streamed level file and let the asset cache evict what only this level used"""
+        if self.streamer is not None:
+            self.streamer.close()
+            self.streamer = None
+        self.audio.stop_loops()
+        sprites_and_sounds.assets.release(self)
+
     def add_task(self, task: Coroutine) -> None:
         """Adds task to main game loop"""
         self.game.add_task(task)
 
+    async def update_physics(self, dt: float) -> None:
+        """
+        Update the physics in this level
+
+        Only sprites near the camera target are simulated every step, see ActivityRegion
+        (all of them when deterministic, see determinism).
+        Mechanisms (doors, lifters) move first and carry or push the dynamic bodies in their way.
+        Sensors (portals and triggers) go last, after one broadphase pass over the moved bodies
+        and resolving contacts between dynamic bodies.
+        """
+        # whichever level steps owns what gets loaded (streamed chunks), there can be more than one
+        sprites_and_sounds.assets.use(self)
+        self.clock.tick(dt)
+        if self.streamer is not None:
+            self.streamer.update()
+        view = None if self.deterministic else self.camera.follow_view(WINDOW_RESOLUTION)
+        self.activity.update(self.entities, view, self.portals, dt)
+        dynamic = self.activity.dynamic
+        sensors = []
+        others = []
+        for sprite, sprite_dt in self.activity.steps:
+            if sprite.physics_type in (PhysicsType.PORTAL, PhysicsType.TRIGGER):
+                sensors.append(sprite)
+            elif sprite.physics_type == PhysicsType.ACTIVATED:
+                sprite.update_physics(sprite_dt)
+                if sprite.displacement:
+                    self.contacts.carry(sprite, dynamic, sprite_dt)
+            else:
+                others.append((sprite, sprite_dt))
+        for sprite, sprite_dt in others:
+            sprite.update_physics(sprite_dt)
+        self.broadphase.update(dynamic, sensors)
+        self.contacts.solve(self.broadphase.body_pairs, dt)
+        for sprite in sensors:
+            sprite.update_physics(dt)
+        for sprite in dynamic:
+            self.bodies.move(sprite)
+        if self.deterministic:
+            self.state_hash = hash_state(self.entities.physics, self.state_hash)
+
     def spawn_player(self, pos):
         player = self.spawn(
             Player,
@@ -153,7 +227,7 @@ class Level(GameLevelInterface):
 
         return button
 
-    def spawn_wall(self, pos, size, surface: pygame.Surface):
+    def spawn_wall(self, pos, size, tiles: list[tuple[pygame.Surface, tuple[float, float]]]):
         wall = self.spawn(
             Block,
             SpriteInitData(
@@ -164,7 +238,7 @@ class Level(GameLevelInterface):
                     size[1] * TILE_SIZE,
                 ),
                 level=self,
-                properties={"surface": surface},
+                properties={"tiles": tiles},
             ),
         )
         return wall
@@ -251,7 +325,7 @@ class Level(GameLevelInterface):
         )
 
     def handle_input(self, dt: float) -> None:
-        if input_state.get_just(Actions.RESTART):
+        if self.input_source.get_just(Actions.RESTART):
             self.restart()
-        if input_state.get_just(Actions.TOGGLE_MUTE):
-            sprites_and_sounds.mute = not sprites_and_sounds.mute
+        if self.input_source.get_just(Actions.TOGGLE_MUTE):
+            self.audio.mute = not self.audio.mute
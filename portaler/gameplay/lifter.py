@@ -1,29 +1,41 @@
 from __future__ import annotations
 
-from typing import ClassVar
-from weakref import WeakSet
-
 import pygame
 
-from ..const import LIFTER_CHANNEL, TILE_SIZE
-from ..interfaces import HeightChangeState, PhysicsType, SpriteInitData, SpriteInterface, SpritePhysicsData
+from ..const import TILE_SIZE
+from ..interfaces import (
+    HeightChangeState,
+    SpriteInitData,
+    SpriteInterface,
+)
+from . import presets
 from .physics import PhysicsSprite
-from .sprites_and_sounds import get_image, play_sound
+from .sprites_and_sounds import get_region
 
 
 class Lifter(PhysicsSprite):
-    # goofy implementation so that sound works with multiple lifters
-    sounding_lifters: ClassVar[WeakSet[Lifter]] = WeakSet()
+    __slots__ = (
+        "default_state",
+        "state",
+        "max_height",
+        "min_height",
+        "current_height",
+        "duration",
+        "segments",
+        "sound_name",
+        "image_size",
+        "lifter_platform_image",
+        "beam_image",
+    )
 
     def __init__(self, data: SpriteInitData) -> None:
         """
         A machine of Herculean power.
         Able to lift any object, no matter the weight.
         """
-        physics_data = SpritePhysicsData(physics_type=PhysicsType.ACTIVATED)
         # sprite will be added to these groups later
         data.groups.extend(["physics", "render", "static-physics"])
-        super().__init__(data, physics_data)
+        super().__init__(data, presets.LIFTER)
 
         scale_factor = TILE_SIZE // 16  # 16 is the width of the sprite in the unscaled image
 
@@ -32,34 +44,20 @@ class Lifter(PhysicsSprite):
 
         self.max_height = data.rect[3] - 5 * scale_factor
         self.min_height = -0.01
-        self.current_height = (
-            self.max_height if self.state == HeightChangeState.HIGHTENING else self.min_height
-        )
+        # start where the starting state leaves it (raised for HIGHTENING), not on the way there
+        self.current_height = self.max_height if self.state == HeightChangeState.LOWERING else self.min_height
 
         self.duration = 1.0  # How long it takes to lower/lift fully
 
-        spritesheet = get_image("lifter.png")
         self.segments = {
-            "beam": pygame.transform.scale_by(spritesheet.subsurface((16, 48, 16, 16)), scale_factor),
-            "beam-end": pygame.transform.scale_by(spritesheet.subsurface((16, 32, 16, 16)), scale_factor),
-            "platform-left-smooth": pygame.transform.scale_by(
-                spritesheet.subsurface((0, 27, 16, 16)), scale_factor
-            ),
-            "platfotm-left-sharp": pygame.transform.scale_by(
-                spritesheet.subsurface((0, 11, 16, 16)), scale_factor
-            ),
-            "platform-right-smooth": pygame.transform.scale_by(
-                spritesheet.subsurface((32, 27, 16, 16)), scale_factor
-            ),
-            "platfotm-right-sharp": pygame.transform.scale_by(
-                spritesheet.subsurface((32, 11, 16, 16)), scale_factor
-            ),
-            "platfotm-middle": pygame.transform.scale_by(
-                spritesheet.subsurface((16, 27, 16, 16)), scale_factor
-            ),
-            "platform-singular": pygame.transform.scale_by(
-                spritesheet.subsurface((16, 11, 16, 16)), scale_factor
-            ),
+            "beam": get_region("lifter.png", (16, 48, 16, 16), scale_factor),
+            "beam-end": get_region("lifter.png", (16, 32, 16, 16), scale_factor),
+            "platform-left-smooth": get_region("lifter.png", (0, 27, 16, 16), scale_factor),
+            "platfotm-left-sharp": get_region("lifter.png", (0, 11, 16, 16), scale_factor),
+            "platform-right-smooth": get_region("lifter.png", (32, 27, 16, 16), scale_factor),
+            "platfotm-right-sharp": get_region("lifter.png", (32, 11, 16, 16), scale_factor),
+            "platfotm-middle": get_region("lifter.png", (16, 27, 16, 16), scale_factor),
+            "platform-singular": get_region("lifter.png", (16, 11, 16, 16), scale_factor),
         }
 
         self.sound_name = "pressure-door.ogg"  # for now the same as the door
@@ -98,34 +96,45 @@ class Lifter(PhysicsSprite):
             else:
                 self.beam_image.blit(self.segments["beam"], (0, i * TILE_SIZE))
 
+        # collision rect, moved in place as the platform goes up and down
+        self.collision_box = pygame.Rect()
+        self.update_collision_box()
+
     def update_physics(self, dt: float) -> None:
         super().update_physics(dt)
+        box = self.collision_box
+        before_x, before_y = box.x, box.y
 
         # change height depending on the state
         total = self.max_height - self.min_height
         offset = total * dt / self.duration
         self.current_height += offset if self.state == HeightChangeState.LOWERING else -offset
         self.current_height = min(max(self.current_height, self.min_height), self.max_height + 0.01)
+        self.update_collision_box()
+        # report the movement, so the level can push and carry things with it
+        self.displacement.update(box.x - before_x, box.y - before_y)
+
+        # one sound for all the lifters that are moving
+        if self.min_height < self.current_height < self.max_height:
+            self.level.audio.start_loop(self, self.sound_name, volume=0.25)
+            # TODO: ANNOYING AHH SOUND, PLEASE MAKE A BETTER ONE
+        else:
+            self.level.audio.stop_loop(self, self.sound_name)
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt: float) -> None:
+    def snapshot(self) -> tuple[pygame.FRect, float]:
+        return self.rect.copy(), self.current_height
+
+    def draw_snapshot(
+        self, snapshot: tuple[pygame.FRect, float], surface: pygame.Surface, offset: pygame.Vector2, dt: float
+    ) -> None:
+        rect, current_height = snapshot
         lifter_surface = pygame.Surface(self.image_size, pygame.SRCALPHA)
 
         lifter_surface.blit(self.beam_image, ((lifter_surface.width - self.beam_image.width) // 2, 0))
-        lifter_surface.blit(self.lifter_platform_image, (0, self.current_height))
-
-        if self.min_height < self.current_height < self.max_height:
-            self.sounding_lifters.add(self)
-        else:
-            self.sounding_lifters.discard(self)
-        if not self.sounding_lifters:
-            pygame.Channel(LIFTER_CHANNEL).stop()
-        elif not pygame.Channel(LIFTER_CHANNEL).get_busy():
-            # Keep playing sound continuously
-            play_sound(self.sound_name, LIFTER_CHANNEL, volume=0.25)
-            # TODO: ANNOYING AHH SOUND, PLEASE MAKE A BETTER ONE
+        lifter_surface.blit(self.lifter_platform_image, (0, current_height))
 
         # blit everything onto the screen
-        surface.blit(lifter_surface, self.rect.move(-offset))
+        surface.blit(lifter_surface, rect.move(-offset))
 
     def trigger(self, other: SpriteInterface | None):
         self.state = (
@@ -139,11 +148,13 @@ class Lifter(PhysicsSprite):
 
     @property
     def collision_rect(self):
+        return self.collision_box.copy()
+
+    def update_collision_box(self) -> None:
         scale_factor = TILE_SIZE // 16
-        rect = pygame.Rect(
+        self.collision_box.update(
             self.rect.left,
             self.rect.bottom - (self.max_height - self.current_height + 5 * scale_factor),
             self.rect.width,
             5 * scale_factor,
         )
-        return rect
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from collections.abc import Callable
 from enum import Enum
-from functools import wraps
+from math import ceil, hypot, inf
+from typing import Any, NamedTuple, cast
 
 import pygame
 
@@ -12,11 +12,14 @@ from ..const import (
     HORIZONTAL_YEET_ANGLE,
     MAX_COLLISION_OFFSET,
     MAX_SPEED,
+    MAX_SUBSTEP_TRAVEL,
+    MAX_SUBSTEPS,
     TILE_SIZE,
 )
 from ..interfaces import (
-    DIRECTION_TO_ANGLE,
     Axis,
+    CollisionLayer,
+    Command,
     Direction,
     PhysicsSpriteInterface,
     PhysicsType,
@@ -24,12 +27,15 @@ from ..interfaces import (
     SpriteInterface,
     SpritePhysicsData,
 )
+from .commands import CommandBuffer
 from .sprite import Sprite
-from .sprites_and_sounds import play_sound
+
+# collision rects of doors and lifters are whole pixel rects
+_Rect = pygame.FRect | pygame.Rect
 
 
 def is_aligned_with_portal(
-    collision_rect: pygame.FRect, portal_rect: pygame.FRect, axis: Axis, tolerance: float = 0.0
+    collision_rect: _Rect, portal_rect: _Rect, axis: Axis, tolerance: float = 0.0
 ) -> bool:
     """Returns if a rect is aligned with the portal in its axis"""
     if axis == Axis.VERTICAL:
@@ -43,14 +49,14 @@ def is_aligned_with_portal(
     )
 
 
-def is_inside_portal(collision_rect: pygame.FRect, portal_rect: pygame.FRect, axis: Axis) -> bool:
+def is_inside_portal(collision_rect: _Rect, portal_rect: _Rect, axis: Axis) -> bool:
     """Returns if a rect is inside a portal"""
     if not collision_rect.colliderect(portal_rect):
         return False
     return is_aligned_with_portal(collision_rect, portal_rect, axis)
 
 
-def is_through_portal(collision_rect: pygame.FRect, portal_rect: pygame.FRect, direction: Direction) -> bool:
+def is_through_portal(collision_rect: _Rect, portal_rect: _Rect, direction: Direction) -> bool:
     """Returns if a rect is aligned and behind the back of a portal"""
     if not is_aligned_with_portal(collision_rect, portal_rect, direction.axis):
         return False
@@ -85,6 +91,12 @@ def clip_rect_to_portal(
 ) -> pygame.FRect:
     """Clips a rect to only what you would see if the rect entered a portal"""
     collision_rect = collision_rect.copy()
+    clip_rect_to_portal_ip(collision_rect, portal_rect, direction)
+    return collision_rect
+
+
+def clip_rect_to_portal_ip(collision_rect: pygame.FRect, portal_rect: _Rect, direction: Direction) -> None:
+    """Same as clip_rect_to_portal, but changes collision_rect in place"""
     # to avoid accidental colision with the floor below the portal
     # because I HAVE NO CLUE WHERE THAT ISSUE EVEN STEMS FROM
     collision_offset = 4
@@ -118,21 +130,15 @@ def clip_rect_to_portal(
         if collision_rect.right > portal_rect.right:
             overlap = min(collision_rect.right - portal_rect.right + collision_offset, collision_rect.height)
         collision_rect.width -= overlap
-    return collision_rect
-
 
-def protect(fn: Callable[[PhysicsSprite, float], None]):
-    """
-    Simple wrapper for control command functions to avoid calling them multiple times a physics frame.
-    """
 
-    @wraps(fn)
-    def inner(self, dt: float) -> None:
-        if not self.commands_used.get(fn.__name__, False):
-            self.commands_used[fn.__name__] = True
-            fn(self, dt)
-
-    return inner
+_ONE_WAY = CollisionLayer.ONE_WAY.value
+_THROWABLE = CollisionLayer.THROWABLE.value
+_LEFT = Command.LEFT.value
+_RIGHT = Command.RIGHT.value
+_JUMP = Command.JUMP.value
+_DUCK = Command.DUCK.value
+_INTERACT = Command.INTERACT.value
 
 
 def sign(num):
@@ -140,6 +146,15 @@ def sign(num):
     return (0, -1, 1)[(num != 0) + (num > 0)]
 
 
+class BodySnapshot(NamedTuple):
+    """How a physics sprite looked after a physics step, see PhysicsSprite.draw_snapshot"""
+
+    image: pygame.Surface
+    rect: pygame.FRect
+    velocity: pygame.Vector2
+    portal: tuple[pygame.FRect, Direction] | None  # rect and orientation of the portal it's going through
+
+
 class PhysicsSprite(Sprite, PhysicsSpriteInterface):
     class PortalState(Enum):
         """State of sprite regarding portals"""
@@ -148,47 +163,58 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         EXIT = 2  # exiting a portal
         OUT = 3  # not touching or within a portal
 
+    __slots__ = (
+        "physics_data",
+        "physics_type",
+        "velocity",
+        "orientation",
+        "tunnel_id",
+        "coyote_time_left",
+        "on_ground",
+        "resting_on",
+        "displacement",
+        "linked_to",
+        "collision_category",
+        "collision_mask",
+        "facing",
+        "current_throwable",
+        "picker_upper",
+        "commands",
+        "in_portal",
+        "out_portal",
+        "portal_state",
+        "collision_box",
+        "_probe",
+        "_clip_source",
+        "_clipped_rect",
+        "_clip_version",
+    )
+
+    # the same for every sprite, assign a new value to an instance to change it for that one
+    acceleration: tuple[float, float] = (0, 0)  # Separated from gravity, to not apply gravity when on ground.
+    gravity: tuple[float, float] = GRAVITY  # pixels/second squared (I think)
+    max_holding_distance: float = TILE_SIZE * 1.0  # maximum distance to pick up something, carry it
+
     def __init__(self, data: SpriteInitData, physics_data: SpritePhysicsData):
         super().__init__(data)
+        # tuning (speeds, weight...), usually a preset shared by every sprite of a kind, don't modify it
+        self.physics_data: SpritePhysicsData = physics_data
         self.physics_type: PhysicsType = physics_data.physics_type
         self.velocity: pygame.Vector2 = pygame.Vector2()  # pixels/second
-        self.acceleration: pygame.Vector2 = pygame.Vector2(
-            0
-        )  # Separated from gravity, to not apply gravity when on ground.
-        self.gravity: pygame.Vector2 = pygame.Vector2(GRAVITY)  # pixels/second squared (I think)
-        self.yeet_force: float = physics_data.yeet_force  # how hard the sprite is thrown (if dynamic)
-        self.horizontal_ground_speed: float = (
-            physics_data.horizontal_ground_speed
-        )  # how fast the sprite walks up to, right and left (if dynamic), on ground
-        self.horizontal_ground_acceleration: float = (
-            physics_data.horizontal_ground_acceleration
-        )  # how fast sprite accelerates on ground
-        self.horizontal_air_speed: float = (
-            physics_data.horizontal_air_speed
-        )  # how fast the sprite accelerates up to (from 0) while in the air
-        self.horizontal_air_acceleration: float = (
-            physics_data.horizontal_air_acceleration
-        )  # how fast sprite accelerates in air
-        self.ground_damping: float = (
-            physics_data.ground_damping
-        )  # how quickly the sprite slows down (if dynamic)
-        self.air_damping: float = physics_data.air_damping  # see above, but applied when in the air
-        self.weight: float = physics_data.weight  # unused atm
-        self.jump_speed: float = physics_data.jump_speed  # initial jump velocity (if dynamic)
-        self.duck_speed: float = physics_data.duck_speed  # initial downward duck velocity (if dynamic)
         self.orientation: Direction = physics_data.orientation  # orientation
         self.tunnel_id: str = physics_data.tunnel_id  # used to get twin portal (if portal)
-        self.coyote_time: float = (
-            physics_data.coyote_time
-        )  # time-frame of allowed jumping when disconnected from the ground (if dynamic)
         self.coyote_time_left: float = 0  # see above
         self.on_ground: bool = False  # whether sprite is touching ground (if dynamic)
-        self.one_way: bool = physics_data.one_way  # whether sprite only collides downward (if static)
+        self.resting_on: PhysicsSprite | None = None  # dynamic body I was standing on last step
+        self.displacement: pygame.Vector2 = pygame.Vector2()  # how far my collision rect moved this step
+        self.linked_to: list[PhysicsSprite] = []  # mechanisms I trigger
+        # stored as plain ints, flag enum arithmetic is too slow for the collision loops
+        self.collision_category: int = physics_data.collision_category.value  # what I am
+        self.collision_mask: int = physics_data.collision_mask.value  # what I collide with
         self.facing: pygame.Vector2 = (
             pygame.Vector2()
         )  # the direction the sprite is manually facing (usually <0, 0> for non-player sprites)
 
-        self.max_holding_distance: float = TILE_SIZE * 1.0  # maximum distance to pick up something, carry it
         self.current_throwable: PhysicsSprite | None = (
             None  # the current think you're about to throw at someone        # bro made a gramatikal mistak
         )
@@ -196,40 +222,46 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
 
         # (Latency compensation removed. So unnecessary.)
 
-        # Used to limit control command per physics frame.
-        self.commands_used: dict[str, bool] = {}
+        # control commands, issued by whatever controls me and run in act()
+        self.commands: CommandBuffer = CommandBuffer()
 
         # portal handling
         self.in_portal: PhysicsSprite | None = None  # which portal I am entering
         self.out_portal: PhysicsSprite | None = None  # which portal I am exiting
         self.portal_state: PhysicsSprite.PortalState = self.PortalState.OUT  # what portal state I am in
+        # my collision rect, kept up to date in place so collision checks don't have to copy it.
+        # Read only! Doors and lifters have their own, everything else collides with its rect
+        self.collision_box: _Rect = self.rect
+        self._probe: pygame.FRect = pygame.FRect()  # scratch rect for is_colliding_static
+        # cache for clipped_collision_rect
+        self._clip_source: pygame.FRect = pygame.FRect()  # collision rect the cache was made from
+        self._clipped_rect: pygame.FRect = pygame.FRect()
+        self._clip_version: int = -1  # portal registry version the cache was made with
 
-    def interpolated_clip_rect(self, dt_since_physics: float) -> pygame.FRect:
-        """Use this clip rect during render calls"""
-        if self.portal_state == self.PortalState.OUT:
-            return self.image.get_frect()
-        assert self.engaged_portal is not None
-        collision_rect = self.rect.copy()
-        collision_rect.center = self.interpolated_pos(dt_since_physics)
-        clipped = clip_rect_to_portal(
-            collision_rect, self.engaged_portal.rect, self.engaged_portal.orientation
-        )
-        clipped.move_ip(-collision_rect.x, -collision_rect.y)
-        return clipped
-
-    def clipped_collision_rect(self):
+    def clipped_collision_rect(self, out: pygame.FRect | None = None) -> pygame.FRect:
         """
         Collision rect used in actual collision checking.
 
         Areas that are inside portals are clipped off.
-        """
-        collision_rect = self.collision_rect.copy()
-        for portal in self.level.get_group("portal-physics"):
-            if is_inside_portal(collision_rect, portal.collision_rect, portal.orientation.axis):
-                collision_rect = clip_rect_to_portal(
-                    collision_rect, portal.collision_rect, portal.orientation
-                )
-        return collision_rect
+        Pass out to have the result written into it, instead of getting a new rect.
+
+        The result is cached until my collision rect moves or the level's portals change,
+        so repeated probes within a physics step don't go through every portal again.
+        """
+        box = self.collision_box
+        portals = self.level.portals
+        clipped = self._clipped_rect
+        if box != self._clip_source or self._clip_version != portals.version:
+            self._clip_source.update(box)
+            self._clip_version = portals.version
+            clipped.update(box)
+            for portal in self.level.entities.portals:
+                if is_inside_portal(clipped, portal.collision_box, portal.orientation.axis):
+                    clip_rect_to_portal_ip(clipped, portal.collision_box, portal.orientation)
+        if out is None:
+            return clipped.copy()
+        out.update(clipped)
+        return out
 
     @property
     def engaged_portal(self) -> PhysicsSprite | None:
@@ -262,58 +294,80 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         """
         pass
 
-    @protect
+    def act(self, dt: float) -> None:
+        """Run the commands issued to me since the last step (only called for actors)"""
+        commands = self.commands.take()
+        if not commands:
+            return
+        if commands & _RIGHT:
+            self.right(dt)
+        elif commands & _LEFT:
+            self.left(dt)
+        if commands & _JUMP:
+            self.jump(dt)
+        if commands & _INTERACT:
+            self.interact(dt)
+        if commands & _DUCK:
+            self.duck(dt)
+
     def left(self, dt: float) -> None:
         """If I am dynamic, try to move left until the next frame"""
+        if not self.commands.use(_LEFT):
+            return
         self._move(dt, -1)
 
-    @protect
     def right(self, dt: float) -> None:
         """If I am dynamic, try to move right until the next frame"""
+        if not self.commands.use(_RIGHT):
+            return
         self._move(dt, 1)
 
     def _move(self, dt: float, sign: int) -> None:
         if not dt:
             return
+        tuning = self.physics_data
         if self.on_ground:
             # DO NOT USE dt HERE
-            if self.horizontal_ground_speed > sign * self.velocity.x:
+            if tuning.horizontal_ground_speed > sign * self.velocity.x:
                 self.velocity.x = sign * min(
-                    self.horizontal_ground_speed,
+                    tuning.horizontal_ground_speed,
                     sign * self.velocity.x
-                    + self.horizontal_ground_acceleration * dt * AIR_CONTROLS_REDUCTION,
+                    + tuning.horizontal_ground_acceleration * dt * AIR_CONTROLS_REDUCTION,
                 )
-            # self.velocity.x = sign * self.horizontal_ground_speed
+            # self.velocity.x = sign * tuning.horizontal_ground_speed
         else:
-            if self.horizontal_air_speed > sign * self.velocity.x:
+            if tuning.horizontal_air_speed > sign * self.velocity.x:
                 self.velocity.x = sign * min(
-                    self.horizontal_air_speed,
-                    sign * self.velocity.x + self.horizontal_air_acceleration * dt * AIR_CONTROLS_REDUCTION,
+                    tuning.horizontal_air_speed,
+                    sign * self.velocity.x + tuning.horizontal_air_acceleration * dt * AIR_CONTROLS_REDUCTION,
                 )
 
-    @protect
     def jump(self, dt: float) -> None:
         """If I am dynamic, try to jump"""
+        if not self.commands.use(_JUMP):
+            return
         if self.on_ground or self.coyote_time_left > 0:
-            self.velocity.y = -self.jump_speed  # DO NOT USE dt HERE
+            self.velocity.y = -self.physics_data.jump_speed  # DO NOT USE dt HERE
             self.coyote_time_left = 0
-            play_sound("jump.ogg")
+            self.level.audio.play("jump.ogg")
 
-    @protect
     def duck(self, dt: float) -> None:
         """If I am dynamic, try to duck until the next frame"""
-        if not self.on_ground and self.velocity.y < max(self.duck_speed, 1):
-            self.velocity.y = max(self.duck_speed, self.velocity.y, 1)  # DO NOT USE dt HERE
-            play_sound("slam.ogg")
+        if not self.commands.use(_DUCK):
+            return
+        if not self.on_ground and self.velocity.y < max(self.physics_data.duck_speed, 1):
+            self.velocity.y = max(self.physics_data.duck_speed, self.velocity.y, 1)  # DO NOT USE dt HERE
+            self.level.audio.play("slam.ogg")
 
-    @protect
     def interact(self, dt: float) -> None:
         """Interact with different objects"""
+        if not self.commands.use(_INTERACT):
+            return
         if self.throw(dt):
-            play_sound("throw.ogg")
+            self.level.audio.play("throw.ogg")
             return
         if self.pick_up():
-            play_sound("pickup.ogg")
+            self.level.audio.play("pickup.ogg")
             return
 
     def interpolated_pos(self, dt_since_physics: float) -> tuple[float, float]:
@@ -331,8 +385,8 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         assert self.out_portal is not None
         # If I've gone through the enter portal, switch to the exit one
         if self.portal_state == self.PortalState.ENTER and is_through_portal(
-            self.collision_rect,
-            self.in_portal.collision_rect,
+            self.collision_box,
+            self.in_portal.collision_box,
             self.in_portal.orientation,
         ):
             self.teleport_portal()
@@ -345,7 +399,7 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
             return
         # If I'm not touching any portal, normalize state
         if not is_inside_portal(
-            self.collision_rect, self.engaged_portal.collision_rect, self.engaged_portal.orientation.axis
+            self.collision_box, self.engaged_portal.collision_box, self.engaged_portal.orientation.axis
         ):
             self.resolve_collision(self.engaged_portal.orientation.axis, dt)  # fix clipping
             self.exit_portal()
@@ -371,10 +425,32 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         )  # buddy, what 'Euler integration' and 'latency compensation' are you yapping about
         self.velocity[axis] += self.gravity[axis] * dt
 
-        center = pygame.Vector2(self.rect.center)
-        center[axis] += self.velocity[axis] * dt
-        self.rect.center = center[0], center[1]
-        self.resolve_collision(axis, dt)
+        # fast movement is split up, so nothing goes through walls or skips past portal checks
+        substeps = self.substeps(axis, dt)
+        dt /= substeps
+        substep = 0
+        while substep < substeps:  # not a for over a range, that's two allocations every time
+            if substep and self.portal_state != self.PortalState.OUT:
+                self.handle_dynamic_collision_inside_portal(axis, dt)
+            x, y = self.rect.center
+            if axis == Axis.HORIZONTAL:
+                x += self.velocity.x * dt
+            else:
+                y += self.velocity.y * dt
+            self.rect.center = x, y
+            self.resolve_collision(axis, dt)
+            substep += 1
+
+    def substeps(self, axis: Axis, dt: float) -> int:
+        """
+        How many pieces to split this step's movement along an axis into
+
+        Each piece moves at most MAX_SUBSTEP_TRAVEL of a tile, or of my size if I'm smaller than a tile.
+        """
+        box = self.collision_box
+        size = min(TILE_SIZE, box.width if axis == Axis.HORIZONTAL else box.height) or TILE_SIZE
+        travel = abs(self.velocity[axis]) * dt
+        return min(ceil(travel / (size * MAX_SUBSTEP_TRAVEL)), MAX_SUBSTEPS) or 1
 
     def resolve_collision(self, axis: Axis, dt: float) -> None:
         offset = self.collision_offset(axis, dt)
@@ -413,11 +489,13 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
 
         Called internally.
         """
-        collision_rect = self.clipped_collision_rect()
-        for sprite in self.level.get_group("dynamic-physics"):
-            if sprite.collision_rect.colliderect(collision_rect):
-                self.trigger(sprite)
-                return
+        candidates = self.level.broadphase.candidates(self)
+        if candidates:  # usually nobody's on it, then there's no need for an iterator
+            collision_rect = self.clipped_collision_rect(self._probe)
+            for sprite in candidates:
+                if sprite.collision_box.colliderect(collision_rect):
+                    self.trigger(sprite)
+                    return
         self.untrigger(None)
 
     def handle_portal_collision(self) -> None:
@@ -426,17 +504,21 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
 
         Called internally.
         """
-        sprite: PhysicsSprite
-        for sprite in self.level.get_group("dynamic-physics"):
+        candidates = self.level.broadphase.candidates(self)
+        if not candidates:
+            return
+        link = self.level.portals.link(self)
+        if link is None:
+            # no twin to go to
+            return
+        twin = link[0]
+        for sprite in candidates:
             if (
                 sprite.portal_state == self.PortalState.OUT
-                and is_inside_portal(sprite.collision_rect, self.collision_rect, self.orientation.axis)
+                and is_inside_portal(sprite.collision_box, self.collision_box, self.orientation.axis)
                 and is_entering_portal(self.orientation, sprite.velocity)
             ):
-                for portal in self.level.get_group(self.tunnel_id):
-                    # Find twin
-                    if portal is not self:
-                        sprite.enter_portal(self, portal)
+                sprite.enter_portal(self, twin)
 
     def enter_portal(self, in_portal: PhysicsSprite, out_portal: PhysicsSprite) -> None:
         """
@@ -453,6 +535,9 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         State changes when a sprite switches from entering a portal to exiting a different portal
         (Now it accounts for portals being of different orientations :D)
 
+        The sprite is placed with the transform precomputed for the portal pair,
+        all of the speed goes out of the exit portal.
+
         Called internally.
         """
         assert self.out_portal is not None
@@ -460,31 +545,17 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         if self.picker_upper is not None and self.picker_upper.engaged_portal is not self.out_portal:
             # Do not teleport if picker upper has not already teleported
             return
-        out_orientation = self.out_portal.orientation
-        self.velocity = pygame.Vector2(self.velocity.length(), 0).rotate(DIRECTION_TO_ANGLE[out_orientation])
+        link = self.level.portals.link(self.in_portal)
+        if link is None:
+            # twin was removed or recolored while I was inside
+            self.exit_portal()
+            return
+        self.out_portal, transform = link
         # move the sprite to behind the exit portal
-        if out_orientation.axis == Axis.HORIZONTAL:
-            self.rect.top = self.out_portal.rect.top + (
-                self.rect.top - self.in_portal.rect.top
-                if self.in_portal.orientation.axis == Axis.HORIZONTAL
-                else self.in_portal.rect.right - self.rect.right
-            )
-            if out_orientation == Direction.WEST:
-                self.rect.left = self.out_portal.rect.right - 1
-            else:
-                self.rect.right = self.out_portal.rect.left + 1
-        else:
-            self.rect.left = self.out_portal.rect.left + (
-                self.rect.left - self.in_portal.rect.left
-                if self.in_portal.orientation.axis == Axis.VERTICAL
-                else self.in_portal.rect.bottom - self.rect.bottom
-            )
-            if out_orientation == Direction.NORTH:
-                self.rect.top = self.out_portal.rect.bottom - 1
-            else:
-                self.rect.bottom = self.out_portal.rect.top + 1
+        transform.place_ip(self.rect)
+        transform.exit_velocity_ip(self.velocity)
         self.portal_state = self.PortalState.EXIT
-        play_sound("teleport.ogg")
+        self.level.audio.play("teleport.ogg")
         if self.current_throwable is not None:
             # Teleport current throwable
             if self.current_throwable.in_portal is not self.in_portal:
@@ -505,7 +576,7 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         """
         Finds closest throwable object and sets it as the current object picked up
         """
-        closest_throwable, distance = self.find_closest_throwable()
+        closest_throwable, distance = self.find_closest_throwable(self.max_holding_distance)
         if closest_throwable is None:
             return False
         if distance <= self.max_holding_distance and not self.current_throwable:
@@ -520,7 +591,7 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         """
         if self.current_throwable is None:
             return False
-        yeet_force = self.yeet_force
+        yeet_force = self.physics_data.yeet_force
         if self.facing:
             if not self.facing.y:
                 yeet_angle = -HORIZONTAL_YEET_ANGLE if self.facing.x > 0 else 180 + HORIZONTAL_YEET_ANGLE
@@ -530,30 +601,20 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         else:
             impulse = pygame.Vector2()
         # HACK: halve x impulse because it is too powerful
-        self.current_throwable.velocity.x += impulse.x * 0.5 / self.current_throwable.weight
+        self.current_throwable.velocity.x += impulse.x * 0.5 / self.current_throwable.physics_data.weight
         # HACK: don't inherit old y velocity so that jump + throw is more consistent
-        self.current_throwable.velocity.y = impulse.y / self.current_throwable.weight
-        self.velocity -= impulse / self.weight
+        self.current_throwable.velocity.y = impulse.y / self.current_throwable.physics_data.weight
+        self.velocity -= impulse / self.physics_data.weight
         self.current_throwable.picker_upper = None
         self.current_throwable = None
         return True
 
-    def find_closest_throwable(self) -> tuple[PhysicsSprite | None, float]:
+    def find_closest_throwable(self, max_distance: float = inf) -> tuple[PhysicsSprite | None, float]:
         """Finds the closest throwable object and its distance.
 
-        If no throwables, the sprite is None and distance is infinity.
+        If no throwables (within max_distance), the sprite is None and distance is infinity.
         """
-        # Forgive me for the atrocity I have commited here
-        group: pygame.sprite.AbstractGroup | None = self.level.get_group("throwable-physics", None)
-        throwables = set(group) if group else set()
-        closest_throwable = None
-        closest_distance = float("inf")
-        for throwable in throwables:
-            current_distance = (pygame.Vector2(self.pos) - pygame.Vector2(throwable.pos)).length()
-            if current_distance < closest_distance:
-                closest_throwable = throwable
-                closest_distance = current_distance
-        return closest_throwable, closest_distance
+        return self.level.bodies.nearest(self.pos, max_distance, _THROWABLE)
 
     def update_throwable(self, dt: float) -> None:
         """
@@ -561,23 +622,26 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         """
         if self.picker_upper is None:
             return
-        offset = pygame.Vector2(self.picker_upper.pos) - pygame.Vector2(self.pos)
-        if offset.length() > self.max_holding_distance:
+        holder_x, holder_y = self.picker_upper.pos
+        x, y = self.pos
+        distance = hypot(holder_x - x, holder_y - y)
+        if distance > self.max_holding_distance:
             # Throwable is released if it is too far
             self.picker_upper.current_throwable = None
             self.picker_upper = None
             return
         leeway = TILE_SIZE // 4
-        if offset.length() <= leeway:
+        if distance <= leeway:
             # Give some leeway offset for pulling
             return
+        offset = pygame.Vector2(holder_x - x, holder_y - y)
         # otherwise make this cool magnet effect
         spring_force: float = 10_000  # stronger pull
         damping_coefficient: float = 2_000  # reduce jittering, whipping
         damping_impulse = (self.picker_upper.velocity - self.velocity) * (damping_coefficient * dt)
         impulse = offset * spring_force * dt + damping_impulse
-        self.velocity += impulse / self.weight
-        opposite_impulse = -impulse / self.picker_upper.weight
+        self.velocity += impulse / self.physics_data.weight
+        opposite_impulse = -impulse / self.picker_upper.physics_data.weight
         # Cap opposite impulse so that player cannot 'hang' from its throwable (for one-way platforms)
         opposite_impulse[1] = max(-GRAVITY[1] * dt * 0.9, opposite_impulse[1])
         self.picker_upper.velocity += opposite_impulse
@@ -587,68 +651,81 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
 
         Uses dt in order to prevent tunneling.
         """
-        collision_rect = self.clipped_collision_rect()
+        collision_rect = self.clipped_collision_rect(self._probe)
         collision_rect[axis] += offset
-        for sprite in self.level.get_group("static-physics"):
-            if not sprite.collision_rect.colliderect(collision_rect):
-                continue
-            if not sprite.one_way:
-                if self.engaged_portal is not None and (
-                    # Don't collide on portal axis when moving into or out of the portal
-                    self.engaged_portal.orientation.axis == axis
-                    # Don't collide perpendicularly when within the sides of portal
-                    or is_aligned_with_portal(
-                        collision_rect, self.engaged_portal.rect, self.engaged_portal.orientation.axis
-                    )
-                ):
-                    # Check does not apply to one way platforms
-                    continue
-                return True
-            if axis == Axis.HORIZONTAL:
-                # Never collide horizontally with one way platforms
-                continue
-            y_velocity = self.velocity.y
-            if y_velocity < 0:
-                # skip one way if moving up
+        category = self.collision_category
+        mask = self.collision_mask
+        y_velocity = self.velocity.y
+        min_one_way_velocity = 100.0  # The lowest velocity at which a player can manually go down through
+        if (
+            # Never collide horizontally with one way platforms
+            axis == Axis.HORIZONTAL
+            # skip one way if moving up
+            or y_velocity < 0
+            # player presses down
+            # AND velocity is low (forces fast falling speeds to collide at least once)
+            or (self.facing.y > 0 and y_velocity < min_one_way_velocity)
+        ):
+            mask &= ~_ONE_WAY
+        if self.engaged_portal is not None and (
+            # Don't collide on portal axis when moving into or out of the portal
+            self.engaged_portal.orientation.axis == axis
+            # Don't collide perpendicularly when within the sides of portal
+            or is_aligned_with_portal(
+                collision_rect, self.engaged_portal.rect, self.engaged_portal.orientation.axis
+            )
+        ):
+            # Check does not apply to one way platforms
+            mask &= _ONE_WAY
+        if not mask:
+            return False
+        nearby = self.level.entities.static.query(collision_rect)
+        i = 0
+        while i < len(nearby):  # this runs a lot, indexing doesn't allocate an iterator every time
+            sprite = nearby[i]
+            i += 1
+            if not (sprite.collision_category & mask and category & sprite.collision_mask):
                 continue
-            min_one_way_velocity = 100.0  # The lowest velocity at which a player can manually go down through
-            if self.facing.y > 0 and y_velocity < min_one_way_velocity:
-                # player presses down
-                # AND velocity is low (forces fast falling speeds to collide at least once)
+            box = sprite.collision_box
+            if not box.colliderect(collision_rect):
                 continue
             # NOTE: one way platforms are thinner (shorter) than normal tiles for obvious reasons
-            if self.collision_rect.bottom > sprite.collision_rect.bottom:
+            if (
+                sprite.collision_category & _ONE_WAY
+                and self.collision_box.bottom > box.bottom
                 # inside platform tile rect but too low to get on top
-                if self.collision_rect.bottom - y_velocity * dt > sprite.collision_rect.bottom:
-                    # (anti-tunneling) previous position was also too low to get on top
-                    continue
+                and self.collision_box.bottom - y_velocity * dt > box.bottom
+                # (anti-tunneling) previous position was also too low to get on top
+            ):
+                continue
             return True
         return False
 
     def update_physics(self, dt: float) -> None:
         """Update this sprite's physics"""
-        # Restore previous commands
-        self.commands_used.clear()
-
         if self.physics_type == PhysicsType.DYNAMIC:
             # Note: Make sure to do any velocity modifications before update_position
             # otherwise weird stuff happen - Aiden
             self.update_throwable(dt)
             self.update_position(Axis.VERTICAL, dt)
             self.update_position(Axis.HORIZONTAL, dt)
-            self.on_ground = self.is_colliding_static(Axis.VERTICAL, dt, 0.5)
+            # standing on another dynamic body counts too, unless I just jumped off it
+            self.on_ground = self.is_colliding_static(Axis.VERTICAL, dt, 0.5) or (
+                self.resting_on is not None and self.velocity.y >= 0
+            )
+            self.resting_on = None  # set again by the contact solver if still standing on it
             if self.on_ground:
                 self.velocity[1] = 0
                 if (
                     sign(self.facing[0]) != sign(self.velocity[0])
-                    or abs(self.velocity[0]) > self.horizontal_ground_speed
+                    or abs(self.velocity[0]) > self.physics_data.horizontal_ground_speed
                 ):
-                    self.velocity[0] *= self.ground_damping**dt
-                self.coyote_time_left = self.coyote_time
+                    self.velocity[0] *= self.physics_data.ground_damping**dt
+                self.coyote_time_left = self.physics_data.coyote_time
             else:
                 # A bit unrealistic, that there's no vertical damping.
                 if sign(self.facing[0]) != sign(self.velocity[0]):
-                    self.velocity[0] *= self.air_damping**dt
+                    self.velocity[0] *= self.physics_data.air_damping**dt
                 self.coyote_time_left -= dt
             self.update_facing()  # get the direction the object is facing
 
@@ -663,8 +740,16 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
         Base behavior: don't change self.facing.
         """
 
-    def draw(
+    def snapshot(self) -> Any:  # BodySnapshot here, sprites that draw themselves differently have their own
+        portal = None
+        if self.portal_state != self.PortalState.OUT:
+            assert self.engaged_portal is not None
+            portal = (self.engaged_portal.rect.copy(), self.engaged_portal.orientation)
+        return BodySnapshot(self.image, self.rect.copy(), pygame.Vector2(self.velocity), portal)
+
+    def draw_snapshot(
         self,
+        snapshot: Any,
         surface: pygame.Surface,
         offset: pygame.Vector2,
         dt_since_physics: float,
@@ -674,10 +759,18 @@ class PhysicsSprite(Sprite, PhysicsSpriteInterface):
 
         Except all of the above is interpolated
         """
-        new_rect = self.rect.copy()
+        image, rect, velocity, portal = cast(BodySnapshot, snapshot)
+        pos = rect.center + velocity * dt_since_physics
+        new_rect = rect.copy()
         # only draw the part of the sprite that is above the 'bottom' of the portal (if we are inside one)
         # (only applies to dynamic objects)
-        clip_rect = self.interpolated_clip_rect(dt_since_physics)
-        center = self.interpolated_pos(dt_since_physics) + pygame.Vector2(clip_rect.topleft) - offset
+        if portal is None:
+            clip_rect = image.get_frect()
+        else:
+            collision_rect = rect.copy()
+            collision_rect.center = pos[0], pos[1]
+            clip_rect = clip_rect_to_portal(collision_rect, *portal)
+            clip_rect.move_ip(-collision_rect.x, -collision_rect.y)
+        center = pos + pygame.Vector2(clip_rect.topleft) - offset
         new_rect.center = center[0], center[1]
-        surface.blit(self.image.subsurface(clip_rect), new_rect)
+        surface.blit(image.subsurface(clip_rect), new_rect)
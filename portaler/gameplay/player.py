@@ -1,8 +1,6 @@
-import pygame
-
 from ..const import Actions
-from ..game_input import input_state
-from ..interfaces import PhysicsType, SpriteInitData, SpritePhysicsData
+from ..interfaces import Command, DrawLayer, SpriteInitData
+from . import presets
 from .physics import PhysicsSprite
 from .sprites_and_sounds import get_image
 
@@ -10,36 +8,39 @@ from .sprites_and_sounds import get_image
 class Player(PhysicsSprite):
     """Player sprite"""
 
+    __slots__ = ()
+
+    draw_layer = DrawLayer.ACTORS
+
     def __init__(self, data: SpriteInitData):
-        physics_data = SpritePhysicsData(
-            physics_type=PhysicsType.DYNAMIC,  # Use the defaults
-            weight=100.0,
-            air_damping=0.002,
-        )
         # sprite will be added to these groups later
         data.groups.extend(["physics", "render", "dynamic-physics", "actors"])
-        super().__init__(data, physics_data)
+        super().__init__(data, presets.PLAYER)
 
-        scale_factor = data.rect[2] // 16  # 16 is the width of the unscaled player sprite
-        self.image = pygame.transform.scale_by(get_image("player.png"), scale_factor).convert_alpha()
+        scale_factor = int(data.rect[2] // 16)  # 16 is the width of the unscaled player sprite
+        self.image = get_image("player.png", scale_factor)
 
     def update_facing(self):  # player has a different way of calculating 'facing' value
-        self.facing.x = input_state.get(Actions.RIGHT) - input_state.get(Actions.LEFT)
-        self.facing.y = input_state.get(Actions.DOWN) - (
-            input_state.get(Actions.UP) or input_state.get(Actions.JUMP)
-        )
+        inputs = self.level.input_source
+        self.facing.x = inputs.get(Actions.RIGHT) - inputs.get(Actions.LEFT)
+        self.facing.y = inputs.get(Actions.DOWN) - (inputs.get(Actions.UP) or inputs.get(Actions.JUMP))
 
     def act(self, dt: float):
+        inputs = self.level.input_source
+        commands = Command.NONE
         if self.facing.x > 0:
-            self.right(dt)
+            commands |= Command.RIGHT
         elif self.facing.x < 0:
-            self.left(dt)
+            commands |= Command.LEFT
+
+        if inputs.get_just(Actions.JUMP):
+            commands |= Command.JUMP
 
-        if input_state.get_just(Actions.JUMP):
-            self.jump(dt)
+        if inputs.get_just(Actions.INTERACT):
+            commands |= Command.INTERACT
 
-        if input_state.get_just(Actions.INTERACT):
-            self.interact(dt)
+        if inputs.get_just(Actions.DOWN):
+            commands |= Command.DUCK
 
-        if input_state.get_just(Actions.DOWN):
-            self.duck(dt)
+        self.commands.issue(commands)
+        super().act(dt)
@@ -1,9 +1,173 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
 import pygame
 
-from ..interfaces import DIRECTION_TO_ANGLE, PhysicsType, SpriteInitData, SpritePhysicsData
+from ..interfaces import (
+    DIRECTION_TO_ANGLE,
+    Axis,
+    Direction,
+    SpriteInitData,
+)
+from . import presets
 from .animation import Animation
 from .physics import PhysicsSprite
 
+# a, b, c, d of the matrix [[a, b], [c, d]]
+_Matrix = tuple[int, int, int, int]
+
+
+def _tangent(direction: Direction) -> tuple[int, int]:
+    """Unit vector along the length of a portal facing direction"""
+    return (1, 0) if direction.axis == Axis.VERTICAL else (0, 1)
+
+
+def _matrix(direction_in: Direction, direction_out: Direction) -> _Matrix:
+    """Matrix mapping the entry portal's normal and tangent onto the exit portal's"""
+    normal = direction_in.value
+    normal_image = direction_out.value
+    tangent = _tangent(direction_in)
+    # keep the offset along the portal when both portals share an axis, mirror it otherwise
+    # (matches where sprites used to be placed before transforms were precomputed)
+    side = 1 if direction_in.axis == direction_out.axis else -1
+    tangent_image = side * _tangent(direction_out)[0], side * _tangent(direction_out)[1]
+    # normal and tangent are orthonormal, so the inverse of [normal tangent] is its transpose
+    return (
+        normal_image[0] * normal[0] + tangent_image[0] * tangent[0],
+        normal_image[0] * normal[1] + tangent_image[0] * tangent[1],
+        normal_image[1] * normal[0] + tangent_image[1] * tangent[0],
+        normal_image[1] * normal[1] + tangent_image[1] * tangent[1],
+    )
+
+
+# (entry orientation, exit orientation) -> matrix, for all 16 combinations.
+# Directions going into the entry portal come out going out of the exit portal
+ORIENTATION_MATRICES: dict[tuple[Direction, Direction], _Matrix] = {
+    (direction_in, direction_out): _matrix(direction_in, direction_out)
+    for direction_in in Direction
+    for direction_out in Direction
+}
+
+
+def _mirrored(direction_in: Direction, direction_out: Direction) -> bool:
+    """Whether the offset along the entry portal gets flipped on the way to the exit portal"""
+    a, b, c, d = ORIENTATION_MATRICES[direction_in, direction_out]
+    tangent_in = _tangent(direction_in)
+    tangent_out = _tangent(direction_out)
+    image = a * tangent_in[0] + b * tangent_in[1], c * tangent_in[0] + d * tangent_in[1]
+    return image[0] * tangent_out[0] + image[1] * tangent_out[1] < 0
+
+
+@dataclass(frozen=True)
+class PortalTransform:
+    """
+    Where a sprite going into one portal of a pair comes out of the other
+
+    Sprites are placed just behind the exit portal, overlapping it by a pixel,
+    keeping (or mirroring, see ORIENTATION_MATRICES) their offset along the portal.
+    Velocities aren't transformed, they come out of the exit portal at full speed along its facing
+    (see exit_velocity_ip), sideways speed doesn't carry through.
+    """
+
+    orientation: Direction  # of the exit portal
+    mirrored: bool
+    in_edge: float  # start of the entry portal along its length, or its end if mirrored
+    out_start: float  # start of the exit portal along its length
+    exit_edge: float  # where the sprite's side facing out of the exit portal goes
+
+    @classmethod
+    def between(cls, in_portal: PhysicsSprite, out_portal: PhysicsSprite) -> PortalTransform:
+        in_rect, out_rect = in_portal.rect, out_portal.rect
+        orientation = out_portal.orientation
+        mirrored = _mirrored(in_portal.orientation, orientation)
+        if orientation.axis == Axis.HORIZONTAL:
+            in_edge = in_rect.right if mirrored else in_rect.top
+            out_start = out_rect.top
+            exit_edge = out_rect.right - 1 if orientation == Direction.WEST else out_rect.left + 1
+        else:
+            in_edge = in_rect.bottom if mirrored else in_rect.left
+            out_start = out_rect.left
+            exit_edge = out_rect.bottom - 1 if orientation == Direction.NORTH else out_rect.top + 1
+        return cls(orientation, mirrored, in_edge, out_start, exit_edge)
+
+    def place_ip(self, rect: pygame.FRect) -> None:
+        """Move a rect from inside the entry portal to behind the exit portal"""
+        if self.orientation.axis == Axis.HORIZONTAL:
+            rect.top = self.out_start + (
+                self.in_edge - rect.right if self.mirrored else rect.top - self.in_edge
+            )
+            if self.orientation == Direction.WEST:
+                rect.left = self.exit_edge
+            else:
+                rect.right = self.exit_edge
+        else:
+            rect.left = self.out_start + (
+                self.in_edge - rect.bottom if self.mirrored else rect.left - self.in_edge
+            )
+            if self.orientation == Direction.NORTH:
+                rect.top = self.exit_edge
+            else:
+                rect.bottom = self.exit_edge
+
+    def exit_velocity_ip(self, velocity: pygame.Vector2) -> None:
+        """All of the speed, pointing out of the exit portal"""
+        velocity.update(velocity.length(), 0)
+        velocity.rotate_ip(DIRECTION_TO_ANGLE[self.orientation])
+
+
+class PortalRegistry:
+    """
+    Links portals with the same tunnel_id to each other
+
+    Each portal with exactly one twin gets the transform into that twin precomputed,
+    so teleporting is a single lookup. Tunnels with any other amount of portals are left unlinked.
+    """
+
+    def __init__(self) -> None:
+        self.tunnels: dict[str, list[PhysicsSprite]] = {}
+        self.links: dict[PhysicsSprite, tuple[PhysicsSprite, PortalTransform]] = {}
+        self.version: int = 0  # bumped on every change, for caches that depend on the set of portals
+
+    def add(self, portal: PhysicsSprite) -> None:
+        self.tunnels.setdefault(portal.tunnel_id, []).append(portal)
+        self._relink(portal.tunnel_id)
+        self.version += 1
+
+    def remove(self, portal: PhysicsSprite) -> None:
+        tunnel = self.tunnels.get(portal.tunnel_id, [])
+        if portal in tunnel:
+            tunnel.remove(portal)
+            self.links.pop(portal, None)
+            self._relink(portal.tunnel_id)
+            self.version += 1
+
+    def recolor(self, portal: PhysicsSprite, tunnel_id: str) -> None:
+        """Move a portal over to another tunnel"""
+        self.remove(portal)
+        portal.tunnel_id = tunnel_id
+        self.add(portal)
+
+    def link(self, portal: PhysicsSprite) -> tuple[PhysicsSprite, PortalTransform] | None:
+        """The twin of a portal and the transform into it, or None if the portal has no twin"""
+        return self.links.get(portal)
+
+    def clear(self) -> None:
+        self.tunnels.clear()
+        self.links.clear()
+        self.version += 1
+
+    def _relink(self, tunnel_id: str) -> None:
+        tunnel = self.tunnels.get(tunnel_id, [])
+        for portal in tunnel:
+            self.links.pop(portal, None)
+        if len(tunnel) == 2:
+            portal_a, portal_b = tunnel
+            self.links[portal_a] = portal_b, PortalTransform.between(portal_a, portal_b)
+            self.links[portal_b] = portal_a, PortalTransform.between(portal_b, portal_a)
+        elif not tunnel:
+            self.tunnels.pop(tunnel_id, None)
+
 
 class Portal(PhysicsSprite):
     """
@@ -16,28 +180,47 @@ class Portal(PhysicsSprite):
         they exit the other direction
     """
 
+    __slots__ = ("animation", "sound_name")
+
     def __init__(self, data: SpriteInitData):
-        data.groups.extend(["render", "physics", "portal-physics", data.properties["tunnel_id"]])
-        physics_data = SpritePhysicsData(
-            physics_type=PhysicsType.PORTAL,
-            orientation=data.properties["orientation"],
-            tunnel_id=data.properties["tunnel_id"],
-        )
-        super().__init__(data, physics_data)
+        data.groups.extend(["render", "physics", "portal-physics"])
+        super().__init__(data, presets.PORTAL)
+        self.orientation = data.properties["orientation"]
+        self.tunnel_id = data.properties["tunnel_id"]
 
+        self.animation = self._make_animation()
+        self.sound_name = "teleport.ogg"
+        self.level.portals.add(self)
+
+    def _make_animation(self) -> Animation:
         rotation = -DIRECTION_TO_ANGLE[self.orientation] - 90  # it works
-        self.animation = Animation(
-            f"portals/portal{data.properties['tunnel_id']}.png",
+        return Animation(
+            self.level.clock,
+            f"portals/portal{self.tunnel_id}.png",
             12,
             frame_count=7,
             scale_factor=2,
             rotation=rotation,
         )
-        self.sound_name = "teleport.ogg"
 
-    def update_physics(self, dt: float) -> None:
-        super().update_physics(dt)
-        self.animation.update(dt)
+    def recolor(self, tunnel_id: str) -> None:
+        """Relink this portal to another tunnel (tunnel ids are portal color values)"""
+        self.level.portals.recolor(self, tunnel_id)
+        self.animation = self._make_animation()
+
+    def kill(self) -> None:
+        self.level.portals.remove(self)
+        super().kill()
+
+    def snapshot(self) -> tuple[pygame.Surface, pygame.FRect]:
+        return self.animation.get_frame(), self.rect.copy()
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt_since_physics: float) -> None:
-        surface.blit(self.animation.get_frame(), self.rect.move(-offset))
+    def draw_snapshot(
+        self,
+        snapshot: tuple[pygame.Surface, pygame.FRect],
+        surface: pygame.Surface,
+        offset: pygame.Vector2,
+        dt: float,
+    ) -> None:
+        frame, rect = snapshot
+        surface.blit(frame, rect.move(-offset))
@@ -0,0 +1,62 @@
+"""
+Physics presets
+
+Every sprite of a kind shares one of these instead of having its own copy of the tuning.
+"""
+
+from ..interfaces import (
+    THROWABLE_TYPE_INTO_WEIGHT,
+    CollisionLayer,
+    PhysicsType,
+    SpritePhysicsData,
+    ThrowableType,
+)
+
+PLAYER = SpritePhysicsData(
+    physics_type=PhysicsType.DYNAMIC,  # Use the defaults
+    weight=100.0,
+    air_damping=0.002,
+    collision_category=CollisionLayer.PLAYER,
+)
+
+# by ThrowableType value, like THROWABLE_TYPE_INTO_WEIGHT
+THROWABLES = {
+    throwable_type.value: SpritePhysicsData(
+        physics_type=PhysicsType.DYNAMIC,
+        weight=THROWABLE_TYPE_INTO_WEIGHT[throwable_type.value],
+        collision_category=CollisionLayer.THROWABLE,
+        collision_mask=CollisionLayer.ALL & ~CollisionLayer.PLAYER_BARRIER,
+    )
+    for throwable_type in ThrowableType
+}
+
+WALL = SpritePhysicsData(physics_type=PhysicsType.STATIC)
+
+ONE_WAY_PLATFORM = SpritePhysicsData(
+    physics_type=PhysicsType.STATIC, collision_category=CollisionLayer.ONE_WAY
+)
+
+# orientation and tunnel_id are set on each portal
+PORTAL = SpritePhysicsData(
+    physics_type=PhysicsType.PORTAL,
+    collision_category=CollisionLayer.PORTAL,
+    collision_mask=CollisionLayer.PLAYER | CollisionLayer.THROWABLE,
+)
+
+# orientation is set on each door
+DOOR = SpritePhysicsData(physics_type=PhysicsType.ACTIVATED, collision_category=CollisionLayer.MECHANISM)
+
+LIFTER = SpritePhysicsData(physics_type=PhysicsType.ACTIVATED, collision_category=CollisionLayer.MECHANISM)
+
+BUTTON = SpritePhysicsData(
+    physics_type=PhysicsType.TRIGGER,
+    collision_category=CollisionLayer.TRIGGER,
+    collision_mask=CollisionLayer.PLAYER | CollisionLayer.THROWABLE,
+)
+
+# only the player can finish a level
+FINISH = SpritePhysicsData(
+    physics_type=PhysicsType.TRIGGER,
+    collision_category=CollisionLayer.TRIGGER,
+    collision_mask=CollisionLayer.PLAYER,
+)
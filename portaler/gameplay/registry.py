@@ -0,0 +1,37 @@
+"""
+Sprites of a level, by role
+
+Each role has its own typed collection, so hot loops use an attribute instead of looking up a group by name.
+Sprites still say which roles they have by name (SpriteInitData.groups), those names are the keys of groups.
+Portal pairs are indexed separately, by the level's PortalRegistry.
+"""
+
+from __future__ import annotations
+
+import pygame
+
+from .camera import Camera
+from .spatial import SpatialGrid
+from .sprite_list import SpriteList
+
+
+class EntityRegistry:
+    def __init__(self) -> None:
+        self.render = Camera()  # drawn, in the order added
+        self.physics = SpriteList()  # everything with physics
+        self.static = SpatialGrid()  # what dynamic bodies collide with
+        self.dynamic = SpatialGrid()  # dynamic bodies (player, throwables)
+        self.triggers = SpatialGrid()  # buttons, finishes
+        self.portals = SpatialGrid()
+        self.throwables = SpriteList()
+        self.actors = SpriteList()  # sprites that act on their own every step (player)
+        self.groups: dict[str, pygame.sprite.AbstractGroup] = {
+            "render": self.render,
+            "physics": self.physics,
+            "static-physics": self.static,
+            "dynamic-physics": self.dynamic,
+            "trigger-physics": self.triggers,
+            "portal-physics": self.portals,
+            "throwable-physics": self.throwables,
+            "actors": self.actors,
+        }
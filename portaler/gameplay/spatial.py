@@ -0,0 +1,269 @@
+"""
+Uniform grid of sprites
+
+Collision queries only look at the sprites in the cells a rect touches,
+so their cost depends on how crowded that spot is, not on how big the level is.
+Their results are kept, and refilled in place when the grid changes,
+bodies probe the same few cells over and over.
+Point queries (nearest, k nearest, within a radius) search rings of cells around the point,
+closest ring first, and stop as soon as no further ring can hold anything closer.
+"""
+
+from __future__ import annotations
+
+from bisect import insort
+from collections.abc import Callable, Iterator
+from math import ceil, floor, hypot, inf
+from typing import TYPE_CHECKING
+
+import pygame
+from pygame.typing import SequenceLike
+
+from ..const import TILE_SIZE
+from ..interfaces import CollisionLayer
+from .sprite_list import SpriteList
+
+if TYPE_CHECKING:
+    from .physics import PhysicsSprite
+
+_Cell = tuple[int, int]
+_Bounds = tuple[int, int, int, int]  # left, top, right, bottom cell
+_Predicate = Callable[["PhysicsSprite"], bool]
+
+MAX_KEPT_RESULTS = 4096  # query results kept per grid, they are all dropped when there are more
+
+# (dx, dy) of the cells in the square ring radius cells away from a cell, by radius, made as needed
+_RING_OFFSETS: list[tuple[_Cell, ...]] = []
+
+
+def _ring_offsets(radius: int) -> tuple[_Cell, ...]:
+    while len(_RING_OFFSETS) <= radius:
+        ring = len(_RING_OFFSETS)
+        side = range(-ring, ring + 1)
+        _RING_OFFSETS.append(
+            tuple((dx, dy) for dx in side for dy in (side if abs(dx) == ring else (-ring, ring)))
+        )
+    return _RING_OFFSETS[radius]
+
+
+class SpatialGrid(SpriteList):
+    """
+    Sprite group that also sorts its physics sprites into grid cells by their rect
+
+    Sprites are indexed by rect when added. Sprites that move have to be re-indexed with move(),
+    doors and lifters don't need to, their collision rect stays inside their rect.
+    """
+
+    def __init__(self, cell_size: int = TILE_SIZE * 2) -> None:
+        self.cell_size = cell_size
+        self.cells: dict[_Cell, list[PhysicsSprite]] = {}
+        self._sprite_cells: dict[PhysicsSprite, _Bounds] = {}
+        # query results, with the version of the grid they were made for
+        self._results: dict[_Bounds, tuple[int, list[PhysicsSprite]]] = {}
+        self._version = 0  # goes up whenever a sprite is added, removed or changes cells
+        super().__init__()
+
+    def _bounds(self, rect: pygame.Rect | pygame.FRect) -> _Bounds:
+        size = self.cell_size
+        return (
+            floor(rect.left / size),
+            floor(rect.top / size),
+            floor(rect.right / size),
+            floor(rect.bottom / size),
+        )
+
+    @staticmethod
+    def _cells(bounds: _Bounds) -> Iterator[_Cell]:
+        left, top, right, bottom = bounds
+        # no range objects, those would be two allocations for every column
+        x = left
+        while x <= right:
+            y = top
+            while y <= bottom:
+                yield x, y
+                y += 1
+            x += 1
+
+    def add_internal(self, sprite, layer=None) -> None:
+        super().add_internal(sprite, layer)
+        bounds = self._bounds(sprite.rect)
+        for cell in self._cells(bounds):
+            self.cells.setdefault(cell, []).append(sprite)
+        self._sprite_cells[sprite] = bounds
+        self._version += 1
+
+    def remove_internal(self, sprite) -> None:
+        super().remove_internal(sprite)
+        self._unlink(sprite, self._sprite_cells.pop(sprite))
+
+    def _unlink(self, sprite: PhysicsSprite, bounds: _Bounds) -> None:
+        for cell in self._cells(bounds):
+            bucket = self.cells[cell]
+            bucket.remove(sprite)
+            if not bucket:
+                del self.cells[cell]
+        self._version += 1
+
+    def move(self, sprite: PhysicsSprite) -> None:
+        """Re-index a sprite after it moved, only touches the buckets if it changed cells"""
+        bounds = self._bounds(sprite.rect)
+        old_bounds = self._sprite_cells.get(sprite)
+        if old_bounds is None or old_bounds == bounds:
+            return
+        self._unlink(sprite, old_bounds)
+        for cell in self._cells(bounds):
+            self.cells.setdefault(cell, []).append(sprite)
+        self._sprite_cells[sprite] = bounds
+
+    def query(self, rect: pygame.Rect | pygame.FRect) -> list[PhysicsSprite]:
+        """
+        Sprites in the cells touched by rect, big sprites can come up more than once
+
+        The same list comes back every time for the same cells, and gets refilled when the grid changed,
+        so don't modify it or keep it around.
+        """
+        bounds = self._bounds(rect)
+        result = self._results.get(bounds)
+        if result is None:
+            if len(self._results) >= MAX_KEPT_RESULTS:
+                self._results.clear()
+            found: list[PhysicsSprite] = []
+        elif result[0] == self._version:
+            return result[1]
+        else:
+            found = result[1]
+            found.clear()
+        cells = self.cells
+        for cell in self._cells(bounds):
+            bucket = cells.get(cell)
+            if bucket is not None:
+                found += bucket
+        self._results[bounds] = self._version, found
+        return found
+
+    def _rings(self, center: _Cell, max_distance: float) -> int:
+        """How many rings around center can hold a sprite closer than max_distance"""
+        if max_distance != inf:
+            return ceil(max_distance / self.cell_size)
+        # unbounded, go as far as the furthest occupied cell
+        cx, cy = center
+        return max((max(abs(x - cx), abs(y - cy)) for x, y in self.cells), default=0)
+
+    def nearest(
+        self,
+        point: SequenceLike[float],
+        max_distance: float = inf,
+        category: int = CollisionLayer.ALL.value,
+        predicate: _Predicate | None = None,
+    ) -> tuple[PhysicsSprite | None, float]:
+        """
+        The sprite with its center closest to point, and its distance
+
+        Only sprites in any of the category bits, for which predicate is true, count.
+        If there are none within max_distance, the sprite is None and distance is infinity.
+        """
+        closest = None
+        closest_distance = inf
+        x, y = point[0], point[1]
+        cells = self.cells
+        size = self.cell_size
+        cx, cy = floor(x / size), floor(y / size)
+        for radius in range(self._rings((cx, cy), max_distance) + 1):
+            if closest_distance <= (radius - 1) * size:
+                # everything from this ring on is further away
+                break
+            for dx, dy in _ring_offsets(radius):
+                bucket = cells.get((cx + dx, cy + dy))
+                if bucket is None:
+                    continue
+                for sprite in bucket:
+                    if not sprite.collision_category & category:
+                        continue
+                    center = sprite.rect.center
+                    distance = hypot(center[0] - x, center[1] - y)
+                    if distance < closest_distance and distance <= max_distance:
+                        if predicate is None or predicate(sprite):
+                            closest = sprite
+                            closest_distance = distance
+        return closest, closest_distance
+
+    def k_nearest(
+        self,
+        point: SequenceLike[float],
+        k: int,
+        max_distance: float = inf,
+        category: int = CollisionLayer.ALL.value,
+        predicate: _Predicate | None = None,
+        out: list[tuple[float, PhysicsSprite]] | None = None,
+    ) -> list[tuple[float, PhysicsSprite]]:
+        """
+        Up to k (distance, sprite) pairs closest to point, closest first
+
+        Filters work like in nearest. Pass out to reuse a list instead of making a new one.
+        """
+        found = [] if out is None else out
+        found.clear()
+        x, y = point[0], point[1]
+        cells = self.cells
+        size = self.cell_size
+        cx, cy = floor(x / size), floor(y / size)
+        for radius in range(self._rings((cx, cy), max_distance) + 1):
+            if len(found) == k and found[-1][0] <= (radius - 1) * size:
+                break
+            for dx, dy in _ring_offsets(radius):
+                bucket = cells.get((cx + dx, cy + dy))
+                if bucket is None:
+                    continue
+                for sprite in bucket:
+                    if not sprite.collision_category & category:
+                        continue
+                    center = sprite.rect.center
+                    distance = hypot(center[0] - x, center[1] - y)
+                    if distance > max_distance or (len(found) == k and distance >= found[-1][0]):
+                        continue
+                    if any(other is sprite for _, other in found):
+                        # big sprites are in more than one cell
+                        continue
+                    if predicate is None or predicate(sprite):
+                        insort(found, (distance, sprite), key=_distance)
+                        del found[k:]
+        return found
+
+    def within_radius(
+        self,
+        point: SequenceLike[float],
+        radius: float,
+        category: int = CollisionLayer.ALL.value,
+        predicate: _Predicate | None = None,
+        out: list[PhysicsSprite] | None = None,
+    ) -> list[PhysicsSprite]:
+        """
+        Sprites with their center within radius of point, in no particular order
+
+        Pass out to reuse a list instead of making a new one.
+        """
+        found = [] if out is None else out
+        found.clear()
+        x, y = point[0], point[1]
+        cells = self.cells
+        size = self.cell_size
+        cx, cy = floor(x / size), floor(y / size)
+        for ring in range(ceil(radius / size) + 1):
+            for dx, dy in _ring_offsets(ring):
+                bucket = cells.get((cx + dx, cy + dy))
+                if bucket is None:
+                    continue
+                for sprite in bucket:
+                    if not sprite.collision_category & category:
+                        continue
+                    center = sprite.rect.center
+                    if hypot(center[0] - x, center[1] - y) > radius or sprite in found:
+                        # too far, or a big sprite that's in more than one cell
+                        continue
+                    if predicate is None or predicate(sprite):
+                        found.append(sprite)
+        return found
+
+
+def _distance(pair: tuple[float, PhysicsSprite]) -> float:
+    return pair[0]
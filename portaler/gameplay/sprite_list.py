@@ -0,0 +1,45 @@
+"""
+Sprite group that loops over a plain list
+
+pygame groups copy their sprite dict into a new list every time they are looped over.
+This one keeps that list around and only rebuilds it after sprites were added or removed,
+so the physics and render loops just go over a list. Adding and removing stays a dict operation,
+and the list keeps the order sprites were added in (which is the drawing order).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Any
+
+import pygame
+
+
+class SpriteList(pygame.sprite.Group):
+    def __init__(self, *sprites: Any) -> None:
+        self._members: list[Any] | None = None  # None when it needs rebuilding
+        super().__init__(*sprites)
+
+    @property
+    def members(self) -> list[Any]:
+        """
+        The sprites, in the order they were added
+
+        Don't modify it. Adding or removing sprites while looping over it is fine,
+        the change shows up the next time members is asked for.
+        """
+        members = self._members
+        if members is None:
+            members = self._members = list(self.spritedict)
+        return members
+
+    def add_internal(self, sprite, layer=None) -> None:
+        super().add_internal(sprite)
+        self._members = None
+
+    def remove_internal(self, sprite) -> None:
+        super().remove_internal(sprite)
+        self._members = None
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.members)
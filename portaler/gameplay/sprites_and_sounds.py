@@ -3,55 +3,160 @@ This file aims to reduce the ammount of duplicate image loading by loading every
 and then using it again instead of loading a new image every time we create a new instance of an object.
 The same thing goes for the SFX
 
-Just a place to store all of them.
+Just a place to store all of them. Nothing is loaded until it's first asked for,
+so importing this (or anything else) doesn't touch the disk or need a display mode yet.
+Scaled sheets, animation frames and decoded sounds come from the baked asset packs when they have them.
+
+Everything loaded goes into the assets cache, used by whichever level is loaded (see asset_cache).
+Once no level uses something it can get evicted, so memory stays under ASSET_CACHE_BUDGET.
 """
 
+from time import perf_counter
+
 import pygame
+from pygame.typing import RectLike
 
+from ..asset_cache import AssetCache
+from ..asset_pack import AssetPack, frame_strip, frames_key, image_key, open_pack, open_sound_pack
 from ..assets import SOUND_DIRECTORY, SPRITES_DIRECTORY
-
-spritesheets: dict[str, pygame.Surface] = {}
-
-_sounds: dict[str, pygame.Sound] = {}
-
-mute: bool = False
-"""Boolean whether to play sounds. Change this attribute on the module to mute/unmute."""
-
-
-def get_image(path: str) -> pygame.Surface:
-    if path not in spritesheets:
-        spritesheets[path] = pygame.image.load(SPRITES_DIRECTORY / path).convert_alpha()
-    return spritesheets[path]
-
-
-def clear_spritesheets() -> None:  # when chaning a level, idk
-    global spritesheets
-    spritesheets = {}
-
-
-def _get_sound(name: str) -> pygame.Sound:
-    if name not in _sounds:
-        _sounds[name] = pygame.Sound(SOUND_DIRECTORY / name)
-    return _sounds[name]
-
-
-def play_sound(
-    name: str, channel_id: int | None = None, volume: float = 1.0, **kwargs
-) -> pygame.Channel | None:
-    """Play a sound with the given name, on the given channel.
-
-    name is the file name in the sound directory.
-    channel_id is the id of the channel to play it on. Defaults to none,
-    meaning a channel is automatically used.
-
-    If mute is True, return None instead of the channel object.
+from ..const import ASSET_CACHE_BUDGET, TILE_SIZE
+
+assets = AssetCache(ASSET_CACHE_BUDGET)
+"""Every loaded image, animation and sound. Levels use() it while loading and release() it when done."""
+
+_pack: AssetPack | None = None
+_sound_pack: AssetPack | None = None
+
+load_times: dict[str, float] = {}
+"""How long every asset took to load (in seconds), by name. See startup."""
+
+# tile kind -> where its 4x4 block of variants is in walls.png (in blocks)
+_TILE_KINDS = {"wall1": (0, 0), "wall2": (1, 0), "wall3": (0, 1)}
+# where a variant is in its block -> bitmask of neighbors with the same tile: LEFT, TOP, RIGHT, BOTTOM
+_TILE_VARIANTS = {
+    (0, 0): 0b0011,
+    (1, 0): 0b1011,
+    (2, 0): 0b1001,
+    (3, 0): 0b0001,
+    (0, 1): 0b0111,
+    (1, 1): 0b1111,
+    (2, 1): 0b1101,
+    (3, 1): 0b0101,
+    (0, 2): 0b0110,
+    (1, 2): 0b1110,
+    (2, 2): 0b1100,
+    (3, 2): 0b0100,
+    (0, 3): 0b0010,
+    (1, 3): 0b1010,
+    (2, 3): 0b1000,
+    (3, 3): 0b0000,
+}
+
+
+def _get_pack() -> AssetPack:
+    global _pack
+    if _pack is None:
+        start = perf_counter()
+        _pack = open_pack()
+        load_times["pack.bin"] = perf_counter() - start
+    return _pack
+
+
+def get_sound_pack() -> AssetPack:
+    """The sound pack, opened (and baked if needed) first. Only on the main thread, see decode_sound"""
+    global _sound_pack
+    if _sound_pack is None:
+        start = perf_counter()
+        _sound_pack = open_sound_pack()
+        load_times["sounds.bin"] = perf_counter() - start
+    return _sound_pack
+
+
+def _load_image(path: str, scale: int) -> pygame.Surface:
+    key = image_key(path, scale)
+    start = perf_counter()
+    image = _get_pack().image(key)
+    if image is None and scale == 1:
+        image = pygame.image.load(SPRITES_DIRECTORY / path).convert_alpha()
+    elif image is None:
+        image = pygame.transform.scale_by(get_image(path), scale)
+    load_times[key] = perf_counter() - start
+    return image
+
+
+def get_image(path: str, scale: int = 1) -> pygame.Surface:
+    """A sprite sheet, scaled up by a whole number"""
+    return assets.get(image_key(path, scale), lambda: _load_image(path, scale))
+
+
+def get_region(path: str, rect: RectLike, scale: int = 1) -> pygame.Surface:
+    """Part of a sprite sheet (rect is in unscaled pixels), scaled up. Shares pixels with the sheet"""
+    x, y, width, height = pygame.Rect(rect)
+    return get_image(path, scale).subsurface((x * scale, y * scale, width * scale, height * scale))
+
+
+def get_frames(
+    path: str, frame_count: int, scale: int = 1, rotation: int = 0, column: RectLike | None = None
+) -> list[pygame.Surface]:
+    """Frames of an animation, one under another in the sheet, scaled and rotated.
+
+    Full width frames, or the ones in column (x, y, width, frame height, in unscaled pixels, y is ignored).
+    Every animation of the same frames shares this list.
     """
-    if mute:
-        return None
-    sound = _get_sound(name)
-    sound.set_volume(volume)
-    if channel_id is None:
-        return sound.play(**kwargs)
-    channel = pygame.Channel(channel_id)
-    channel.play(sound, **kwargs)
-    return channel
+    key = frames_key(path, frame_count, scale, rotation)
+    area = None
+    if column is not None:
+        x, _, width, height = pygame.Rect(column)
+        area = (x, 0, width, height * frame_count)
+        key += f" {x},{width}x{height}"
+
+    def load() -> list[pygame.Surface]:
+        start = perf_counter()
+        strip = _get_pack().image(key)
+        if strip is None:
+            sheet = get_image(path)
+            strip = frame_strip(
+                sheet if area is None else sheet.subsurface(area), frame_count, scale, rotation
+            )
+        height = strip.height // frame_count
+        load_times[key] = perf_counter() - start
+        return [strip.subsurface((0, i * height, strip.width, height)) for i in range(frame_count)]
+
+    return assets.get(key, load)
+
+
+def get_tile_variants(kind: str) -> list[pygame.Surface]:
+    """The 16 variants of a wall tile kind, scaled to TILE_SIZE, by neighbor bitmask"""
+    tile_size = 16
+    scale = TILE_SIZE // tile_size
+    sheet = get_image("walls.png", scale)
+
+    def load() -> list[pygame.Surface]:
+        kind_x, kind_y = _TILE_KINDS[kind]
+        variants = [sheet] * len(_TILE_VARIANTS)
+        for (x, y), neighbors in _TILE_VARIANTS.items():
+            area = ((kind_x * 4 + x) * tile_size, (kind_y * 4 + y) * tile_size, tile_size, tile_size)
+            variants[neighbors] = get_region("walls.png", area, scale)
+        return variants
+
+    return assets.get(f"{kind} tiles", load, parent=image_key("walls.png", scale))
+
+
+def decode_sound(pack: AssetPack, name: str) -> pygame.Sound:
+    """Decode a sound, without caching it. Only reads pack and the sound file, so it can run on any thread"""
+    sound = pack.sound(name)
+    if sound is None:
+        sound = pygame.Sound(SOUND_DIRECTORY / name)
+    return sound
+
+
+def _load_sound(name: str) -> pygame.Sound:
+    start = perf_counter()
+    sound = decode_sound(get_sound_pack(), name)
+    load_times[name] = perf_counter() - start
+    return sound
+
+
+def get_sound(name: str) -> pygame.Sound:
+    """A sound, decoded first if it isn't cached. To play one, see audio"""
+    return assets.get(name, lambda: _load_sound(name))
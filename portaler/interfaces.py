@@ -15,14 +15,23 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from collections import deque
 from dataclasses import dataclass, field
-from enum import Enum, IntEnum, auto
+from enum import Enum, IntEnum, IntFlag, auto
 from types import EllipsisType
-from typing import Any, Coroutine, TypeVar, cast, overload
+from typing import TYPE_CHECKING, Any, Coroutine, TypeVar, cast, overload
 
 import pygame
 from pygame.typing import SequenceLike
 
-from .gameplay.camera import Camera
+from .gameplay.camera import Camera, CameraSnapshot
+
+if TYPE_CHECKING:
+    from .game_input import InputState
+    from .gameplay.animation import AnimationClock
+    from .gameplay.audio import AudioQueue
+    from .gameplay.broadphase import SweepAndPrune
+    from .gameplay.portal import PortalRegistry
+    from .gameplay.registry import EntityRegistry
+    from .gameplay.spatial import SpatialGrid
 
 _T = TypeVar("_T")
 
@@ -38,6 +47,36 @@ class PhysicsType(Enum):
     ACTIVATED = auto()  # TRIGGER objects interact with these
 
 
+class CollisionLayer(IntFlag):
+    """
+    Collision categories.
+
+    A pair of sprites is only ever tested if each one's category is in the other's mask.
+    """
+
+    NONE = 0
+    SOLID = auto()  # walls
+    ONE_WAY = auto()  # one way platforms
+    MECHANISM = auto()  # doors, lifters
+    PLAYER_BARRIER = auto()  # blocks players, lets everything else through
+    PLAYER = auto()
+    THROWABLE = auto()
+    PORTAL = auto()
+    TRIGGER = auto()  # buttons, finishes
+    ALL = SOLID | ONE_WAY | MECHANISM | PLAYER_BARRIER | PLAYER | THROWABLE | PORTAL | TRIGGER
+
+
+class Command(IntFlag):
+    """Control commands, a physics step's worth of them fits in one int"""
+
+    NONE = 0
+    LEFT = auto()
+    RIGHT = auto()
+    JUMP = auto()
+    DUCK = auto()
+    INTERACT = auto()
+
+
 class Axis(IntEnum):
     HORIZONTAL = 0
     VERTICAL = 1
@@ -66,6 +105,16 @@ class HeightChangeState(Enum):
     HIGHTENING = auto()
 
 
+class DrawLayer(IntEnum):
+    """What's drawn over what, sprites on the same layer are drawn in the order they were added"""
+
+    PLATFORMS = 0
+    ACTORS = 1
+    THROWABLES = 2
+    MECHANISMS = 3  # and anything else
+    WALLS = 4
+
+
 class PortalColor(Enum):
     GREEN = auto()
     YELLOW = auto()
@@ -107,6 +156,7 @@ DIRECTION_TO_ANGLE = {
 
 class GameInterface:
     state_stack: deque[GameStateInterface]
+    deterministic: bool = False  # levels only depend on their inputs, see gameplay.determinism
 
     def quit(self) -> None:
         pass
@@ -117,6 +167,10 @@ class GameInterface:
     def add_task(self, task: Coroutine) -> None:
         pass
 
+    def finish_level(self, level: GameLevelInterface) -> None:
+        """The player got to the end of level"""
+        pass
+
 
 class GameStateInterface(ABC):
     def init(self) -> None:
@@ -144,10 +198,31 @@ class GameStateInterface(ABC):
     async def render(self, size: tuple[int, int], dt_since_physics: float) -> pygame.Surface:
         pass
 
+    def snapshot(self, size: tuple[int, int]) -> Any:
+        """
+        What draw_snapshot needs to render the state as it is now at size, None if it can't be drawn that way
+
+        Always on the main thread, after physics. Anything that follows along (like the camera) moves here.
+        """
+        return None
+
+    def draw_snapshot(
+        self, snapshot: Any, size: tuple[int, int], dt_since_physics: float
+    ) -> pygame.Surface | None:
+        """Render a snapshot, on the render thread (see Game.render_thread). None when there's no snapshot"""
+        return None
+
 
 class GameLevelInterface(GameStateInterface, ABC):
-    groups: dict[str, pygame.sprite.AbstractGroup]
+    entities: EntityRegistry  # sprites by role
+    groups: dict[str, pygame.sprite.AbstractGroup]  # the same, by name
+    broadphase: SweepAndPrune  # candidate pairs for sensors, rebuilt every physics step
+    portals: PortalRegistry  # twin portal and teleport transform of every portal
+    bodies: SpatialGrid  # the dynamic-physics group, also answers nearest/within radius queries
     game: GameInterface
+    input_source: InputState  # what the player presses
+    clock: AnimationClock  # what this level's animations run on
+    audio: AudioQueue  # where this level's sprites queue their sounds
     level_count: int
     _surface: pygame.Surface | None = None
 
@@ -184,12 +259,10 @@ class GameLevelInterface(GameStateInterface, ABC):
         """
         Add a sprite to the given string groups
 
-        Will create new ones if the groups do not exist
+        Raises KeyError for groups the level doesn't have
         """
         for group in groups:
-            self.groups.setdefault(group, pygame.sprite.Group()).add(
-                sprite
-            )  # somehow creates a new group ????
+            self.groups[group].add(sprite)
 
     @property
     def camera(self) -> Camera:
@@ -201,29 +274,40 @@ class GameLevelInterface(GameStateInterface, ABC):
 
         dt_since_physics is how much time since the last physics update and is used for position interpolation
         """
+        return self.draw_snapshot(self.snapshot(size), size, dt_since_physics)
+
+    def snapshot(self, size: tuple[int, int]) -> CameraSnapshot:
+        return self.camera.snapshot(size)
+
+    def draw_snapshot(
+        self, snapshot: CameraSnapshot, size: tuple[int, int], dt_since_physics: float
+    ) -> pygame.Surface:
         surface = self._surface
         if surface is None or surface.size != size:
             self._surface = surface = pygame.Surface(size)
-        self.camera.draw(surface, dt_since_physics)
+        self.camera.draw_snapshot(surface, snapshot, dt_since_physics)
         return surface
 
     async def update_actors(self, dt):
         self.handle_input(dt)
 
-        for sprite in self.get_group("actors"):
+        for sprite in self.entities.actors:
             sprite.act(dt)
 
     async def update_physics(self, dt):
         """
         Update the physics in this level
         """
-        for sprite in self.get_group("physics"):
+        for sprite in self.entities.physics:
             sprite.update_physics(dt)
 
     def empty_all(self):
         for group in self.groups.values():
             group.empty()
 
+    def release(self):
+        """Let go of what the level holds besides its sprites, once it's done with"""
+
 
 @dataclass
 class SpriteInitData:
@@ -239,13 +323,14 @@ class SpriteInitData:
     properties: dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SpritePhysicsData:
     # object used to init physics sprites with
     # add stuff here as necessary
     # no need for every sprite to use every bit of data
+    # sprites keep a reference to it instead of copying it, so it can't be changed (see gameplay/presets.py)
     physics_type: PhysicsType = PhysicsType.STATIC  # type of physics resolution to use
-    weight: float = 10  # weight (not used RN)
+    weight: float = 10  # how hard it is to push around (dynamic contacts, throwing)
     yeet_force: float = 12000  # force (for dynamic sprites)
     horizontal_ground_speed: float = 250  # max walking speed (for dynamic sprites)
     horizontal_ground_acceleration: float = (
@@ -258,7 +343,8 @@ class SpritePhysicsData:
     jump_speed: float = 460.0  # jump speed (for dynamic sprites)
     duck_speed: float = 550.0  # duck speed (for dynamic sprites)
     coyote_time: float = 0.25  # time within witch, you can jump after walking of the ground (in seconds)
-    one_way: bool = False  # whether a static sprite collides downward
+    collision_category: CollisionLayer = CollisionLayer.SOLID  # what I am, for other sprites' masks
+    collision_mask: CollisionLayer = CollisionLayer.ALL  # which categories I collide with / sense
     orientation: Direction = Direction.NORTH  # which way a portal shoots / accepts sprites
     tunnel_id: str = "default"  # portals with the same tunnel_id link to each other
 
@@ -293,9 +379,19 @@ class SpriteInterface(ABC):
     def interpolated_pos(self, dt: float) -> tuple[float, float]:
         pass
 
-    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt: float) -> None:
+    def snapshot(self) -> Any:
+        """What draw_snapshot needs to draw me as I am now. Copies, so physics can go on while it's drawn"""
+        return None
+
+    def draw_snapshot(
+        self, snapshot: Any, surface: pygame.Surface, offset: pygame.Vector2, dt: float
+    ) -> None:
+        """Draw a snapshot. Can be on the render thread, so only read what doesn't change after init"""
         pass
 
+    def draw(self, surface: pygame.Surface, offset: pygame.Vector2, dt: float) -> None:
+        self.draw_snapshot(self.snapshot(), surface, offset, dt)
+
 
 class PhysicsSpriteInterface(SpriteInterface, ABC):
     def trigger(self, other: SpriteInterface | None) -> None:
@@ -304,16 +400,19 @@ class PhysicsSpriteInterface(SpriteInterface, ABC):
     def untrigger(self, other: SpriteInterface | None) -> None:
         pass
 
-    def left(self) -> None:
+    def left(self, dt: float) -> None:
+        pass
+
+    def right(self, dt: float) -> None:
         pass
 
-    def right(self) -> None:
+    def jump(self, dt: float) -> None:
         pass
 
-    def jump(self) -> None:
+    def duck(self, dt: float) -> None:
         pass
 
-    def duck(self) -> None:
+    def interact(self, dt: float) -> None:
         pass
 
     def act(self, dt: float) -> None:
@@ -0,0 +1,550 @@
+"""
+Compiled levels
+
+Levels are written as a JSON file (sprites, camera) and a text tilemap.
+Parsing those and auto-tiling the map on every load gets slow for big maps,
+so they are compiled into one binary file per level, which is memory-mapped and read straight from the buffer.
+
+Compiled files start with the format version and a hash of the sources they were made from,
+and get rebuilt automatically when either one changes. To compile every level ahead of time:
+
+    python -m portaler.level_compiler
+
+Levels can set "chunk_size" (in tiles) to be streamed in chunks instead of loaded at once (see streaming).
+Their walls are split at chunk borders, throwables are loaded with the chunk they are in,
+and one-way blocks and mechanisms with every chunk they overlap. Mechanisms that depend on each other
+(the two portals of a pair, a button and what it's linked to) are loaded with every chunk
+any of them overlaps.
+
+Layout, little endian:
+ - header: magic, format version, sha1 of the sources
+ - config: tilemap position and size, camera view range (in tiles) and scale, chunk size (0 for no chunks)
+ - kinds: tile kind names, 1 byte length + utf-8 each
+ - grid: 1 byte per tile, 1 + index into kinds, 0 for no tile
+ - variants: 1 byte per tile, auto-tile neighbor bitmask (LEFT, TOP, RIGHT, BOTTOM)
+ - rects: solid tiles merged into rects, for collision (in tiles, tilemap position included)
+ - sprites: fixed size records (SPRITE), in the order they are spawned
+ - links: sprite indices buttons are linked to
+ - chunks: chunk position, and which rects and members are in it (CHUNK), by position
+ - members: indices of the sprites loaded with a chunk, in chunk order
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from enum import IntEnum
+from math import ceil, floor
+from pathlib import Path
+from typing import Any
+
+from .assets import LEVEL_DIRECTORY, write_atomically
+from .interfaces import Axis, Direction, HeightChangeState, PortalColor, ThrowableType
+
+FORMAT_VERSION = 4
+MAGIC = b"PLVL"
+
+SOURCE_DIRECTORY = LEVEL_DIRECTORY / "levels"
+COMPILED_DIRECTORY = LEVEL_DIRECTORY / "compiled"
+
+HEADER = struct.Struct("<4sH20s")  # magic, version, source hash
+CONFIG = struct.Struct(
+    "<iiII5fI"
+)  # tilemap x, y, width, height, camera view x, y, width, height, scale, chunk size
+COUNT = struct.Struct("<I")
+RECT = struct.Struct("<iiII")  # x, y, width, height
+SPRITE = struct.Struct("<BBffiii")  # kind, variant, x, y, a, b, c (what they mean depends on the kind)
+LINK = struct.Struct("<H")
+CHUNK = struct.Struct("<iiIIII")  # chunk x, y, first rect, rect count, first member, member count
+MEMBER = struct.Struct("<I")
+
+DIRECTIONS = list(Direction)
+PORTAL_COLORS = list(PortalColor)
+
+
+class SpriteKind(IntEnum):
+    ONE_WAY_BLOCK = 1  # a: width
+    PLAYER = 2
+    THROWABLE = 3  # variant: ThrowableType value
+    PORTAL = 4  # in pairs, one after another, variant: index of PortalColor, a: index of Direction
+    FINISH = 5
+    DOOR = 6  # variant: Axis value, a: length, b: draw head
+    LIFTER = 7  # variant: HeightChangeState value, a: height, b: segment count
+    BUTTON = 8  # a: first link, b: link count
+
+
+# loaded with the chunks they are in, in chunked levels. Everything else is loaded up front
+STREAMED_KINDS = frozenset(
+    (
+        SpriteKind.ONE_WAY_BLOCK,
+        SpriteKind.THROWABLE,
+        SpriteKind.PORTAL,
+        SpriteKind.DOOR,
+        SpriteKind.LIFTER,
+        SpriteKind.BUTTON,
+    )
+)
+
+
+def source_paths(name: str) -> tuple[Path, ...]:
+    return (
+        SOURCE_DIRECTORY / (name + ".json"),
+        SOURCE_DIRECTORY / (name + ".txt"),
+        LEVEL_DIRECTORY / "tile_symbols.json",
+    )
+
+
+def compiled_path(name: str) -> Path:
+    return COMPILED_DIRECTORY / (name + ".bin")
+
+
+def source_hash(sources: tuple[bytes, ...]) -> bytes:
+    digest = hashlib.sha1(struct.pack("<H", FORMAT_VERSION))
+    for source in sources:
+        digest.update(COUNT.pack(len(source)))
+        digest.update(source)
+    return digest.digest()
+
+
+def _symbol_grid(tilemap: list[str], width: int) -> tuple[bytes, list[str]]:
+    """The tilemap as one byte per tile, and the symbol each byte stands for (0 is past the end of a row)"""
+    symbols = sorted(set("".join(tilemap)))
+    if len(symbols) > 255:
+        raise ValueError("Too many different tile symbols")
+    codes = {ord(symbol): chr(code) for code, symbol in enumerate(symbols, 1)}
+    grid = "".join(row.translate(codes).ljust(width, "\0") for row in tilemap)
+    return grid.encode("latin-1"), symbols
+
+
+def _neighbors(grid: bytes, symbol_count: int, width: int, height: int) -> bytes:
+    """
+    Auto-tile bitmask of every tile, set for neighbors with the same symbol
+
+    SWAR: each symbol's tiles are one big int with a byte per tile (1 where the symbol is),
+    so shifting it by a byte lines every tile up with its left or right neighbor,
+    and shifting it by a row with the tile above or below. One AND compares every tile at once.
+    """
+    row_shift = 8 * width
+    not_first_column = int.from_bytes((b"\0" + b"\1" * (width - 1)) * height, "little")
+    not_last_column = int.from_bytes((b"\1" * (width - 1) + b"\0") * height, "little")
+    variants = 0
+    for code in range(1, symbol_count + 1):
+        table = bytearray(256)
+        table[code] = 1
+        tiles = int.from_bytes(grid.translate(table), "little")
+        left = tiles & (tiles << 8) & not_first_column
+        top = tiles & (tiles << row_shift)
+        right = tiles & (tiles >> 8) & not_last_column
+        bottom = tiles & (tiles >> row_shift)
+        variants |= left << 3 | top << 2 | right << 1 | bottom
+    return variants.to_bytes(width * height, "little")
+
+
+_SOLID_RUN = re.compile(rb"[^\0]+")
+
+
+def _merge(
+    grid: bytes, width: int, height: int, chunk_size: int = 0, offset: tuple[int, int] = (0, 0)
+) -> list[list[int]]:
+    """
+    Cover the solid tiles with rects: runs along rows, stacked when the run below is the same
+
+    With a chunk size, rects don't cross chunk borders (offset is where the grid is in chunk space).
+    """
+    rects: list[list[int]] = []
+    open_rects: dict[tuple[int, int], list[int]] = {}  # (x, width) of the last row -> [x, y, width, height]
+    for y in range(height):
+        if chunk_size and (y + offset[1]) % chunk_size == 0:
+            # new row of chunks, nothing stacks across
+            rects.extend(open_rects.values())
+            open_rects = {}
+        row = y * width
+        still_open = {}
+        for run in _SOLID_RUN.finditer(grid, row, row + width):
+            for start, length in _split(run.start() - row, run.end() - run.start(), chunk_size, offset[0]):
+                rect = open_rects.pop((start, length), None)
+                if rect is None:
+                    rect = [start, y, length, 0]
+                rect[3] += 1
+                still_open[start, length] = rect
+        rects.extend(open_rects.values())
+        open_rects = still_open
+    rects.extend(open_rects.values())
+    return rects
+
+
+def _split(start: int, length: int, chunk_size: int, offset: int) -> Iterator[tuple[int, int]]:
+    """Cut a run at chunk borders, into (start, length) pieces"""
+    end = start + length
+    if chunk_size:
+        border = start + chunk_size - (start + offset) % chunk_size
+        while border < end:
+            yield start, border - start
+            start = border
+            border += chunk_size
+    yield start, end - start
+
+
+def _chunk(x: float, y: float, chunk_size: int) -> tuple[int, int]:
+    return floor(x / chunk_size), floor(y / chunk_size)
+
+
+def _extent(record: tuple) -> tuple[float, float, float, float]:
+    """x, y, width, height of a sprite record, in tiles (like the spawn_ methods of Level make them)"""
+    kind, variant, x, y, a, b, _ = record
+    if kind == SpriteKind.ONE_WAY_BLOCK:
+        return x, y, a, 1
+    if kind == SpriteKind.PORTAL:
+        return (x, y, 3, 1) if DIRECTIONS[a].axis == Axis.VERTICAL else (x, y, 1, 3)
+    if kind == SpriteKind.DOOR:
+        return (x, y, 2, a) if Axis(variant) == Axis.VERTICAL else (x, y, a, 2)
+    if kind == SpriteKind.LIFTER:
+        return x, y, b, a
+    if kind == SpriteKind.BUTTON:
+        return x, y, 2, 1
+    return x, y, 1, 1
+
+
+def _overlapped_chunks(record: tuple, chunk_size: int) -> Iterator[tuple[int, int]]:
+    x, y, width, height = _extent(record)
+    left, top = _chunk(x, y, chunk_size)
+    for chunk_x in range(left, ceil((x + width) / chunk_size)):
+        for chunk_y in range(top, ceil((y + height) / chunk_size)):
+            yield chunk_x, chunk_y
+
+
+def _groups(records: list[tuple], links: list[int]) -> dict[int, list[int]]:
+    """Streamed sprites that have to be loaded together, by the index of each one of them"""
+    groups = {index: [index] for index, record in enumerate(records) if record[0] in STREAMED_KINDS}
+
+    def join(first: int, second: int) -> None:
+        group_a = groups[first]
+        group_b = groups[second]
+        if group_a is not group_b:
+            group_a += group_b
+            for index in group_b:
+                groups[index] = group_a
+
+    portals = [index for index in groups if records[index][0] == SpriteKind.PORTAL]
+    for first, second in zip(portals[::2], portals[1::2]):
+        join(first, second)
+    for index in groups:
+        kind, _, _, _, a, b, _ = records[index]
+        if kind == SpriteKind.BUTTON:
+            for link in links[a : a + b]:
+                if link in groups:
+                    join(index, link)
+    return groups
+
+
+def _chunks(
+    rects: list[list[int]], records: list[tuple], links: list[int], chunk_size: int
+) -> tuple[list[list[int]], list[tuple[int, ...]], list[int]]:
+    """Rects sorted by chunk, the chunk records and their members (rects include the tilemap position)"""
+    by_chunk: dict[tuple[int, int], tuple[list[list[int]], list[int]]] = {}
+    for rect in rects:
+        by_chunk.setdefault(_chunk(rect[0], rect[1], chunk_size), ([], []))[0].append(rect)
+    groups = _groups(records, links)
+    for index, record in enumerate(records):
+        kind, _, x, y, *_ = record
+        if kind == SpriteKind.THROWABLE:
+            # they move around, so only their starting chunk has them
+            by_chunk.setdefault(_chunk(x, y, chunk_size), ([], []))[1].append(index)
+        elif kind in STREAMED_KINDS:
+            for member in groups[index]:
+                for chunk in _overlapped_chunks(records[member], chunk_size):
+                    by_chunk.setdefault(chunk, ([], []))[1].append(index)
+    sorted_rects: list[list[int]] = []
+    chunks: list[tuple[int, ...]] = []
+    members: list[int] = []
+    for (chunk_x, chunk_y), (chunk_rects, chunk_members) in sorted(by_chunk.items()):
+        # in spawn order, once each: portals come in pairs and buttons after what they are linked to
+        chunk_members = sorted(set(chunk_members))
+        chunks.append(
+            (chunk_x, chunk_y, len(sorted_rects), len(chunk_rects), len(members), len(chunk_members))
+        )
+        sorted_rects += chunk_rects
+        members += chunk_members
+    return sorted_rects, chunks, members
+
+
+def _sprites(data: dict[str, Any]) -> tuple[list[tuple], list[int]]:  # noqa: C901
+    records: list[tuple] = []
+    links: list[int] = []
+    lookup: dict[str, int] = {}  # "doors[0]" and such, to sprite index
+
+    def add(kind: SpriteKind, pos, variant: int = 0, a: int = 0, b: int = 0, c: int = 0) -> int:
+        records.append((kind, variant, pos[0], pos[1], a, b, c))
+        return len(records) - 1
+
+    # NOTE: The order in which these are loaded affects the order in which they are drawn
+    for block in data.get("one_way_blocks", []):
+        add(SpriteKind.ONE_WAY_BLOCK, block["pos"], a=block["width"])
+    if "player" in data:
+        add(SpriteKind.PLAYER, data["player"]["pos"])
+    for throwable in data.get("throwables", []):
+        add(SpriteKind.THROWABLE, throwable["pos"], ThrowableType[throwable["type"]].value)
+    for color, pair in data.get("portals", {}).items():
+        color_index = PORTAL_COLORS.index(PortalColor[color])
+        for portal in pair:
+            add(
+                SpriteKind.PORTAL,
+                portal["pos"],
+                color_index,
+                DIRECTIONS.index(Direction[portal["orientation"]]),
+            )
+    for i, finish in enumerate(data.get("finishes", [])):
+        lookup[f"finishes[{i}]"] = add(SpriteKind.FINISH, finish["pos"])
+    for i, door in enumerate(data.get("doors", [])):
+        axis = Axis[door["orientation"]]  # TODO: implement actual directions, not just axes, for door
+        lookup[f"doors[{i}]"] = add(
+            SpriteKind.DOOR, door["pos"], axis.value, door["length"], door.get("draw_head", True)
+        )
+    for i, lifter in enumerate(data.get("lifters", [])):
+        state = HeightChangeState[lifter["starting_state"]]
+        lookup[f"lifters[{i}]"] = add(
+            SpriteKind.LIFTER, lifter["pos"], state.value, lifter["height"], lifter["segment_count"]
+        )
+    for i, button in enumerate(data.get("buttons", [])):
+        # NOTE: requires lookup to be complete (except later buttons)
+        linked_to = [lookup[trigger] for trigger in button["linked_to"]]
+        lookup[f"buttons[{i}]"] = add(SpriteKind.BUTTON, button["pos"], a=len(links), b=len(linked_to))
+        links.extend(linked_to)
+    # TODO: explode when unknown key
+    return records, links
+
+
+def compile_level(name: str, sources: tuple[bytes, ...] | None = None) -> bytes:
+    """Compile the sources of a level into the binary format"""
+    import json  # only needed here, levels that are compiled already load without it
+
+    if sources is None:
+        sources = tuple(path.read_bytes() for path in source_paths(name))
+    data = json.loads(sources[0])
+    tilemap = [line.strip() for line in sources[1].decode().strip().split("\n")]
+    tile_symbols = json.loads(sources[2])
+
+    offset_x, offset_y = data.get("tilemap_offset", [0, 0])
+    height = len(tilemap)
+    width = max(len(row) for row in tilemap)
+    symbol_grid, symbols = _symbol_grid(tilemap, width)
+    variants = _neighbors(symbol_grid, len(symbols), width, height)
+
+    kinds: list[str] = []
+    kind_table = bytearray(256)  # symbol code -> 1 + index into kinds, 0 for no tile
+    for code, symbol in enumerate(symbols, 1):
+        if symbol not in tile_symbols:
+            print(f"Unknown tile symbol: {symbol}")
+            continue
+        kind = tile_symbols[symbol]
+        if kind is None:
+            # empty tile
+            continue
+        if kind not in kinds:
+            kinds.append(kind)
+        kind_table[code] = kinds.index(kind) + 1
+    grid = symbol_grid.translate(kind_table)
+
+    camera_view_tile_range = data.get("camera_view_tile_range", "fit")
+    if camera_view_tile_range == "fit":
+        camera_view_tile_range = [0, 0, width, height]
+
+    camera_scale = data.get("camera_scale", 1.0)
+    chunk_size = data.get("chunk_size", 0)
+    records, links = _sprites(data["sprites"])
+    rects = [
+        [x + offset_x, y + offset_y, w, h]
+        for x, y, w, h in _merge(grid, width, height, chunk_size, (offset_x, offset_y))
+    ]
+    level_chunks: list[tuple[int, ...]] = []
+    members: list[int] = []
+    if chunk_size:
+        rects, level_chunks, members = _chunks(rects, records, links, chunk_size)
+
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, source_hash(sources)),
+        CONFIG.pack(offset_x, offset_y, width, height, *camera_view_tile_range, camera_scale, chunk_size),
+        bytes([len(kinds)]),
+    ]
+    for kind in kinds:
+        encoded = kind.encode()
+        parts.append(bytes([len(encoded)]) + encoded)
+    parts += [grid, variants, COUNT.pack(len(rects))]
+    parts += [RECT.pack(*rect) for rect in rects]
+    parts.append(COUNT.pack(len(records)))
+    parts += [SPRITE.pack(*record) for record in records]
+    parts.append(COUNT.pack(len(links)))
+    parts += [LINK.pack(link) for link in links]
+    parts.append(COUNT.pack(len(level_chunks)))
+    parts += [CHUNK.pack(*chunk) for chunk in level_chunks]
+    parts.append(COUNT.pack(len(members)))
+    parts += [MEMBER.pack(member) for member in members]
+    return b"".join(parts)
+
+
+class CompiledLevel:
+    """
+    Reads a compiled level from a buffer (memory-mapped file or bytes)
+
+    Nothing but the small config is read up front, the rest is read from the buffer when asked for.
+    """
+
+    def __init__(self, buffer: mmap.mmap | bytes) -> None:
+        self.buffer = buffer
+        magic, version, self.source_hash = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a compiled level of version {FORMAT_VERSION}")
+        offset = HEADER.size
+        x, y, width, height, *camera_view_tile_range, self.camera_scale, self.chunk_size = CONFIG.unpack_from(
+            buffer, offset
+        )
+        self.tilemap_pos = x, y
+        self.size = width, height
+        self.camera_view_tile_range: tuple[float, ...] = tuple(camera_view_tile_range)
+        offset += CONFIG.size
+
+        self.kinds: list[str] = []
+        count = buffer[offset]
+        offset += 1
+        for _ in range(count):
+            length = buffer[offset]
+            self.kinds.append(bytes(buffer[offset + 1 : offset + 1 + length]).decode())
+            offset += 1 + length
+        self.grid_offset = offset
+        self.variants_offset = offset + width * height
+        self.rect_count, self.rects_offset = self._section(self.variants_offset + width * height)
+        self.sprite_count, self.sprites_offset = self._section(
+            self.rects_offset + self.rect_count * RECT.size
+        )
+        self.link_count, self.links_offset = self._section(
+            self.sprites_offset + self.sprite_count * SPRITE.size
+        )
+        self.chunk_count, self.chunks_offset = self._section(self.links_offset + self.link_count * LINK.size)
+        self.member_count, self.members_offset = self._section(
+            self.chunks_offset + self.chunk_count * CHUNK.size
+        )
+
+    def _section(self, offset: int) -> tuple[int, int]:
+        """Record count and where the records start, of the section at offset"""
+        (count,) = COUNT.unpack_from(self.buffer, offset)
+        return count, offset + COUNT.size
+
+    def row(self, x: int, y: int, width: int) -> tuple[bytes, bytes]:
+        """
+        Kinds (1 + index into kinds, 0 for no tile) and auto-tile variants of a row of tiles
+
+        x and y include the tilemap position.
+        """
+        start = (y - self.tilemap_pos[1]) * self.size[0] + x - self.tilemap_pos[0]
+        return (
+            self.buffer[self.grid_offset + start : self.grid_offset + start + width],
+            self.buffer[self.variants_offset + start : self.variants_offset + start + width],
+        )
+
+    def rects(self, first: int = 0, count: int | None = None) -> Iterator[tuple[int, int, int, int]]:
+        """All the rects, or count of them starting at first (for the rects of a chunk)"""
+        if count is None:
+            count = self.rect_count - first
+        for i in range(first, first + count):
+            yield RECT.unpack_from(self.buffer, self.rects_offset + i * RECT.size)
+
+    def sprite(self, index: int) -> tuple[SpriteKind, int, float, float, int, int, int]:
+        kind, *record = SPRITE.unpack_from(self.buffer, self.sprites_offset + index * SPRITE.size)
+        return SpriteKind(kind), *record
+
+    def sprites(self) -> Iterator[tuple[SpriteKind, int, float, float, int, int, int]]:
+        for i in range(self.sprite_count):
+            yield self.sprite(i)
+
+    def chunks(self) -> Iterator[tuple[int, int, int, int, int, int]]:
+        for i in range(self.chunk_count):
+            yield CHUNK.unpack_from(self.buffer, self.chunks_offset + i * CHUNK.size)
+
+    def member(self, index: int) -> int:
+        return int(MEMBER.unpack_from(self.buffer, self.members_offset + index * MEMBER.size)[0])
+
+    def link(self, index: int) -> int:
+        return int(LINK.unpack_from(self.buffer, self.links_offset + index * LINK.size)[0])
+
+
+def is_up_to_date(path: Path, sources: tuple[Path, ...]) -> bool:
+    """
+    Whether the compiled file at path is of this format and was compiled from sources as they are now
+
+    Sources only get read and hashed when one of them changed after the compiled file was written.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        built = path.stat().st_mtime_ns
+        changed = [source for source in sources if source.stat().st_mtime_ns >= built]
+    except OSError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, version, compiled_hash = HEADER.unpack(header)
+    if (magic, version) != (MAGIC, FORMAT_VERSION):
+        return False
+    if not changed:
+        return True
+    if compiled_hash != source_hash(tuple(source.read_bytes() for source in sources)):
+        return False
+    # touched, but the same as before. Take the quick way next time
+    with suppress(OSError):
+        os.utime(path)
+    return True
+
+
+def build(name: str) -> bytes | None:
+    """
+    Compile a level if its compiled file is missing or out of date
+
+    Returns the compiled level if it couldn't be written (read only install), None otherwise.
+    """
+    path = compiled_path(name)
+    if is_up_to_date(path, source_paths(name)):
+        return None
+    compiled = compile_level(name)
+    try:
+        path.parent.mkdir(exist_ok=True)
+        write_atomically(path, compiled)
+    except OSError:
+        return compiled
+    return None
+
+
+@contextmanager
+def open_level(name: str) -> Iterator[CompiledLevel]:
+    """Compile a level if needed, and read it from the memory-mapped compiled file"""
+    compiled = build(name)
+    if compiled is not None:
+        yield CompiledLevel(compiled)
+        return
+    with open(compiled_path(name), "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # no mmap here (web)
+            yield CompiledLevel(f.read())
+            return
+        with buffer:
+            yield CompiledLevel(buffer)
+
+
+def main() -> None:
+    names = sys.argv[1:] or sorted(path.stem for path in SOURCE_DIRECTORY.glob("*.json"))
+    for name in names:
+        path = compiled_path(name)
+        path.parent.mkdir(exist_ok=True)
+        write_atomically(path, compile_level(name))
+        print(f"{name}: {path.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
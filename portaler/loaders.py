@@ -1,177 +1,125 @@
-import json
+from __future__ import annotations
+
+import gc
+from contextlib import ExitStack
+from itertools import repeat
+from operator import getitem
+from typing import TYPE_CHECKING
 
 import pygame
 
-from .assets import LEVEL_DIRECTORY, SPRITES_DIRECTORY
 from .const import TILE_SIZE
-from .gameplay import level
-from .interfaces import Axis, Direction, PhysicsSpriteInterface, PortalColor, ThrowableType
-
-with open(LEVEL_DIRECTORY / "tile_symbols.json") as f:
-    tile_symbols = json.load(f)
-
-tile_spritesheet: dict[str, pygame.Surface] = {}
-
-
-def tile_variant_name(kind: str, neighbors: int) -> str:
-    return f"{kind}#{bin(neighbors)[2:].zfill(4)}"
-
-
-def load_tile_spritesheet() -> None:
-    # bitmask: LEFT, TOP, RIGHT, BOTTOM
-    variants = {
-        (0, 0): 0b0011,
-        (1, 0): 0b1011,
-        (2, 0): 0b1001,
-        (3, 0): 0b0001,
-        (0, 1): 0b0111,
-        (1, 1): 0b1111,
-        (2, 1): 0b1101,
-        (3, 1): 0b0101,
-        (0, 2): 0b0110,
-        (1, 2): 0b1110,
-        (2, 2): 0b1100,
-        (3, 2): 0b0100,
-        (0, 3): 0b0010,
-        (1, 3): 0b1010,
-        (2, 3): 0b1000,
-        (3, 3): 0b0000,
-    }
-    walls = pygame.image.load(SPRITES_DIRECTORY / "walls.png").convert_alpha()
-    tile_size = 16
-    for kind, kind_pos in {"wall1": (0, 0), "wall2": (1, 0), "wall3": (0, 1)}.items():
-        for variant_pos, neighbors in variants.items():
-            x = kind_pos[0] * 4 + variant_pos[0]
-            y = kind_pos[1] * 4 + variant_pos[1]
-            tile_spritesheet[tile_variant_name(kind, neighbors)] = pygame.transform.scale(
-                walls.subsurface((x * tile_size, y * tile_size, tile_size, tile_size)), (TILE_SIZE, TILE_SIZE)
-            )
-
-
-load_tile_spritesheet()
+from .gameplay.sprites_and_sounds import get_tile_variants
+from .interfaces import Axis, Direction, HeightChangeState, PhysicsSpriteInterface, ThrowableType
+from .level_compiler import DIRECTIONS, PORTAL_COLORS, STREAMED_KINDS, CompiledLevel, SpriteKind, open_level
+from .streaming import LevelStreamer
+
+if TYPE_CHECKING:
+    from .gameplay.level import Level
+
+# (x, y, width, height) in tiles, and the tiles to draw (surface, offset)
+Wall = tuple[tuple[int, int, int, int], list[tuple[pygame.Surface, tuple[float, float]]]]
 
 
 class LevelLoader:
+    """Builds a level from its compiled file (compiled first, if the sources changed), see level_compiler"""
+
     def __init__(self, name: str):
         self.name = name
-        with open(LEVEL_DIRECTORY / "levels" / (name + ".json")) as f:
-            self.data = json.load(f)
-        with open(LEVEL_DIRECTORY / "levels" / (name + ".txt")) as f:
-            # json doesn't allow multiline strings, use txt instead
-            self.data["raw_tilemap"] = f.read().strip()
-        self.data["tilemap"] = [line.strip() for line in self.data["raw_tilemap"].split("\n")]
-
-    def load(self, target: level.Level) -> None:
-        # NOTE: order matters, for rendering
-        self.load_config(target)
-        self.load_sprites(target)
-        self.load_tiles(target)
-
-    def load_tiles(self, target: level.Level) -> None:
-        data = self.data["tilemap"]
-        symbol_tilemap: dict[tuple[int, int], str] = {}
-        neighbors_map: dict[tuple[int, int], int] = {}
-        offset_x, offset_y = self.data.get("tilemap_offset", [0, 0])
-        for y, row in enumerate(data):
-            for x, symbol in enumerate(row):
-                symbol_tilemap[x + offset_x, y + offset_y] = symbol
-        for pos, symbol in symbol_tilemap.items():
-            # Auto-tiling
-            neighbors: int = 0
-            if symbol_tilemap.get((pos[0] - 1, pos[1])) == symbol:
-                neighbors |= 0b1000
-            if symbol_tilemap.get((pos[0], pos[1] - 1)) == symbol:
-                neighbors |= 0b0100
-            if symbol_tilemap.get((pos[0] + 1, pos[1])) == symbol:
-                neighbors |= 0b0010
-            if symbol_tilemap.get((pos[0], pos[1] + 1)) == symbol:
-                neighbors |= 0b0001
-            neighbors_map[pos] = neighbors
-        for pos, symbol in symbol_tilemap.items():
-            self.add_tile(target, symbol, pos, neighbors_map[pos])
-
-    def add_tile(self, target: level.Level, symbol: str, pos: tuple[int, int], neighbors: int) -> None:
+        # variants of every tile kind in the level, by 1 + kind index (like the grid)
+        self.kind_variants: list[list[pygame.Surface]] = []
+        # sprites loaded up front that buttons can be linked to, by sprite index (None for the rest)
+        self.spawned: list[PhysicsSpriteInterface | None] = []
+
+    def load(self, target: Level) -> None:
+        # big levels make lots of objects and no garbage, keep the gc from scanning them over and over
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
         try:
-            tile = tile_symbols[symbol]
-        except KeyError:
-            print(f"Unknown tile symbol: {symbol}")
-            return
-        if tile is None:
-            # empty tile
-            return
-        surface = tile_spritesheet[tile_variant_name(tile, neighbors)]
-        target.spawn_wall(pos, (1, 1), surface)
-
-    def load_sprites(self, target: level.Level) -> None:  # noqa: C901  (shush)
-        data = self.data["sprites"]
-        trigger_lookup: dict[str, PhysicsSpriteInterface] = {}
-        # NOTE: The order in which these are loaded affects the order in which they are drawn
-        if "one_way_blocks" in data:
-            for i, block in enumerate(data["one_way_blocks"]):
-                pos = block["pos"]
-                width = block["width"]
-                target.spawn_one_way_block(pos, width)
-        if "player" in data:
-            player_data = data["player"]
-            target.spawn_player(player_data["pos"])
-        if "throwables" in data:
-            for i, throwable in enumerate(data["throwables"]):
-                pos = throwable["pos"]
-                throwable_type = ThrowableType[throwable["type"]]
-                target.spawn_throwable(pos, throwable_type)
-        if "portals" in data:
-            for color, pair in data["portals"].items():
-                portal_color = PortalColor[color]
-                portal_a, portal_b = pair
-                target.spawn_portal_pair(
-                    portal_a["pos"],
-                    Direction[portal_a["orientation"]],
-                    portal_b["pos"],
-                    Direction[portal_b["orientation"]],
-                    portal_color,
-                )
-        if "finishes" in data:
-            for i, finish in enumerate(data["finishes"]):
-                pos = finish["pos"]
-                trigger_lookup[f"finishes[{i}]"] = target.spawn_finish(pos)
-        if "doors" in data:
-            for i, door in enumerate(data["doors"]):
-                pos = door["pos"]
-                length = door["length"]
-                axis = Axis[door["orientation"]]  # TODO: implement actual directions, not just axes, for door
-                orientation = Direction.NORTH if axis == Axis.VERTICAL else Direction.WEST
-                trigger_lookup[f"doors[{i}]"] = target.spawn_door(
-                    pos, length, orientation, draw_head=door.get("draw_head", True)
-                )
-        if "lifters" in data:
-            for i, lifter in enumerate(data["lifters"]):
-                pos = lifter["pos"]
-                height = lifter["height"]
-                segment_count = lifter["segment_count"]
-                starting_state = lifter["starting_state"]
-                trigger_lookup[f"lifters[{i}]"] = target.spawn_lifter(
-                    pos, height, segment_count, starting_state
-                )
-        if "buttons" in data:
-            for i, button in enumerate(data["buttons"]):
-                pos = button["pos"]
-                linked_to_array = button["linked_to"]
-                # NOTE: requires trigger_lookup to be complete (except later buttons)
-                linked_to = [trigger_lookup[trigger] for trigger in linked_to_array]
-                trigger_lookup[f"buttons[{i}]"] = target.spawn_button(pos, linked_to)
-        # TODO: explode when unknown key
-
-    def load_config(self, target: level.Level) -> None:
-        data = self.data
-        camera_view_tile_range = data.get("camera_view_tile_range", "fit")
-        if camera_view_tile_range == "fit":
-            tilemap = data["tilemap"]
-            height = len(tilemap)
-            width = max([len(row) for row in tilemap])
-            x = y = 0
-        else:
-            x, y, width, height = camera_view_tile_range
+            self._load(target)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _load(self, target: Level) -> None:
+        with ExitStack() as resources:
+            compiled = resources.enter_context(open_level(self.name))
+            # loaded here, chunks can be read on another thread later
+            self.kind_variants = [[]] + [get_tile_variants(kind) for kind in compiled.kinds]
+            # NOTE: order matters, for rendering
+            self.load_config(target, compiled)
+            self.load_sprites(target, compiled)
+            if compiled.chunk_size:
+                # the rest comes in chunks, read from the compiled file for as long as the level is played
+                target.streamer = LevelStreamer(target, compiled, self, resources.pop_all())
+                target.streamer.update()
+            else:
+                self.load_tiles(target, compiled)
+
+    def load_tiles(self, target: Level, compiled: CompiledLevel) -> None:
+        for rect, tiles in self.read_walls(compiled):
+            target.spawn_wall(rect[:2], rect[2:], tiles)
+
+    def read_walls(self, compiled: CompiledLevel, first: int = 0, count: int | None = None) -> list[Wall]:
+        """
+        One wall per merged rect, with all the tiles it covers
+
+        Doesn't touch the level, so chunks can be read on another thread.
+        """
+        kind_variants = self.kind_variants
+        walls: list[Wall] = []
+        for rect in compiled.rects(first, count):
+            x, y, width, height = rect
+            tile_xs = [tile_x * TILE_SIZE for tile_x in range(width)]
+            tiles: list[tuple[pygame.Surface, tuple[float, float]]] = []
+            for tile_y in range(height):
+                kinds, variants = compiled.row(x, y + tile_y, width)
+                # variants[kinds][variants] tile by tile, without a python loop per tile
+                surfaces = map(getitem, map(kind_variants.__getitem__, kinds), variants)
+                tiles.extend(zip(surfaces, zip(tile_xs, repeat(tile_y * TILE_SIZE))))
+            walls.append((rect, tiles))
+        return walls
+
+    def load_sprites(self, target: Level, compiled: CompiledLevel) -> None:  # noqa: C901  (shush)
+        spawned = self.spawned = []
+        portal: tuple[tuple[float, float], Direction] | None = None  # first one of a pair
+        streamed = STREAMED_KINDS if compiled.chunk_size else frozenset()
+        for kind, variant, x, y, a, b, c in compiled.sprites():
+            pos = x, y
+            sprite: PhysicsSpriteInterface | None = None
+            if kind in streamed:
+                pass  # loaded with their chunk
+            elif kind == SpriteKind.ONE_WAY_BLOCK:
+                target.spawn_one_way_block(pos, a)
+            elif kind == SpriteKind.PLAYER:
+                target.spawn_player(pos)
+            elif kind == SpriteKind.THROWABLE:
+                target.spawn_throwable(pos, ThrowableType(variant))
+            elif kind == SpriteKind.PORTAL:
+                if portal is None:
+                    portal = pos, DIRECTIONS[a]
+                else:
+                    target.spawn_portal_pair(*portal, pos, DIRECTIONS[a], PORTAL_COLORS[variant])
+                    portal = None
+            elif kind == SpriteKind.FINISH:
+                sprite = target.spawn_finish(pos)
+            elif kind in (SpriteKind.DOOR, SpriteKind.LIFTER):
+                sprite = self.spawn_mechanism(target, kind, variant, pos, a, b)
+            elif kind == SpriteKind.BUTTON:
+                linked_to = [spawned[compiled.link(i)] for i in range(a, a + b)]
+                sprite = target.spawn_button(pos, linked_to)
+            spawned.append(sprite)
+
+    @staticmethod
+    def spawn_mechanism(target: Level, kind: SpriteKind, variant: int, pos, a: int, b: int):
+        """The door or lifter of a sprite record"""
+        if kind == SpriteKind.DOOR:
+            orientation = Direction.NORTH if Axis(variant) == Axis.VERTICAL else Direction.WEST
+            return target.spawn_door(pos, a, orientation, draw_head=bool(b))
+        return target.spawn_lifter(pos, a, b, HeightChangeState(variant))
+
+    def load_config(self, target: Level, compiled: CompiledLevel) -> None:
+        x, y, width, height = compiled.camera_view_tile_range
         camera_view_range = pygame.FRect(x * TILE_SIZE, y * TILE_SIZE, width * TILE_SIZE, height * TILE_SIZE)
         target.camera.view_range = camera_view_range
-        camera_scale = data.get("camera_scale", 1.0)
-        target.camera.scale = camera_scale
+        target.camera.scale = compiled.camera_scale
@@ -5,14 +5,18 @@ I tried to keep it as simple as possible.
 """
 
 import asyncio
+import math
+import threading
 from collections import deque
-from typing import Coroutine
+from time import sleep
+from typing import Any, Coroutine
 
 import pygame
 
 from . import const, env, game_input
 from .gameplay import level
-from .interfaces import GameInterface, GameStateInterface
+from .gameplay.audio import audio
+from .interfaces import GameInterface, GameLevelInterface, GameStateInterface
 
 
 def time() -> float:
@@ -26,10 +30,30 @@ class Game(GameInterface):
 
     """Main Game.  Gets passed to Game states"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        time_scale: float = const.TIME_SCALE,
+        rendering: bool = True,
+        max_steps: int | None = None,
+        deterministic: bool = const.DETERMINISTIC,
+    ) -> None:
+        """
+        time_scale is how many seconds of game go by in a second (more than 0), physics steps stay as long
+        so the game plays out the same at any scale. Infinite steps physics as fast as it can.
+        Without rendering there is no window, no input and no sound, only physics runs.
+        The game quits after max_steps physics steps, if given.
+        Deterministic levels only depend on their inputs, see gameplay.determinism.
+        """
         # NO MILLISCEOND UNITS! (seconds only)
         super().__init__()
+        if time_scale <= 0:
+            raise ValueError(f"time_scale has to be more than 0, not {time_scale}")
         self.running: bool = False  # whether the game is running the main loop
+        self.time_scale = time_scale
+        self.rendering = rendering
+        self.max_steps = max_steps
+        self.deterministic = deterministic
+        self.steps = 0  # physics steps run so far
         # rightmost = top of stack
         self.state_stack: deque[GameStateInterface] = deque()  # index -1 is top of stack
         self.render_delay: float = env.CAN_CAP_FPS * 1 / const.RENDER_FPS
@@ -40,11 +64,17 @@ class Game(GameInterface):
         self.needs_canceled: list[
             asyncio.Task
         ] = []  # list of tasks that need canceled when the game is closed
-        self.lag: float = 0.0  # How far behind real time the physics is
-
-        pygame.mixer.set_num_channels(16)  # this is probably unnesessary, but whatever
-        for reserved in const.RESERVED_CHANNELS:
-            pygame.mixer.set_reserved(reserved)
+        self.lag: float = 0.0  # How far behind real time the physics is (in game time)
+        self.last_physics_loop: float = 0.0  # time the physics loop last caught up to
+        # state, its snapshot and when it was taken, for the render thread.
+        # Physics replaces the whole thing, the render thread keeps drawing the one it got until then
+        self.published: tuple[GameStateInterface, Any, float] | None = None
+        self.render_thread: threading.Thread | None = None
+        # latest frame the render thread drew and the game time it was drawn ahead by, until it's shown
+        self.drawn: tuple[pygame.Surface, float] | None = None
+
+        pygame.mixer.set_num_channels(const.SOUND_CHANNELS)
+        pygame.mixer.set_reserved(const.RESERVED_CHANNELS)
 
     def quit(self) -> None:
         """Close the game window and exit"""
@@ -56,6 +86,16 @@ class Game(GameInterface):
         """Add async task to the main loop"""
         self.needs_canceled.append(self.tg.create_task(task))
 
+    def finish_level(self, finished: GameLevelInterface) -> None:
+        """Go on to the next level"""
+        self.state_stack.pop()
+        next_level = level.Level(self)
+        next_level.level_count = finished.level_count + 1
+        self.state_stack.append(next_level)
+        next_level.init()
+        # after the next level took what it shares with this one, so that doesn't get evicted
+        finished.release()
+
     async def update_input(self) -> None:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -71,62 +111,137 @@ class Game(GameInterface):
 
     async def update_physics(self, steps: int = 1) -> None:
         """Update game physics. Called interally."""
-        if not game_input.input_state.updated:
+        if self.rendering and not game_input.input_state.updated:
             # in case physics runs twice without input in between
             await self.update_input()
             # blame async for this issue
+        if self.deterministic and steps != 1:
+            raise ValueError("deterministic physics only steps with the fixed dt, it can't be split")
         dt = self.physics_delay / steps
         async with game_input.input_state:  # Hold lock for input to avoid interference with input_loop
             for _ in range(steps):
                 await self.state_stack[-1].update_actors(dt)
                 await self.state_stack[-1].update_physics(dt)
                 self.lag -= dt
+                self.steps += 1
+                if self.max_steps is not None and self.steps >= self.max_steps:
+                    self.quit()
+                    break
         self.last_physics_update = time()
 
     async def physics_loop(self) -> None:
-        """Loop that runs physics"""
+        """Loop that runs physics, time_scale times as fast as real time"""
         while self.running:
             start = time()
-            self.lag += start - self.last_physics_update
-            while self.lag > self.physics_delay:
-                await self.update_physics(1)
-            await asyncio.sleep(max(self.physics_delay - (time() - start), 0))
+            if math.isinf(self.time_scale):
+                # a game second at a time, so the other loops still get their turn
+                for _ in range(const.PHYSICS_FPS):
+                    if self.running:
+                        await self.update_physics(1)
+                stepped = True
+                self.lag = 0.0
+            else:
+                self.lag += (start - self.last_physics_loop) * self.time_scale
+                stepped = self.lag > self.physics_delay
+                while self.lag > self.physics_delay and self.running:  # quit() can stop it
+                    await self.update_physics(1)
+            self.last_physics_loop = start
+            if stepped and self.render_thread is not None:
+                self.publish()
+            await asyncio.sleep(max(self.physics_delay / self.time_scale - (time() - start), 0))
+
+    def game_time(self, seconds: float) -> float:
+        """How much game time goes by in this many real seconds, 0 when fast forwarding"""
+        if math.isinf(self.time_scale):
+            return 0.0  # physics is always ahead of the frame, nothing to draw it ahead of
+        return seconds * self.time_scale
+
+    def publish(self) -> None:
+        """Give the render thread a snapshot of the state as it is after the last physics step"""
+        state = self.state_stack[-1]
+        self.published = (state, state.snapshot(const.WINDOW_RESOLUTION), self.last_physics_update)
+
+    def present(self, surface: pygame.Surface, dt_since_physics: float) -> None:
+        """
+        Put a rendered frame on the window, and slow rendering down if physics can't keep up
+
+        Main thread only, SDL doesn't support touching the window from any other.
+        """
+        disp = self.window.get_surface()
+        output = const.fit_surface(surface, self.window.size)
+        disp.blit(output, output.get_rect(center=disp.get_rect().center))
+        self.window.flip()
+        if dt_since_physics > self.physics_delay * 2:
+            self.render_delay = min(self.render_delay + 0.05, 1 / 15)
+        elif self.render_delay > self.target_render_delay:
+            self.render_delay = max(self.target_render_delay, self.render_delay - 0.05)
 
     async def render_loop(self):
-        """Loop that renders the game"""
+        """Loop that renders the game (or shows what the render thread drew) and plays the sounds"""
         while self.running:
             start = time()
-            dt_since_physics = start - self.last_physics_update
-            surface = await self.state_stack[-1].render(const.WINDOW_RESOLUTION, dt_since_physics)
-            disp = self.window.get_surface()
-            output = const.fit_surface(surface, self.window.size)
-            disp.blit(output, output.get_rect(center=disp.get_rect().center))
-            self.window.flip()
-            if dt_since_physics > self.physics_delay * 2:
-                self.render_delay = min(self.render_delay + 0.05, 1 / 15)
-            elif self.render_delay > self.target_render_delay:
-                self.render_delay = max(self.target_render_delay, self.render_delay - 0.05)
+            if self.render_thread is None:
+                dt_since_physics = self.game_time(start - self.last_physics_update)
+                surface = await self.state_stack[-1].render(const.WINDOW_RESOLUTION, dt_since_physics)
+                self.present(surface, dt_since_physics)
+            elif self.drawn is not None:
+                # a frame the thread draws meanwhile just waits for the next time around
+                (surface, dt_since_physics), self.drawn = self.drawn, None
+                self.present(surface, dt_since_physics)
+            audio.update()
             await asyncio.sleep(max(self.render_delay - (time() - start), 0))
 
+    def render_thread_loop(self) -> None:
+        """
+        Loop of the render thread, draws the latest published snapshot
+
+        Physics never waits for it, a slow frame only makes the next one show a later snapshot.
+        Blits let go of the GIL, so drawing and physics run at the same time.
+        It only draws offscreen, the frame gets put on the window by render_loop on the main thread.
+        """
+        while self.running:
+            start = time()
+            if self.published is not None:
+                state, snapshot, physics_time = self.published
+                if snapshot is not None:
+                    dt_since_physics = self.game_time(start - physics_time)
+                    surface = state.draw_snapshot(snapshot, const.WINDOW_RESOLUTION, dt_since_physics)
+                    if surface is not None:
+                        # a copy, the state draws the next frame onto the same surface
+                        self.drawn = surface.copy(), dt_since_physics
+            sleep(max(self.render_delay - (time() - start), 0))
+
     async def run(self) -> None:
         """Initializes Game Window and runs all loops"""
         self.running = True
-        self.window: pygame.Window = pygame.window.Window(
-            const.TITLE,
-            const.WINDOW_RESOLUTION,
-            resizable=True,
-            # maximized=True,
-        )
-        self.window.get_surface()
+        if self.rendering:
+            self.window: pygame.Window = pygame.window.Window(
+                const.TITLE,
+                const.WINDOW_RESOLUTION,
+                resizable=True,
+                # maximized=True,
+            )
+            self.window.get_surface()
 
         self.state_stack.append(level.Level(self))
 
         async with asyncio.TaskGroup() as self.tg:
             self.state_stack[-1].init()
             await self.update_physics()  # to ensure this happens before 1st render
-            self.tg.create_task(self.input_loop())
+            self.last_physics_loop = time()
+            if self.rendering and const.RENDER_THREAD and not env.PYGBAG:
+                self.publish()
+                self.render_thread = threading.Thread(
+                    target=self.render_thread_loop, name="render", daemon=True
+                )
+                self.render_thread.start()
             self.tg.create_task(self.physics_loop())
-            self.tg.create_task(self.render_loop())
+            # without rendering there's nothing to draw or read input for, physics gets all of the time
+            if self.rendering:
+                self.tg.create_task(self.input_loop())
+                self.tg.create_task(self.render_loop())
+        if self.render_thread is not None:
+            self.render_thread.join()
 
 
 def main():
@@ -0,0 +1,222 @@
+"""
+Headless simulation
+
+Runs levels without a window, sound or keyboard, the player presses whatever an input script says.
+For checking every level can still be finished, replaying inputs and sweeping physics presets in bulk:
+
+    python -m portaler.simulation [steps] [processes]
+
+simulate runs a job right here, run_batch spreads a lot of them over a pool of processes
+(one per core by default) and collects the results in the same order.
+Levels and the image pack get compiled and baked before the pool starts, the workers only read them
+(the image pack is the game's own, nothing runs with sound here so sounds.bin is left alone).
+Every level has its own input, animation clock and audio queue (never played), so levels in one process
+don't affect each other. They do share the asset cache, images are only ever read.
+Levels run deterministic, so every result comes with a hash of the physics state it went through.
+
+A job is a level, an input script and preset overrides. An input script is a list of
+(step, actions) pairs: from that physics step on, those actions are held down (and nothing else).
+Overrides are by preset name (see gameplay.presets), then by field, THROWABLES changes all of them:
+
+    Job(2, [(0, {Actions.RIGHT}), (90, {Actions.RIGHT, Actions.JUMP}), (100, ())], {"PLAYER": {"weight": 80}})
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from collections import deque
+from collections.abc import Collection, Coroutine, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from operator import itemgetter
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import pygame
+
+from .const import PHYSICS_FPS, Actions
+from .game_input import InputState
+from .interfaces import GameInterface
+
+if TYPE_CHECKING:
+    from .interfaces import GameLevelInterface
+
+InputScript = Sequence[tuple[int, Collection[Actions]]]
+
+
+class Job(NamedTuple):
+    level: int
+    script: InputScript = ()
+    presets: dict[str, dict[str, Any]] = {}
+    steps: int = PHYSICS_FPS * 10  # most it gets to run, finishing the level stops it
+
+
+class SimulationResult(NamedTuple):
+    job: Job
+    steps: int  # physics steps it ran
+    finished: bool  # whether the player got to the end of the level
+    player: tuple[float, float] | None  # where the player ended up
+    seconds: float  # how long it took to load and run
+    state_hash: str  # of the physics state over every step (see gameplay.determinism)
+
+
+class ScriptedInput(InputState):
+    """Holds down what an input script says, instead of reading the keyboard"""
+
+    def __init__(self, script: InputScript) -> None:
+        super().__init__({})
+        self.script = sorted(script, key=itemgetter(0))
+        self.next = 0  # next entry of the script
+        self.held: frozenset[Actions] = frozenset()
+
+    def advance(self, step: int) -> None:
+        """Press and let go of what the script says to by this step"""
+        while self.next < len(self.script) and self.script[self.next][0] <= step:
+            self.held = frozenset(self.script[self.next][1])
+            self.next += 1
+        for action in Actions:
+            held = action in self.held
+            self.just_pressed_view[action] = held and not self.pressed_view[action]
+            self.pressed_view[action] = held
+
+
+class HeadlessGame(GameInterface):
+    """Just enough of a game for a level to run in. Finishing the level doesn't load the next one"""
+
+    deterministic = True
+
+    def __init__(self) -> None:
+        self.state_stack = deque()
+        self.finished: GameLevelInterface | None = None
+
+    def add_task(self, task: Coroutine) -> None:
+        task.close()  # nothing would ever run it
+
+    def finish_level(self, level: GameLevelInterface) -> None:
+        self.finished = level
+
+
+def init_headless() -> None:
+    """Set pygame up to load levels without a window or sound, images still need a display mode"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    if pygame.display.get_surface() is None:
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+
+@contextmanager
+def tuned(overrides: dict[str, dict[str, Any]]) -> Iterator[None]:
+    """Replace physics presets for a while. Sprites pick their preset when spawned"""
+    from .gameplay import presets
+
+    saved = {name: getattr(presets, name) for name in overrides}
+    try:
+        for name, fields in overrides.items():
+            preset = saved[name]
+            if isinstance(preset, dict):
+                setattr(presets, name, {key: replace(value, **fields) for key, value in preset.items()})
+            else:
+                setattr(presets, name, replace(preset, **fields))
+        yield
+    finally:
+        for name, preset in saved.items():
+            setattr(presets, name, preset)
+
+
+async def _run(level: GameLevelInterface, inputs: ScriptedInput, game: HeadlessGame, steps: int) -> int:
+    dt = 1 / PHYSICS_FPS
+    for step in range(steps):
+        inputs.advance(step)
+        await level.update_actors(dt)
+        await level.update_physics(dt)
+        if game.finished is not None:
+            return step + 1
+    return steps
+
+
+def simulate(job: Job) -> SimulationResult:
+    """Run a level with an input script and preset overrides, in this process"""
+    from .gameplay.audio import AudioQueue
+    from .gameplay.level import Level
+
+    init_headless()
+    start = perf_counter()
+    game = HeadlessGame()
+    inputs = ScriptedInput(job.script)
+    level = Level(game, inputs, AudioQueue())  # a queue of its own that is never played
+    level.level_count = job.level
+    game.state_stack.append(level)
+    with tuned(job.presets):
+        level.init()
+        steps = asyncio.run(_run(level, inputs, game, job.steps))
+    players = level.entities.actors.members
+    player = players[0].pos if players else None
+    state_hash = level.state_hash.hex()
+    level.empty_all()
+    seconds = perf_counter() - start
+    return SimulationResult(job, steps, game.finished is not None, player, seconds, state_hash)
+
+
+def prepare(levels: Iterable[int]) -> None:
+    """Compile levels and bake the image pack if needed, so that workers don't all try to at once"""
+    from .asset_pack import open_pack
+    from .level_compiler import build
+
+    for level in set(levels):
+        build(str(level))
+    open_pack()
+
+
+def run_batch(jobs: Sequence[Job], processes: int | None = None) -> list[SimulationResult]:
+    """Run jobs spread over a pool of processes, results are in the order of the jobs"""
+    prepare(job.level for job in jobs)
+    processes = processes or os.cpu_count() or 1
+    # a few chunks per process, so a slow chunk doesn't leave the other processes waiting
+    chunksize = max(1, len(jobs) // (processes * 4))
+    with ProcessPoolExecutor(processes, initializer=init_headless) as pool:
+        return list(pool.map(simulate, jobs, chunksize=chunksize))
+
+
+def main(steps: int = PHYSICS_FPS * 10, processes: int = 0) -> None:
+    scripts: dict[str, InputScript] = {
+        "idle": [],
+        "right": [(0, {Actions.RIGHT})],
+        "right+jump": [(0, {Actions.RIGHT}), (60, {Actions.RIGHT, Actions.JUMP}), (70, {Actions.RIGHT})],
+    }
+    weights = [80.0, 100.0, 120.0]
+    runs = [
+        (
+            f"level {level} {name:>10} weight {weight:5.0f}",
+            Job(level, script, {"PLAYER": {"weight": weight}}, steps),
+        )
+        for level in range(1, 6)
+        for name, script in scripts.items()
+        for weight in weights
+    ]
+    jobs = [job for _, job in runs]
+
+    start = perf_counter()
+    results = run_batch(jobs, processes or None)
+    elapsed = perf_counter() - start
+    for (label, _), result in zip(runs, results):
+        x, y = result.player or (0.0, 0.0)
+        print(
+            f"{label}: "
+            f"{'finished' if result.finished else 'not finished'} after {result.steps} steps, "
+            f"player at ({x:.0f}, {y:.0f}), {result.state_hash}, {result.seconds:.2f} s"
+        )
+    busy = sum(result.seconds for result in results)
+    print(f"{len(jobs)} jobs in {elapsed:.2f} s ({busy:.2f} s of simulating)")
+
+    # the pool has to come to exactly the same states as running here
+    for result in results[:: len(weights)]:
+        reference = simulate(result.job)
+        same = "same" if reference.state_hash == result.state_hash else "DIFFERENT"
+        print(f"level {result.job.level} here: {reference.state_hash}, {same} as in the pool")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,102 @@
+"""
+Startup report
+
+Shows where the time goes between starting python and the first frame, without a window:
+
+    python -m portaler.startup [level]
+
+First the slowest imports of a fresh interpreter (python -X importtime, cumulative: a module's time
+includes everything it imported), then how long each step of starting a level took,
+and every asset loaded on the way, slowest first. Then what the asset cache holds, biggest first.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+import pygame
+
+
+def import_times(module: str = "portaler.main") -> list[tuple[int, int, str]]:
+    """(self, cumulative) microseconds and name of every module importing module pulls in"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        if own.strip().isdigit():  # not the header
+            times.append((int(own), int(cumulative), name.strip()))
+    return times
+
+
+async def _first_frame(game, level, mark) -> None:
+    from .const import WINDOW_RESOLUTION
+
+    level.init()
+    mark("level init")
+    await game.update_physics()
+    mark("first physics step")
+    await level.render(WINDOW_RESOLUTION, 0.0)
+    mark("first render")
+
+
+def main(level_count: int = 1, count: int = 15) -> None:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    times = import_times()
+    total_import = max(cumulative for _, cumulative, _ in times) / 1000
+    print(f"imports: {total_import:.1f} ms")
+    for _, cumulative, name in sorted(times, key=lambda t: t[1], reverse=True)[:count]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    steps: list[tuple[str, float]] = []
+    start = perf_counter()
+
+    def mark(step: str) -> None:
+        nonlocal start
+        now = perf_counter()
+        steps.append((step, now - start))
+        start = now
+
+    from .const import WINDOW_RESOLUTION
+    from .gameplay import sprites_and_sounds
+    from .gameplay.level import Level
+    from .main import Game
+
+    start = perf_counter()
+    pygame.init()
+    pygame.display.set_mode(WINDOW_RESOLUTION)
+    mark("pygame init and display")
+    game = Game()
+    level = Level(game)
+    level.level_count = level_count
+    game.state_stack.append(level)
+    mark("game and level")
+    asyncio.run(_first_frame(game, level, mark))
+
+    startup = sum(duration for _, duration in steps) * 1000
+    print(f"startup: {startup:.1f} ms")
+    for step, duration in steps:
+        print(f"  {duration * 1000:7.1f} ms  {step}")
+    load_times = sprites_and_sounds.load_times
+    print(f"assets: {sum(load_times.values()) * 1000:.1f} ms (part of startup)")
+    for name, duration in sorted(load_times.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {duration * 1000:7.1f} ms  {name}")
+    cache = sprites_and_sounds.assets
+    print(f"resident assets: {cache.resident / 1024:.0f} KiB of {cache.budget / 1024:.0f} KiB budget")
+    for report in cache.report()[:count]:
+        print(f"  {report.size / 1024:7.0f} KiB  {report.name}, used by {report.owners}")
+    print(f"first frame: {total_import + startup:.1f} ms after starting python (plus interpreter start)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
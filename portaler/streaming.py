@@ -0,0 +1,296 @@
+"""
+Streaming chunked levels
+
+Levels compiled with a chunk size (see level_compiler) don't get loaded all at once.
+Their walls, one-way blocks, throwables and mechanisms (portals, doors, lifters, buttons)
+come in square chunks, loaded around what matters: the camera view, the actors and the far ends
+of the portals near them (bodies can come out of those). Every chunk a body overlaps is loaded too,
+it would fall through the walls of one that isn't.
+
+Chunks within the activity margin have to be there, they are loaded right away if they aren't yet.
+Chunks a bit further out are read on a background thread before the camera gets to them,
+so normally nothing loads while playing. Chunks are unloaded, least recently used first,
+once more than the budget are loaded and they are outside the prefetch margin.
+
+One-way blocks and mechanisms can be in more than one chunk, they stay until the last of those is unloaded.
+Mechanisms that depend on each other are in the same chunks (see level_compiler), so a button comes with what
+it's linked to and a portal with its twin. They come back as they started, nothing can be pressing a button
+while it's unloaded.
+
+Throwables move between chunks, so they don't belong to the chunk they came from.
+A throwable is unloaded (and remembered, position and velocity) when any chunk it overlaps gets unloaded,
+and comes back when that chunk gets loaded again. Held throwables and ones going through a portal stay.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from math import floor
+from typing import TYPE_CHECKING, NamedTuple
+
+import pygame
+
+from .const import ACTIVITY_MARGIN, STREAM_CHUNK_BUDGET, STREAM_PREFETCH_MARGIN, TILE_SIZE, WINDOW_RESOLUTION
+from .env import PYGBAG
+from .interfaces import Direction, ThrowableType
+from .level_compiler import DIRECTIONS, PORTAL_COLORS, CompiledLevel, SpriteKind
+
+if TYPE_CHECKING:
+    from .gameplay.level import Level
+    from .gameplay.physics import PhysicsSprite
+    from .interfaces import PhysicsSpriteInterface
+    from .loaders import LevelLoader, Wall
+
+_Cell = tuple[int, int]
+
+
+class ChunkData(NamedTuple):
+    """What's in a chunk, read from the compiled level"""
+
+    walls: list[Wall]
+    members: list[tuple[int, tuple[SpriteKind, int, float, float, int, int, int]]]  # (index, sprite record)
+
+
+class LoadedChunk(NamedTuple):
+    walls: list[PhysicsSprite]
+    shared: list[int]  # sprites that can be in other chunks too, by index (see LevelStreamer.shared)
+
+
+class SavedThrowable(NamedTuple):
+    type: ThrowableType
+    x: float
+    y: float
+    velocity_x: float
+    velocity_y: float
+
+
+class LevelStreamer:
+    """Keeps the chunks around the camera of a level loaded"""
+
+    def __init__(
+        self,
+        level: Level,
+        compiled: CompiledLevel,
+        loader: LevelLoader,
+        resources: ExitStack,
+        budget: int = STREAM_CHUNK_BUDGET,
+    ) -> None:
+        self.level = level
+        self.compiled = compiled
+        self.loader = loader
+        self.resources = resources  # keeps the compiled file open, closed with the streamer
+        self.budget = budget  # how many chunks can be loaded
+        self.chunk_pixels = compiled.chunk_size * TILE_SIZE
+        # first rect, rect count, first member, member count. Missing chunks are empty
+        self.chunks: dict[_Cell, tuple[int, int, int, int]] = {
+            (x, y): (first_rect, rect_count, first_member, member_count)
+            for x, y, first_rect, rect_count, first_member, member_count in compiled.chunks()
+        }
+        self.loaded: OrderedDict[_Cell, LoadedChunk] = OrderedDict()  # least recently used first
+        # one-way blocks and mechanisms by sprite index, and how many loaded chunks have each
+        self.shared: dict[int, PhysicsSprite] = {}
+        self.shared_users: Counter[int] = Counter()
+        self._wanted: dict[_Cell, None] = {}  # cells around the focus, not to be unloaded
+        self.pending: dict[_Cell, Future[ChunkData]] = {}
+        self.visited: set[_Cell] = set()  # loaded before, their throwables are out or saved
+        self.saved: dict[_Cell, list[SavedThrowable]] = {}  # throwables of unloaded chunks
+        self.throwable_types: dict[PhysicsSprite, ThrowableType] = {}
+        self._last_bounds: list[tuple[int, int, int, int]] = []
+        # no threads on web, everything gets loaded when needed instead.
+        # Nor when deterministic, what a thread has read by some step depends on timing
+        self._executor = (
+            None if PYGBAG or level.deterministic else ThreadPoolExecutor(1, thread_name_prefix="chunks")
+        )
+
+    def _bounds(self, rect: pygame.Rect | pygame.FRect, margin: float) -> tuple[int, int, int, int]:
+        size = self.chunk_pixels
+        return (
+            floor((rect.left - margin) / size),
+            floor((rect.top - margin) / size),
+            floor((rect.right + margin) / size),
+            floor((rect.bottom + margin) / size),
+        )
+
+    @staticmethod
+    def _cells(all_bounds: Iterable[tuple[int, int, int, int]]) -> dict[_Cell, None]:
+        """Cells inside any of the bounds, in order (dict as an ordered set)"""
+        cells: dict[_Cell, None] = {}
+        for left, top, right, bottom in all_bounds:
+            for x in range(left, right + 1):
+                for y in range(top, bottom + 1):
+                    cells[x, y] = None
+        return cells
+
+    def _focus(self) -> list[pygame.FRect]:
+        """What chunks get loaded around: actors, the camera view, and the twins of portals near those"""
+        level = self.level
+        focus = [sprite.rect for sprite in level.entities.actors]
+        view = level.camera.follow_view(WINDOW_RESOLUTION)
+        if view is not None and not level.deterministic:
+            focus.append(view)
+        # bodies can come out of a twin far away, but only portals near the focus get any bodies.
+        # Every portal in the level would keep chunks loaded however many there are
+        near = [rect.inflate(2 * STREAM_PREFETCH_MARGIN, 2 * STREAM_PREFETCH_MARGIN) for rect in focus]
+        for portal in level.entities.portals:
+            if portal.rect.collidelist(near) != -1:
+                link = level.portals.link(portal)
+                if link is not None:
+                    focus.append(link[0].rect)
+        return focus
+
+    def update(self) -> None:
+        """Load the chunks that are needed and start reading the ones that will be soon, unload old ones"""
+        self._collect()
+        focus = self._focus()
+        bounds = [self._bounds(rect, STREAM_PREFETCH_MARGIN) for rect in focus]
+        if bounds != self._last_bounds:
+            # something moved to another chunk
+            self._last_bounds = bounds
+            for cell in self._cells(self._bounds(rect, ACTIVITY_MARGIN) for rect in focus):
+                if cell not in self.loaded:
+                    self._load_now(cell)
+
+            self._wanted = self._cells(bounds)
+            for cell in self._wanted:
+                if cell in self.loaded:
+                    self.loaded.move_to_end(cell)
+                elif cell not in self.pending and self._executor is not None:
+                    self.pending[cell] = self._executor.submit(self.read, cell)
+        self._load_under_bodies()
+        self._evict(self._wanted)
+
+    def _load_now(self, cell: _Cell) -> None:
+        future = self.pending.pop(cell) if cell in self.pending else None
+        # the background thread didn't get to this one in time
+        self._load(cell, self.read(cell) if future is None else future.result())
+
+    def _load_under_bodies(self) -> None:
+        """Bodies can be partly in a chunk nothing else needs, they'd fall through its walls without it"""
+        loaded = self.loaded
+        for body in self.level.entities.dynamic:
+            left, top, right, bottom = self._bounds(body.collision_box, 0)
+            for x in range(left, right + 1):
+                for y in range(top, bottom + 1):
+                    if (x, y) not in loaded:
+                        self._load_now((x, y))
+
+    def _collect(self) -> None:
+        """Load the chunks the background thread is done reading"""
+        for cell, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[cell]
+                if cell not in self.loaded:
+                    self._load(cell, future.result())
+
+    def _evict(self, wanted: dict[_Cell, None]) -> None:
+        while len(self.loaded) > self.budget:
+            cell = next(iter(self.loaded))
+            if cell in wanted:
+                # everything left is in use, go over budget rather than unloading it
+                break
+            self._unload(cell)
+
+    def read(self, cell: _Cell) -> ChunkData:
+        """Read a chunk from the compiled level, doesn't touch the level so it can run on another thread"""
+        first_rect, rect_count, first_member, member_count = self.chunks.get(cell, (0, 0, 0, 0))
+        compiled = self.compiled
+        members = [compiled.member(i) for i in range(first_member, first_member + member_count)]
+        return ChunkData(
+            self.loader.read_walls(compiled, first_rect, rect_count),
+            [(index, compiled.sprite(index)) for index in members],
+        )
+
+    def _load(self, cell: _Cell, data: ChunkData) -> None:  # noqa: C901
+        level = self.level
+        walls: list[PhysicsSprite] = []
+        for rect, tiles in data.walls:
+            walls.append(level.spawn_wall(rect[:2], rect[2:], tiles))
+        shared: list[int] = []
+        portal: tuple[int, tuple[float, float], Direction] | None = None  # first one of a pair
+        for index, (kind, variant, x, y, a, b, _) in data.members:
+            if kind == SpriteKind.THROWABLE:
+                if cell not in self.visited:
+                    # first time here, the rest of the time they are out somewhere or saved
+                    self._spawn_throwable(ThrowableType(variant), x * TILE_SIZE, y * TILE_SIZE)
+                continue
+            shared.append(index)
+            self.shared_users[index] += 1
+            if index in self.shared:
+                # another chunk has it already
+                continue
+            pos = x, y
+            sprite: PhysicsSprite
+            if kind == SpriteKind.ONE_WAY_BLOCK:
+                sprite = level.spawn_one_way_block(pos, a)
+            elif kind == SpriteKind.PORTAL:
+                if portal is None:
+                    portal = index, pos, DIRECTIONS[a]
+                    continue
+                first, first_pos, first_orientation = portal
+                self.shared[first], sprite = level.spawn_portal_pair(
+                    first_pos, first_orientation, pos, DIRECTIONS[a], PORTAL_COLORS[variant]
+                )
+                portal = None
+            elif kind == SpriteKind.BUTTON:
+                linked_to = [self._linked(self.compiled.link(i)) for i in range(a, a + b)]
+                sprite = level.spawn_button(pos, linked_to)
+            else:
+                sprite = self.loader.spawn_mechanism(level, kind, variant, pos, a, b)
+            self.shared[index] = sprite
+        for saved in self.saved.pop(cell, ()):
+            throwable = self._spawn_throwable(saved.type, saved.x, saved.y)
+            throwable.velocity.update(saved.velocity_x, saved.velocity_y)
+        self.visited.add(cell)
+        self.loaded[cell] = LoadedChunk(walls, shared)
+
+    def _linked(self, index: int) -> PhysicsSpriteInterface | None:
+        """What a button is linked to, those in the same chunks are loaded before it"""
+        return self.shared[index] if index in self.shared else self.loader.spawned[index]
+
+    def _spawn_throwable(self, throwable_type: ThrowableType, x: float, y: float) -> PhysicsSprite:
+        # TILE_SIZE is a power of 2, so this gets back exactly x and y
+        throwable: PhysicsSprite = self.level.spawn_throwable((x / TILE_SIZE, y / TILE_SIZE), throwable_type)
+        self.throwable_types[throwable] = throwable_type
+        return throwable
+
+    def _unload(self, cell: _Cell) -> None:
+        chunk = self.loaded.pop(cell)
+        for sprite in chunk.walls:
+            sprite.kill()
+        for index in chunk.shared:
+            self.shared_users[index] -= 1
+            if not self.shared_users[index]:
+                del self.shared_users[index]
+                self.shared.pop(index).kill()
+        # throwables partly in chunks that aren't loaded anymore (this one, or ones it was holding up)
+        for throwable in self.level.entities.throwables.members:
+            if throwable.picker_upper is not None or throwable.portal_state != throwable.PortalState.OUT:
+                continue
+            throwable_cell = self._unloaded_cell(throwable.collision_box)
+            if throwable_cell is None:
+                continue
+            x, y = throwable.rect.topleft
+            velocity = throwable.velocity
+            self.saved.setdefault(throwable_cell, []).append(
+                SavedThrowable(self.throwable_types.pop(throwable), x, y, velocity.x, velocity.y)
+            )
+            throwable.kill()
+
+    def _unloaded_cell(self, rect: pygame.Rect | pygame.FRect) -> _Cell | None:
+        """A cell under rect that isn't loaded, if there is one. Bodies saved there come back with it"""
+        left, top, right, bottom = self._bounds(rect, 0)
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                if (x, y) not in self.loaded:
+                    return x, y
+        return None
+
+    def close(self) -> None:
+        """Stop reading chunks and close the compiled level, the level's sprites are left alone"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        self.pending.clear()
+        self.resources.close()
@@ -0,0 +1,5 @@
+import os
+
+# no window or sound while testing, images still need a display mode (see simulation.init_headless)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
@@ -0,0 +1,94 @@
+import pygame
+import pytest
+
+from portaler.asset_cache import AssetCache, nbytes
+
+KB = 1024
+
+
+def _image(kilobytes: int) -> pygame.Surface:
+    """A 32 bit surface of that many kilobytes"""
+    return pygame.Surface((16, kilobytes * KB // 64), depth=32)
+
+
+def _names(cache: AssetCache) -> set[str]:
+    return {report.name for report in cache.report()}
+
+
+def test_sizes() -> None:
+    image = _image(4)
+    assert nbytes(image) == 4 * KB
+    assert nbytes(image.subsurface(0, 0, 8, 8)) == 4 * KB  # pixels belong to the parent
+    assert nbytes([image, image.subsurface(0, 0, 8, 8), _image(1)]) == 5 * KB
+
+
+def test_cached() -> None:
+    cache = AssetCache(budget=100 * KB)
+    loads = []
+
+    def load() -> pygame.Surface:
+        loads.append(1)
+        return _image(1)
+
+    first = cache.get("a", load)
+    assert cache.get("a", load) is first
+    assert len(loads) == 1
+    assert cache.resident == 1 * KB
+
+
+def test_least_recently_used_goes_first() -> None:
+    cache = AssetCache(budget=3 * KB)
+    for name in "abc":
+        cache.get(name, lambda: _image(1))
+    cache.get("a", lambda: _image(1))  # b is the least recently used now
+    cache.get("d", lambda: _image(1))
+    assert _names(cache) == {"a", "c", "d"}
+    assert cache.resident == 3 * KB
+
+
+def test_assets_in_use_stay() -> None:
+    cache = AssetCache(budget=2 * KB)
+    cache.use("level 1")
+    for name in "abc":
+        cache.get(name, lambda: _image(1))
+    # over budget, but level 1 still uses everything
+    assert _names(cache) == {"a", "b", "c"}
+    assert cache.resident == 3 * KB
+
+    cache.use("level 2")
+    cache.get("c", lambda: _image(1))
+    cache.release("level 1")
+    # a and b are unused now, a was used longer ago
+    assert _names(cache) == {"b", "c"}
+    cache.release("level 2")
+    assert _names(cache) == {"b", "c"}  # fits
+
+
+def test_subsurfaces_in_use_keep_their_parent() -> None:
+    cache = AssetCache(budget=5 * KB)
+    sheet = cache.get("sheet", lambda: _image(4))  # nobody uses the sheet itself
+    cache.get("other", lambda: _image(1))
+    cache.use("level")
+    cache.get("frame", lambda: sheet.subsurface(0, 0, 8, 8), parent="sheet")
+    cache.budget = 4 * KB
+    cache.trim()
+    assert _names(cache) == {"sheet", "frame"}
+    assert cache.resident == 4 * KB
+
+
+def test_parent_goes_with_its_last_child() -> None:
+    cache = AssetCache(budget=4 * KB)
+    sheet = cache.get("sheet", lambda: _image(4))
+    cache.get("frame", lambda: sheet.subsurface(0, 0, 8, 8), parent="sheet")
+    cache.budget = 0
+    cache.trim()
+    assert _names(cache) == set()
+    assert cache.resident == 0
+
+
+@pytest.mark.parametrize("budget", [0, 1 * KB, 10 * KB])
+def test_never_over_budget_when_unused(budget: int) -> None:
+    cache = AssetCache(budget)
+    for i in range(20):
+        cache.get(str(i), lambda: _image(1))
+        assert cache.resident <= max(budget, 1 * KB)
@@ -0,0 +1,55 @@
+"""
+Reference runs of every level
+
+Physics changes that aren't supposed to change how things move have to end on the same state hash
+(see gameplay.determinism). When a change is supposed to, update REFERENCE_HASHES and say why.
+"""
+
+import pytest
+
+from portaler.const import PHYSICS_FPS, Actions
+from portaler.level_compiler import SOURCE_DIRECTORY
+from portaler.simulation import Job, simulate
+
+# runs right, jumps, turns around, then tries to grab or press whatever it's next to
+SCRIPT = [
+    (0, {Actions.RIGHT}),
+    (60, {Actions.RIGHT, Actions.JUMP}),
+    (75, {Actions.LEFT}),
+    (200, {Actions.RIGHT, Actions.INTERACT}),
+    (210, {Actions.RIGHT}),
+]
+STEPS = PHYSICS_FPS * 3
+
+# level: hash of the physics state over STEPS steps of SCRIPT
+REFERENCE_HASHES = {
+    "0": "66cf5f1a85d115bf",
+    "1": "cdb13579db755c7a",
+    "2": "485383be7b8ca5f2",
+    "3": "ede6181bf96f7a7d",
+    "4": "8e8ecb28208b36ec",
+    "5": "65b3823bbdb17682",
+}
+
+LEVELS = sorted(path.stem for path in SOURCE_DIRECTORY.glob("*.json"))
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_reference_hash(level: str) -> None:
+    assert level in REFERENCE_HASHES, "new level, add its reference hash"
+    result = simulate(Job(int(level), SCRIPT, {}, STEPS))
+    assert result.steps == STEPS
+    assert result.state_hash == REFERENCE_HASHES[level]
+
+
+def test_same_run_same_hash() -> None:
+    first = simulate(Job(4, SCRIPT, {}, PHYSICS_FPS))
+    second = simulate(Job(4, SCRIPT, {}, PHYSICS_FPS))
+    assert first.state_hash == second.state_hash
+    assert first.player == second.player
+
+
+def test_different_input_different_hash() -> None:
+    still = simulate(Job(1, (), {}, PHYSICS_FPS))
+    running = simulate(Job(1, SCRIPT, {}, PHYSICS_FPS))
+    assert still.state_hash != running.state_hash
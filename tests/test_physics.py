@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pygame
+import pytest
+
+from portaler.const import MAX_SPEED, MAX_SUBSTEP_TRAVEL, MAX_SUBSTEPS, PHYSICS_FPS, TILE_SIZE
+from portaler.gameplay.physics import PhysicsSprite
+from portaler.interfaces import Axis
+
+DT = 1 / PHYSICS_FPS
+
+
+def _substeps(width: float, height: float, velocity: tuple[float, float], axis: Axis) -> int:
+    # substeps only looks at the collision box and the velocity
+    sprite = SimpleNamespace(
+        collision_box=pygame.FRect(0, 0, width, height), velocity=pygame.Vector2(velocity)
+    )
+    return PhysicsSprite.substeps(sprite, axis, DT)
+
+
+def _speed(tiles: float, size: float = TILE_SIZE) -> float:
+    """Speed that moves a number of substep lengths in one step"""
+    return tiles * size * MAX_SUBSTEP_TRAVEL * PHYSICS_FPS
+
+
+@pytest.mark.parametrize("axis", list(Axis))
+def test_standing_still(axis: Axis) -> None:
+    assert _substeps(TILE_SIZE, TILE_SIZE, (0, 0), axis) == 1
+
+
+@pytest.mark.parametrize(
+    ("lengths", "expected"),
+    [(0.5, 1), (1, 1), (1.01, 2), (2, 2), (3.5, 4), (MAX_SUBSTEPS, MAX_SUBSTEPS), (100, MAX_SUBSTEPS)],
+)
+def test_substep_lengths(lengths: float, expected: int) -> None:
+    speed = _speed(lengths)
+    assert _substeps(TILE_SIZE, TILE_SIZE, (speed, 0), Axis.HORIZONTAL) == expected
+    assert _substeps(TILE_SIZE, TILE_SIZE, (0, -speed), Axis.VERTICAL) == expected
+
+
+def test_only_the_axis_counts() -> None:
+    fast = _speed(3)
+    assert _substeps(TILE_SIZE, TILE_SIZE, (fast, 0), Axis.VERTICAL) == 1
+    assert _substeps(TILE_SIZE, TILE_SIZE, (0, fast), Axis.HORIZONTAL) == 1
+
+
+def test_small_sprites_take_smaller_steps() -> None:
+    speed = _speed(1)
+    assert _substeps(8, TILE_SIZE, (speed, 0), Axis.HORIZONTAL) == 4
+    assert _substeps(8, TILE_SIZE, (0, speed), Axis.VERTICAL) == 1
+    # bigger than a tile still moves at most a fraction of a tile per substep
+    assert _substeps(TILE_SIZE * 4, TILE_SIZE * 4, (speed * 2, 0), Axis.HORIZONTAL) == 2
+
+
+def test_empty_box_uses_tile_size() -> None:
+    assert _substeps(0, 0, (_speed(2), 0), Axis.HORIZONTAL) == 2
+
+
+def test_max_speed_fits_in_max_substeps() -> None:
+    assert _substeps(TILE_SIZE, TILE_SIZE, (MAX_SPEED, 0), Axis.HORIZONTAL) < MAX_SUBSTEPS
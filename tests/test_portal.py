@@ -0,0 +1,53 @@
+import pytest
+
+from portaler.gameplay.portal import ORIENTATION_MATRICES
+from portaler.interfaces import Direction
+
+PAIRS = [(direction_in, direction_out) for direction_in in Direction for direction_out in Direction]
+
+
+def _apply(matrix: tuple[int, int, int, int], vector: tuple[int, int]) -> tuple[int, int]:
+    a, b, c, d = matrix
+    return a * vector[0] + b * vector[1], c * vector[0] + d * vector[1]
+
+
+def _tangent(direction: Direction) -> tuple[int, int]:
+    return (1, 0) if direction in (Direction.NORTH, Direction.SOUTH) else (0, 1)
+
+
+def test_every_pair_has_a_matrix() -> None:
+    assert set(ORIENTATION_MATRICES) == set(PAIRS)
+
+
+@pytest.mark.parametrize("pair", PAIRS)
+def test_rotation_or_reflection(pair: tuple[Direction, Direction]) -> None:
+    a, b, c, d = ORIENTATION_MATRICES[pair]
+    # columns are orthonormal, so lengths and angles survive going through a portal
+    assert a * a + c * c == 1
+    assert b * b + d * d == 1
+    assert a * b + c * d == 0
+    assert abs(a * d - b * c) == 1
+
+
+@pytest.mark.parametrize("pair", PAIRS)
+def test_facing_maps_to_facing(pair: tuple[Direction, Direction]) -> None:
+    direction_in, direction_out = pair
+    matrix = ORIENTATION_MATRICES[pair]
+    assert _apply(matrix, direction_in.value) == direction_out.value
+    going_in = direction_in.opposite.value
+    assert _apply(matrix, going_in) == direction_out.opposite.value
+
+
+@pytest.mark.parametrize("pair", PAIRS)
+def test_offset_along_portal(pair: tuple[Direction, Direction]) -> None:
+    direction_in, direction_out = pair
+    x, y = _apply(ORIENTATION_MATRICES[pair], _tangent(direction_in))
+    tangent_out = _tangent(direction_out)
+    # kept when both portals are on the same axis, mirrored otherwise
+    side = 1 if direction_in.axis == direction_out.axis else -1
+    assert (x, y) == (side * tangent_out[0], side * tangent_out[1])
+
+
+@pytest.mark.parametrize("direction", list(Direction))
+def test_same_facing_is_identity(direction: Direction) -> None:
+    assert ORIENTATION_MATRICES[direction, direction] == (1, 0, 0, 1)
@@ -0,0 +1,113 @@
+import random
+from math import hypot, inf
+
+import pygame
+import pytest
+
+from portaler.gameplay.spatial import SpatialGrid
+from portaler.interfaces import CollisionLayer
+
+
+class Box(pygame.sprite.Sprite):
+    """Just what the grid looks at"""
+
+    def __init__(self, x: float, y: float, size: float = 8, category: int = CollisionLayer.SOLID) -> None:
+        super().__init__()
+        self.rect = pygame.FRect(0, 0, size, size)
+        self.rect.center = x, y
+        self.collision_category = category
+
+
+def _distance(sprite: Box, point: tuple[float, float]) -> float:
+    return hypot(sprite.rect.centerx - point[0], sprite.rect.centery - point[1])
+
+
+def _brute_force(sprites: list[Box], point: tuple[float, float], max_distance: float = inf) -> float:
+    return min((d for d in (_distance(s, point) for s in sprites) if d <= max_distance), default=inf)
+
+
+@pytest.fixture
+def scattered() -> tuple[SpatialGrid, list[Box]]:
+    rng = random.Random(7)
+    sprites = [
+        Box(rng.uniform(-500, 1500), rng.uniform(-500, 1500), rng.choice((4, 8, 100))) for _ in range(200)
+    ]
+    grid = SpatialGrid(64)
+    grid.add(*sprites)
+    return grid, sprites
+
+
+def test_nearest_empty_grid() -> None:
+    assert SpatialGrid(64).nearest((10, 10)) == (None, inf)
+
+
+def test_nearest_matches_brute_force(scattered: tuple[SpatialGrid, list[Box]]) -> None:
+    grid, sprites = scattered
+    rng = random.Random(11)
+    for _ in range(200):
+        point = rng.uniform(-800, 1800), rng.uniform(-800, 1800)
+        sprite, distance = grid.nearest(point)
+        assert sprite is not None
+        assert distance == pytest.approx(_brute_force(sprites, point))
+        assert distance == pytest.approx(_distance(sprite, point))
+
+
+def test_nearest_far_from_everything() -> None:
+    grid = SpatialGrid(64)
+    far = Box(5000, -3000)
+    grid.add(Box(6000, 6000), far)
+    assert grid.nearest((0, 0)) == (far, pytest.approx(hypot(5000, 3000)))
+
+
+def test_nearest_max_distance(scattered: tuple[SpatialGrid, list[Box]]) -> None:
+    grid, sprites = scattered
+    rng = random.Random(13)
+    for _ in range(100):
+        point = rng.uniform(-800, 1800), rng.uniform(-800, 1800)
+        max_distance = rng.uniform(0, 150)
+        expected = _brute_force(sprites, point, max_distance)
+        sprite, distance = grid.nearest(point, max_distance)
+        assert (sprite is None) == (expected == inf)
+        assert distance == pytest.approx(expected)
+
+
+def test_nearest_category_and_predicate() -> None:
+    grid = SpatialGrid(64)
+    wall = Box(10, 0)
+    player = Box(20, 0, category=CollisionLayer.PLAYER)
+    far_wall = Box(300, 0)
+    grid.add(wall, player, far_wall)
+    assert grid.nearest((0, 0))[0] is wall
+    assert grid.nearest((0, 0), category=CollisionLayer.PLAYER)[0] is player
+    assert grid.nearest((0, 0), predicate=lambda sprite: sprite is not wall)[0] is player
+    assert (
+        grid.nearest((0, 0), category=CollisionLayer.SOLID, predicate=lambda sprite: sprite is not wall)[0]
+        is far_wall
+    )
+    assert grid.nearest((0, 0), category=CollisionLayer.TRIGGER) == (None, inf)
+
+
+def test_nearest_after_moving_and_removing() -> None:
+    grid = SpatialGrid(64)
+    mover = Box(500, 500)
+    stays = Box(200, 0)
+    grid.add(mover, stays)
+    mover.rect.center = 5, 5
+    grid.move(mover)
+    assert grid.nearest((0, 0))[0] is mover
+    grid.remove(mover)
+    assert grid.nearest((0, 0))[0] is stays
+
+
+def test_query_sees_changes() -> None:
+    grid = SpatialGrid(64)
+    box = Box(10, 10)
+    grid.add(box)
+    area = pygame.FRect(0, 0, 100, 100)
+    assert grid.query(area) == [box]
+    other = Box(50, 50)
+    grid.add(other)
+    assert sorted(map(id, grid.query(area))) == sorted(map(id, (box, other)))
+    box.rect.center = 500, 500
+    grid.move(box)
+    assert grid.query(area) == [other]